@@ -4,19 +4,79 @@ This module contains a simplified, purely Python implementation of the
 CROPGRO strawberry model.  The structure mirrors the original Fortran
 code but trades some complexity for readability.  All major calculation
 steps are implemented as small functions decorated with ``@njit`` to keep
-them fast when the optional ``numba`` dependency is available.
+them fast when the optional ``numba`` dependency is available.  Without
+numba the same functions run as plain Python and whole seasons run on a
+NumPy engine vectorized across scenarios; ``BACKEND`` names the engine in
+use.
+
+Importing the module only loads NumPy and the compiled kernels.  Weather
+may be given as a pandas DataFrame, a mapping of column arrays or a NumPy
+structured array; pandas and matplotlib are imported the first time
+results are converted to a DataFrame or plotted.
 """
 
 # CROPGRO-Strawberry Model Implementation in Python
 # This is a simplified implementation of the CROPGRO model for strawberries
 
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
 import numpy as np
-import pandas as pd
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
 
 from dataclasses import dataclass, asdict
-from numba import njit
+
+# Compute backend: the numba kernels when numba is installed, otherwise a
+# pure-NumPy engine vectorized across scenarios.  The environment variable
+# CROPGRO_BACKEND set to 'numba' or 'numpy' selects one explicitly.
+BACKEND = os.environ.get('CROPGRO_BACKEND', 'auto').lower()
+if BACKEND not in ('auto', 'numba', 'numpy'):
+    raise ValueError(f"Unknown CROPGRO_BACKEND {BACKEND!r}; "
+                     f"expected 'numba' or 'numpy'")
+if BACKEND != 'numpy':
+    try:
+        from numba import (config, get_num_threads, njit, prange,
+                           set_num_threads, types)
+        BACKEND = 'numba'
+    except ImportError:
+        if BACKEND == 'numba':
+            raise
+        BACKEND = 'numpy'
+if BACKEND == 'numpy':
+    prange = range
+
+# numba rebuilds cached kernels by importing the module they were compiled
+# in by name.  The module registers itself under a stable name and the
+# kernels are compiled under it, so cached kernels load whether the module
+# was run as a script or loaded from its path; when it is not in
+# ``sys.modules`` at all the kernels are not cached.
+_MODULE_NAME = 'cropgro_strawberry'
+_CACHE = __name__ in sys.modules
+if _CACHE:
+    sys.modules.setdefault(_MODULE_NAME, sys.modules[__name__])
+
+
+def _jit(signature, **options):
+    """Compile a kernel for ``signature``, cached on disk when possible.
+
+    With the NumPy backend the function is returned unchanged.
+    """
+    def compile_kernel(func):
+        if BACKEND == 'numpy':
+            return func
+        if not _CACHE:
+            return njit(signature, nogil=True, **options)(func)
+        module_name = func.__globals__['__name__']
+        func.__globals__['__name__'] = _MODULE_NAME
+        try:
+            return njit(signature, nogil=True, cache=True, **options)(func)
+        finally:
+            func.__globals__['__name__'] = module_name
+    return compile_kernel
 
 
 @dataclass
@@ -35,7 +95,7 @@ class PlantState:
     runner_number: float = 0.0
 
 
-@njit
+@_jit('f8(f8, f8)')
 def _calc_daylength(latitude, day_of_year):
     """Return length of the day in hours for a given latitude and date."""
     # Solar declination angle for the given day of year
@@ -54,7 +114,7 @@ def _calc_daylength(latitude, day_of_year):
         return 24.0 * np.arccos(term) / np.pi
 
 
-@njit
+@_jit('f8(f8, f8, f8, f8, f8)')
 def _thermal_time(tmin, tmax, tbase, topt, tmax_th):
     """Calculate thermal time accumulation for a single day."""
     # Mean daily temperature
@@ -70,39 +130,65 @@ def _thermal_time(tmin, tmax, tbase, topt, tmax_th):
         return 0.0
 
 
-@njit
-def _photosynthesis(solar_radiation, tmax, tmin, rue, tbase, topt, 
-                    k_light, lai, co2):
-    """Estimate daily photosynthesis based on temperature and light."""
+@_jit('f8(f8, f8, f8, f8)')
+def _temperature_effect(tmax, tmin, tbase, topt):
+    """Return the temperature response (0-1) of photosynthesis."""
     # Average temperature used for temperature response
     tavg = (tmax + tmin) / 2.0
     if tavg <= tbase:
-        temp_effect = 0.0
+        return 0.0
     elif tavg >= topt:
-        temp_effect = 1.0
+        return 1.0
     else:
-        temp_effect = (tavg - tbase) / (topt - tbase)
-    co2_effect = 1.0 + 0.11 * np.log(co2 / 400.0)
-    light_interception = 1.0 - np.exp(-k_light * lai)
+        return (tavg - tbase) / (topt - tbase)
+
+
+@_jit('f8(f8)')
+def _co2_effect(co2):
+    """Return the CO2 fertilisation factor relative to 400 ppm."""
+    return 1.0 + 0.11 * np.log(co2 / 400.0)
+
+
+@_jit('f8(f8, f8)')
+def _light_interception(k_light, lai):
+    """Return the fraction of radiation intercepted by the canopy."""
+    return 1.0 - np.exp(-k_light * lai)
+
+
+@_jit('f8(f8, f8, f8, f8, f8, f8, f8, f8, f8)')
+def _photosynthesis(solar_radiation, tmax, tmin, rue, tbase, topt, 
+                    k_light, lai, co2):
+    """Estimate daily photosynthesis based on temperature and light."""
+    temp_effect = _temperature_effect(tmax, tmin, tbase, topt)
+    co2_effect = _co2_effect(co2)
+    light_interception = _light_interception(k_light, lai)
     return (solar_radiation * rue * temp_effect * co2_effect * 
             light_interception)
 
 
-@njit
-def _transpiration(solar_radiation, tmax, tmin, rh, lai):
-    """Compute potential plant transpiration using a simple ET0 approach."""
+@_jit('f8(f8, f8, f8)')
+def _reference_et(solar_radiation, tmax, tmin):
+    """Return simplified reference evapotranspiration (Hargreaves)."""
     # Mean temperature for the day
     tavg = (tmax + tmin) / 2.0
+    return 0.0023 * solar_radiation * np.sqrt(tmax - tmin) * (tavg + 17.8)
 
-    # Simplified reference evapotranspiration (Hargreaves)
-    et0 = 0.0023 * solar_radiation * np.sqrt(tmax - tmin) * (tavg + 17.8)
 
-    # Crop coefficient as a function of canopy development
-    kc = 0.3 + 0.7 * (1.0 - np.exp(-0.7 * lai))
+@_jit('f8(f8)')
+def _crop_coefficient(lai):
+    """Return the crop coefficient as a function of canopy development."""
+    return 0.3 + 0.7 * (1.0 - np.exp(-0.7 * lai))
+
+
+@_jit('f8(f8, f8, f8, f8, f8)')
+def _transpiration(solar_radiation, tmax, tmin, rh, lai):
+    """Compute potential plant transpiration using a simple ET0 approach."""
+    et0 = _reference_et(solar_radiation, tmax, tmin)
+    kc = _crop_coefficient(lai)
     return et0 * kc
 
 
-@njit
+@_jit('f8(f8, f8, f8, f8, f8)')
 def _water_stress(field_capacity, wilting_point, root_depth, rainfall, 
                   transpiration):
     """Derive a water stress factor from soil moisture balance."""
@@ -121,14 +207,17 @@ def _water_stress(field_capacity, wilting_point, root_depth, rainfall,
         return stress_factor
 
 
-@njit
-def _maintenance_resp(leaf_biomass, stem_biomass, root_biomass, 
-                      fruit_biomass, tmin, tmax):
-    """Calculate maintenance respiration of all plant organs."""
-    # Temperature dependence of respiration (Q10 model)
+@_jit('f8(f8, f8)')
+def _respiration_factor(tmin, tmax):
+    """Return the temperature dependence of respiration (Q10 model)."""
     tavg = (tmin + tmax) / 2.0
-    temp_factor = 2.0 ** ((tavg - 20.0) / 10.0)
+    return 2.0 ** ((tavg - 20.0) / 10.0)
+
 
+@_jit('f8(f8, f8, f8, f8, f8)')
+def _organ_respiration(leaf_biomass, stem_biomass, root_biomass,
+                       fruit_biomass, temp_factor):
+    """Sum the maintenance respiration of the organs at a Q10 factor."""
     # Organ specific respiration rates
     resp_leaf = leaf_biomass * 0.03 * temp_factor
     resp_stem = stem_biomass * 0.015 * temp_factor
@@ -137,12 +226,1142 @@ def _maintenance_resp(leaf_biomass, stem_biomass, root_biomass,
     return resp_leaf + resp_stem + resp_root + resp_fruit
 
 
+@_jit('f8(f8, f8, f8, f8, f8, f8)')
+def _maintenance_resp(leaf_biomass, stem_biomass, root_biomass, 
+                      fruit_biomass, tmin, tmax):
+    """Calculate maintenance respiration of all plant organs."""
+    return _organ_respiration(leaf_biomass, stem_biomass, root_biomass,
+                              fruit_biomass,
+                              _respiration_factor(tmin, tmax))
+
+
+# ---------------------------------------------------------------------------
+# Whole-season compiled engine
+#
+# The engine keeps the plant state in a flat float array and the
+# phenological stage as an integer code so that an entire season can be
+# simulated inside a single compiled loop.  The equations are the same
+# helpers used by ``CropgroStrawberry`` and the results are identical to
+# running ``simulate_day`` once per weather row.
+# ---------------------------------------------------------------------------
+
+# Phenological stages in order of development (the index is the stage
+# code) and the thermal time (degree-days) required to enter each stage
+STAGE_NAMES = (
+    'GERMINATION',
+    'EMERGENCE',
+    'JUVENILE',
+    'VEGETATIVE',
+    'FLORAL_INDUCTION',
+    'FLOWERING',
+    'FRUIT_SET',
+    'FRUIT_DEVELOPMENT',
+    'FRUIT_MATURITY',
+    'SENESCENCE',
+)
+STAGE_THRESHOLDS = (0, 50, 100, 200, 400, 600, 700, 800, 1000, 1500)
+STAGE_CODES = {name: code for code, name in enumerate(STAGE_NAMES)}
+N_STAGES = len(STAGE_NAMES)
+
+# Layout of the flat plant state array
+S_BIOMASS = 0
+S_LAI = 1
+S_ROOT_DEPTH = 2
+S_FRUIT_NUMBER = 3
+S_FRUIT_BIOMASS = 4
+S_LEAF_BIOMASS = 5
+S_STEM_BIOMASS = 6
+S_ROOT_BIOMASS = 7
+S_STAGE = 8
+S_DEV_RATE = 9
+S_CROWN_NUMBER = 10
+S_RUNNER_NUMBER = 11
+S_THERMAL_TIME = 12
+S_DAP = 13
+N_STATE = 14
+
+# Layout of the flat parameter array (cultivar, soil and site)
+P_TBASE = 0
+P_TOPT = 1
+P_TMAX_TH = 2
+P_RUE = 3
+P_K_LIGHT = 4
+P_SLA = 5
+P_FRUITS_PER_CROWN = 6
+P_MAX_ROOT_DEPTH = 7
+P_FIELD_CAPACITY = 8
+P_WILTING_POINT = 9
+P_LATITUDE = 10
+P_CO2 = 11
+P_PLANT_DENSITY = 12
+N_PARAMS = 13
+
+# Layout of the precomputed daily weather drivers
+D_DAYLENGTH = 0
+D_THERMAL_TIME = 1
+D_TEMP_EFFECT = 2
+D_CO2_EFFECT = 3
+D_SOLAR_RADIATION = 4
+D_REFERENCE_ET = 5
+D_WIND_MODIFIER = 6
+D_RAINFALL = 7
+D_RESP_FACTOR = 8
+N_DRIVERS = 9
+DRIVER_COLUMNS = (
+    'daylength',
+    'thermal_time',
+    'temperature_effect',
+    'co2_effect',
+    'solar_radiation',
+    'reference_et',
+    'wind_modifier',
+    'rainfall',
+    'respiration_factor',
+)
+
+# Parameters the weather drivers depend on
+_DRIVER_PARAMS = [P_LATITUDE, P_TBASE, P_TOPT, P_TMAX_TH, P_CO2]
+
+# Weather inputs read by the engine besides the date
+WEATHER_COLUMNS = ('tmax', 'tmin', 'solar_radiation', 'rainfall', 'rh',
+                   'wind_speed')
+
+# Daily output columns written by the engine (the date is kept separately)
+OUTPUT_COLUMNS = (
+    'dap',
+    'stage',
+    'thermal_time',
+    'biomass',
+    'leaf_area_index',
+    'root_depth',
+    'fruit_number',
+    'fruit_biomass',
+    'leaf_biomass',
+    'stem_biomass',
+    'root_biomass',
+    'crown_number',
+    'runner_number',
+    'water_stress',
+    'daylength',
+    'photosynthesis',
+    'transpiration',
+)
+N_OUTPUTS = len(OUTPUT_COLUMNS)
+
+# Float outputs stored in the results ``values`` block (all but dap/stage)
+VALUE_COLUMNS = OUTPUT_COLUMNS[2:]
+
+# Layout of the stop array of a season: the stage code, day index and DAP
+# that end the season (-1 when unset), whether the rest of the season is
+# filled once stopped, and the day index the season stopped on (written by
+# the engine, -1 when it ran to the end)
+STOP_STAGE = 0
+STOP_DAY = 1
+STOP_DAP = 2
+STOP_FILL = 3
+STOP_AT = 4
+N_STOP = 5
+
+# Fixed binary layout of a model snapshot (little-endian, 562 bytes): the
+# parameters, stage thresholds and flat state, the output row and stage
+# dates of the last simulated day, and that day (``NaT`` before planting)
+SNAPSHOT_VERSION = 1
+SNAPSHOT_DTYPE = np.dtype([
+    ('version', '<u2'),
+    ('cultivar', 'S32'),
+    ('planting_date', '<M8[D]'),
+    ('last_date', '<M8[D]'),
+    ('params', '<f8', (N_PARAMS,)),
+    ('thresholds', '<f8', (len(STAGE_NAMES),)),
+    ('state', '<f8', (N_STATE,)),
+    ('final', '<f8', (N_OUTPUTS,)),
+    ('stage_dates', '<M8[D]', (len(STAGE_NAMES),)),
+])
+
+# Biomass partitioning fractions (root, leaf, stem, fruit) for each stage
+_PARTITION_FRACTIONS = np.array([
+    [0.4, 0.4, 0.2, 0.0],     # GERMINATION
+    [0.4, 0.4, 0.2, 0.0],     # EMERGENCE
+    [0.4, 0.4, 0.2, 0.0],     # JUVENILE
+    [0.2, 0.5, 0.3, 0.0],     # VEGETATIVE
+    [0.2, 0.5, 0.3, 0.0],     # FLORAL_INDUCTION
+    [0.1, 0.4, 0.3, 0.2],     # FLOWERING
+    [0.05, 0.25, 0.2, 0.5],   # FRUIT_SET
+    [0.05, 0.25, 0.2, 0.5],   # FRUIT_DEVELOPMENT
+    [0.0, 0.1, 0.1, 0.8],     # FRUIT_MATURITY
+    [0.0, 0.0, 0.0, 0.0],     # SENESCENCE
+])
+
+# Stage dependent multipliers mirroring ``partition_biomass``,
+# ``update_runners``, ``update_crowns`` and ``update_fruits``
+_SLA_FACTOR = np.array([1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 0.8, 0.8, 0.8])
+_RUNNER_RATE = np.array([0.0, 0.0, 0.0, 0.1, 0.1, 0.0, 0.0, 0.0, 0.0, 0.0])
+_CROWN_RATE = np.array([0.0, 0.0, 0.0, 0.02, 0.02, 0.02, 0.0, 0.0, 0.0, 0.0])
+_FRUIT_RATE = np.array([0.0, 0.0, 0.0, 0.0, 0.0, 0.1, 0.2, 0.0, 0.0, 0.0])
+
+# Explicit signatures of the engine kernels.  Typed kernels are compiled
+# when the module is imported and :func:`_jit` caches the machine code
+# on disk, so later processes load it instead of recompiling.  Arrays the
+# kernels only read are declared read-only so they also accept read-only
+# views such as pandas columns.  The NumPy backend needs no signatures.
+if BACKEND == 'numba':
+    _IN_INT = types.Array(types.int64, 1, 'A', readonly=True)
+    _IN_1D = types.Array(types.float64, 1, 'A', readonly=True)
+    _IN_2D = types.Array(types.float64, 2, 'A', readonly=True)
+    _IN_3D = types.Array(types.float64, 3, 'A', readonly=True)
+    _PREDICATE_SIGNATURE = types.boolean(types.float64[:])
+    _PREDICATE = types.FunctionType(_PREDICATE_SIGNATURE)
+    _DRIVERS_SIGNATURE = types.void(
+        _IN_1D, _IN_INT, _IN_1D, _IN_1D, _IN_1D, _IN_1D, _IN_1D, _IN_1D,
+        types.float64[:, :])
+    _ADVANCE_SIGNATURE = types.void(
+        types.float64[:], _IN_1D, _IN_1D, _IN_1D, types.float64[:])
+    _RECORD_SIGNATURE = types.void(
+        _IN_1D, types.int64, types.int64, _IN_INT, types.int64[:],
+        types.int32[:], types.int8[:], types.float64[:, :])
+    _SEASON_SIGNATURE = types.int64(
+        types.float64[:], _IN_1D, _IN_1D, _IN_2D, types.int64, _IN_INT,
+        types.int64[:], types.int32[:], types.int8[:], types.float64[:, :],
+        types.int64[:], types.float64[:], types.int64[:], _PREDICATE)
+    _BATCH_SIGNATURE = types.void(
+        types.float64[:, :], _IN_2D, _IN_2D, _IN_INT, _IN_INT, _IN_3D,
+        types.int64, _IN_INT, types.int64[:, :], types.int32[:, :],
+        types.int8[:, :], types.float64[:, :, :], types.int64[:],
+        types.int64[:, :], types.float64[:, :], types.int64[:, :],
+        _PREDICATE)
+else:
+    _DRIVERS_SIGNATURE = _ADVANCE_SIGNATURE = _RECORD_SIGNATURE = None
+    _SEASON_SIGNATURE = _BATCH_SIGNATURE = _PREDICATE_SIGNATURE = None
+
+
+@_jit(_DRIVERS_SIGNATURE)
+def _compute_drivers(params, day_of_year, tmax, tmin, solar_radiation,
+                     rainfall, rh, wind_speed, drivers):
+    """Fill the ``(days, N_DRIVERS)`` weather drivers of a season.
+
+    These terms depend only on weather and parameters, so they are
+    computed once per weather series and shared by every scenario that
+    uses the same weather, latitude, temperature cardinals and CO2.
+    """
+    co2_effect = _co2_effect(params[P_CO2])
+    for d in range(day_of_year.shape[0]):
+        drivers[d, D_DAYLENGTH] = _calc_daylength(params[P_LATITUDE],
+                                                  day_of_year[d])
+        drivers[d, D_THERMAL_TIME] = _thermal_time(
+            tmin[d], tmax[d], params[P_TBASE], params[P_TOPT],
+            params[P_TMAX_TH])
+        drivers[d, D_TEMP_EFFECT] = _temperature_effect(
+            tmax[d], tmin[d], params[P_TBASE], params[P_TOPT])
+        drivers[d, D_CO2_EFFECT] = co2_effect
+        drivers[d, D_SOLAR_RADIATION] = solar_radiation[d]
+        drivers[d, D_REFERENCE_ET] = _reference_et(solar_radiation[d],
+                                                   tmax[d], tmin[d])
+        wind_modifier = 1.0 + 0.1 * (wind_speed[d] - 2.0)
+        drivers[d, D_WIND_MODIFIER] = max(0.5, min(2.0, wind_modifier))
+        drivers[d, D_RAINFALL] = rainfall[d]
+        drivers[d, D_RESP_FACTOR] = _respiration_factor(tmin[d], tmax[d])
+
+
+@_jit(_ADVANCE_SIGNATURE)
+def _advance_day(state, params, thresholds, drivers, out):
+    """Advance the flat plant state by one day and write the output row.
+
+    ``drivers`` is the row of precomputed weather drivers for the day, so
+    only the terms that depend on the plant state are evaluated here.
+    """
+    state[S_DAP] += 1.0
+
+    # Phenology: at most one stage transition per day
+    state[S_THERMAL_TIME] += drivers[D_THERMAL_TIME]
+    stage = int(state[S_STAGE])
+    if (stage < N_STAGES - 1
+            and state[S_THERMAL_TIME] >= thresholds[stage + 1]):
+        stage += 1
+        state[S_STAGE] = stage
+
+    # Assimilation and water use with the canopy of the previous day
+    lai = state[S_LAI]
+    photosynthesis = (drivers[D_SOLAR_RADIATION] * params[P_RUE]
+                      * drivers[D_TEMP_EFFECT] * drivers[D_CO2_EFFECT]
+                      * _light_interception(params[P_K_LIGHT], lai))
+    transpiration = (drivers[D_REFERENCE_ET] * _crop_coefficient(lai)
+                     * drivers[D_WIND_MODIFIER])
+    water_stress = _water_stress(
+        params[P_FIELD_CAPACITY], params[P_WILTING_POINT],
+        state[S_ROOT_DEPTH] / 100.0, drivers[D_RAINFALL], transpiration)
+    photosynthesis *= (1 - water_stress)
+
+    # Net biomass gain per plant after maintenance respiration
+    daily_biomass = photosynthesis / params[P_PLANT_DENSITY]
+    daily_biomass -= _organ_respiration(
+        state[S_LEAF_BIOMASS], state[S_STEM_BIOMASS],
+        state[S_ROOT_BIOMASS], state[S_FRUIT_BIOMASS],
+        drivers[D_RESP_FACTOR])
+    if not daily_biomass > 0.0:
+        daily_biomass = 0.0
+
+    # Partition biomass to the organs
+    root_fraction = _PARTITION_FRACTIONS[stage, 0]
+    state[S_ROOT_BIOMASS] += daily_biomass * root_fraction
+    state[S_LEAF_BIOMASS] += daily_biomass * _PARTITION_FRACTIONS[stage, 1]
+    state[S_STEM_BIOMASS] += daily_biomass * _PARTITION_FRACTIONS[stage, 2]
+    state[S_FRUIT_BIOMASS] += daily_biomass * _PARTITION_FRACTIONS[stage, 3]
+    state[S_BIOMASS] = (state[S_ROOT_BIOMASS] + state[S_LEAF_BIOMASS]
+                        + state[S_STEM_BIOMASS] + state[S_FRUIT_BIOMASS])
+    state[S_LAI] = (state[S_LEAF_BIOMASS]
+                    * (params[P_SLA] * _SLA_FACTOR[stage]))
+    if state[S_ROOT_DEPTH] < params[P_MAX_ROOT_DEPTH]:
+        state[S_ROOT_DEPTH] = min(state[S_ROOT_DEPTH] + 0.5 * root_fraction,
+                                  params[P_MAX_ROOT_DEPTH])
+
+    # Runners, crowns and fruits
+    state[S_RUNNER_NUMBER] += _RUNNER_RATE[stage] * state[S_CROWN_NUMBER]
+    state[S_CROWN_NUMBER] += _CROWN_RATE[stage] * state[S_CROWN_NUMBER]
+    state[S_FRUIT_NUMBER] += (params[P_FRUITS_PER_CROWN]
+                              * state[S_CROWN_NUMBER] * _FRUIT_RATE[stage])
+
+    out[0] = state[S_DAP]
+    out[1] = stage
+    out[2] = state[S_THERMAL_TIME]
+    out[3] = state[S_BIOMASS]
+    out[4] = state[S_LAI]
+    out[5] = state[S_ROOT_DEPTH]
+    out[6] = state[S_FRUIT_NUMBER]
+    out[7] = state[S_FRUIT_BIOMASS]
+    out[8] = state[S_LEAF_BIOMASS]
+    out[9] = state[S_STEM_BIOMASS]
+    out[10] = state[S_ROOT_BIOMASS]
+    out[11] = state[S_CROWN_NUMBER]
+    out[12] = state[S_RUNNER_NUMBER]
+    out[13] = water_stress
+    out[14] = drivers[D_DAYLENGTH]
+    out[15] = photosynthesis
+    out[16] = transpiration
+
+
+@_jit(_RECORD_SIGNATURE)
+def _record(row, r, d, value_index, day, dap, stage, values):
+    """Store the selected outputs of day ``d`` at position ``r``."""
+    day[r] = d
+    dap[r] = int(row[0])
+    stage[r] = int(row[1])
+    for k in range(value_index.shape[0]):
+        values[k, r] = row[value_index[k] + 2]
+
+
+@_jit(_PREDICATE_SIGNATURE)
+def _never(row):
+    """Stop predicate of seasons without one."""
+    return False
+
+
+@_jit(_SEASON_SIGNATURE)
+def _simulate_season(state, params, thresholds, drivers, every, value_index,
+                     day, dap, stage, values, stage_day, last, stop,
+                     stop_when):
+    """Run the daily loop of a season into preallocated columns.
+
+    A day is recorded when its index is a multiple of ``every``; with
+    ``every == 0`` only days on which the stage changes are recorded and
+    with ``every < 0`` nothing is.  ``value_index`` selects the entries of
+    ``VALUE_COLUMNS`` kept in ``values``.  The index of the day each stage
+    is first reached goes to ``stage_day`` and the full output row of the
+    last day to ``last``.  Returns the number of recorded days.
+
+    The season ends after the first day that meets a condition of the
+    ``stop`` array or for which ``stop_when(row)`` is true.  With
+    ``stop[STOP_FILL]`` set the remaining days are then filled without
+    running the model: the plant state is held while DAP, thermal time
+    and daylength advance, and the daily rates are ``NaN``.
+    """
+    n_rows = 0
+    previous = -1
+    stop[STOP_AT] = -1
+    for d in range(drivers.shape[0]):
+        _advance_day(state, params, thresholds, drivers[d], last)
+        current = int(last[1])
+        changed = current != previous
+        if changed and stage_day[current] < 0:
+            stage_day[current] = d
+        previous = current
+        if (d % every == 0) if every > 0 else (every == 0 and changed):
+            _record(last, n_rows, d, value_index, day, dap, stage, values)
+            n_rows += 1
+        if ((stop[STOP_STAGE] >= 0 and current >= stop[STOP_STAGE])
+                or d == stop[STOP_DAY]
+                or (stop[STOP_DAP] >= 0 and last[0] >= stop[STOP_DAP])
+                or stop_when(last)):
+            stop[STOP_AT] = d
+            break
+    if stop[STOP_AT] < 0 or stop[STOP_FILL] == 0:
+        return n_rows
+
+    last[13] = np.nan
+    last[15] = np.nan
+    last[16] = np.nan
+    for d in range(stop[STOP_AT] + 1, drivers.shape[0]):
+        state[S_DAP] += 1.0
+        state[S_THERMAL_TIME] += drivers[d, D_THERMAL_TIME]
+        last[0] = state[S_DAP]
+        last[2] = state[S_THERMAL_TIME]
+        last[14] = drivers[d, D_DAYLENGTH]
+        if every > 0 and d % every == 0:
+            _record(last, n_rows, d, value_index, day, dap, stage, values)
+            n_rows += 1
+    return n_rows
+
+
+@_jit(_BATCH_SIGNATURE)
+def _simulate_batch(state, params, thresholds, n_days, driver_index,
+                    drivers, every, value_index, day, dap, stage, values,
+                    n_rows, stage_day, last, stop, stop_when):
+    """Advance many scenarios in struct-of-arrays layout.
+
+    ``state``, ``params`` and ``thresholds`` hold one column per scenario
+    and the outputs of :func:`_simulate_season` hold one block per
+    scenario.  Scenario ``j`` reads the shared driver table
+    ``drivers[driver_index[j]]`` for its first ``n_days[j]`` days so
+    seasons of different lengths can share one call.  Each season is run
+    to the end before the next one starts, which keeps the writes into its
+    output columns sequential.
+    """
+    for j in range(state.shape[1]):
+        n_rows[j] = _simulate_season(
+            state[:, j], params[:, j], thresholds[:, j],
+            drivers[driver_index[j], :n_days[j]], every, value_index, day[j],
+            dap[j], stage[j], values[j], stage_day[j], last[j], stop[j],
+            stop_when)
+
+
+@_jit(_BATCH_SIGNATURE, parallel=True)
+def _simulate_batch_parallel(state, params, thresholds, n_days,
+                             driver_index, drivers, every, value_index, day,
+                             dap, stage, values, n_rows, stage_day, last, stop,
+                             stop_when):
+    """Run the seasons of :func:`_simulate_batch` across threads.
+
+    Scenarios are independent, so each one is advanced over its whole
+    season by a single thread and the results are identical to the serial
+    kernel.
+    """
+    for j in prange(state.shape[1]):
+        n_rows[j] = _simulate_season(
+            state[:, j], params[:, j], thresholds[:, j],
+            drivers[driver_index[j], :n_days[j]], every, value_index, day[j],
+            dap[j], stage[j], values[j], stage_day[j], last[j], stop[j],
+            stop_when)
+
+
+# ---------------------------------------------------------------------------
+# Pure-NumPy engine
+#
+# Used when numba is not available.  Instead of looping over the days of
+# one scenario at a time, every day is advanced for all scenarios at once
+# with array operations over the struct-of-arrays state, so large batches
+# stay fast in plain Python.  The equations and their order of evaluation
+# follow ``_advance_day``; results agree with the compiled engine up to
+# the last-bit differences of the vectorized exp/log/trig routines.  The
+# clamps use ``np.where(x > lo, x, lo)`` rather than ``np.maximum`` so
+# that NaN (e.g. the reference ET of a day with TMAX < TMIN) is clamped
+# like the scalar ``max(lo, x)``/``min(hi, x)`` of the compiled engine
+# instead of propagating.
+# ---------------------------------------------------------------------------
+
+def _compute_drivers_numpy(params, day_of_year, tmax, tmin, solar_radiation,
+                           rainfall, rh, wind_speed, drivers):
+    """Vectorized :func:`_compute_drivers` over all days of a season."""
+    declination = 23.45 * np.sin(
+        np.deg2rad(360 * (day_of_year.astype(np.float64) - 80) / 365))
+    term = (-np.tan(np.deg2rad(params[P_LATITUDE]))
+            * np.tan(np.deg2rad(declination)))
+    daylength = 24.0 * np.arccos(np.clip(term, -1.0, 1.0)) / np.pi
+    daylength[term >= 1.0] = 0.0
+    daylength[term <= -1.0] = 24.0
+    drivers[:, D_DAYLENGTH] = daylength
+
+    tbase, topt = params[P_TBASE], params[P_TOPT]
+    drivers[:, D_THERMAL_TIME] = _thermal_time_series(
+        tmin, tmax, tbase, topt, params[P_TMAX_TH])
+    tavg = (tmax + tmin) / 2.0
+    drivers[:, D_TEMP_EFFECT] = np.where(
+        tavg <= tbase, 0.0,
+        np.where(tavg >= topt, 1.0, (tavg - tbase) / (topt - tbase)))
+    drivers[:, D_CO2_EFFECT] = _co2_effect(params[P_CO2])
+    drivers[:, D_SOLAR_RADIATION] = solar_radiation
+    drivers[:, D_REFERENCE_ET] = (0.0023 * solar_radiation
+                                  * np.sqrt(tmax - tmin) * (tavg + 17.8))
+    wind_modifier = 1.0 + 0.1 * (wind_speed - 2.0)
+    wind_modifier = np.where(wind_modifier < 2.0, wind_modifier, 2.0)
+    drivers[:, D_WIND_MODIFIER] = np.where(wind_modifier > 0.5,
+                                           wind_modifier, 0.5)
+    drivers[:, D_RAINFALL] = rainfall
+    drivers[:, D_RESP_FACTOR] = 2.0 ** (((tmin + tmax) / 2.0 - 20.0) / 10.0)
+
+
+def _advance_days(state, params, thresholds, drivers):
+    """Advance ``(N_STATE, m)`` states by one day; return the output rows.
+
+    ``drivers`` holds the driver row of the day of each scenario as a
+    ``(m, N_DRIVERS)`` array.  The ``(N_OUTPUTS, m)`` output rows match
+    the rows written by :func:`_advance_day`.
+    """
+    m = state.shape[1]
+    columns = np.arange(m)
+    state[S_DAP] += 1.0
+
+    # Phenology: at most one stage transition per day
+    state[S_THERMAL_TIME] += drivers[:, D_THERMAL_TIME]
+    stage = state[S_STAGE].astype(np.int64)
+    following = np.minimum(stage + 1, N_STAGES - 1)
+    stage += ((stage < N_STAGES - 1)
+              & (state[S_THERMAL_TIME] >= thresholds[following, columns]))
+    state[S_STAGE] = stage
+
+    # Assimilation and water use with the canopy of the previous day
+    lai = state[S_LAI]
+    photosynthesis = (drivers[:, D_SOLAR_RADIATION] * params[P_RUE]
+                      * drivers[:, D_TEMP_EFFECT] * drivers[:, D_CO2_EFFECT]
+                      * (1.0 - np.exp(-params[P_K_LIGHT] * lai)))
+    transpiration = (drivers[:, D_REFERENCE_ET]
+                     * (0.3 + 0.7 * (1.0 - np.exp(-0.7 * lai)))
+                     * drivers[:, D_WIND_MODIFIER])
+    available_water = ((params[P_FIELD_CAPACITY] - params[P_WILTING_POINT])
+                       * (state[S_ROOT_DEPTH] / 100.0))
+    deficit = transpiration - drivers[:, D_RAINFALL] * 0.7
+    deficit = np.where(deficit > 0.0, deficit, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = deficit / available_water
+        water_stress = np.where(deficit == 0.0, 0.0,
+                                np.where(ratio < 1.0, ratio, 1.0))
+    photosynthesis *= (1 - water_stress)
+
+    # Net biomass gain per plant after maintenance respiration
+    temp_factor = drivers[:, D_RESP_FACTOR]
+    daily_biomass = photosynthesis / params[P_PLANT_DENSITY]
+    daily_biomass -= (state[S_LEAF_BIOMASS] * 0.03 * temp_factor
+                      + state[S_STEM_BIOMASS] * 0.015 * temp_factor
+                      + state[S_ROOT_BIOMASS] * 0.01 * temp_factor
+                      + state[S_FRUIT_BIOMASS] * 0.01 * temp_factor)
+    daily_biomass[~(daily_biomass > 0.0)] = 0.0
+
+    # Partition biomass to the organs
+    fractions = _PARTITION_FRACTIONS[stage]
+    state[S_ROOT_BIOMASS] += daily_biomass * fractions[:, 0]
+    state[S_LEAF_BIOMASS] += daily_biomass * fractions[:, 1]
+    state[S_STEM_BIOMASS] += daily_biomass * fractions[:, 2]
+    state[S_FRUIT_BIOMASS] += daily_biomass * fractions[:, 3]
+    state[S_BIOMASS] = (state[S_ROOT_BIOMASS] + state[S_LEAF_BIOMASS]
+                        + state[S_STEM_BIOMASS] + state[S_FRUIT_BIOMASS])
+    state[S_LAI] = state[S_LEAF_BIOMASS] * (params[P_SLA]
+                                            * _SLA_FACTOR[stage])
+    growing = state[S_ROOT_DEPTH] < params[P_MAX_ROOT_DEPTH]
+    deeper = state[S_ROOT_DEPTH] + 0.5 * fractions[:, 0]
+    deeper = np.where(params[P_MAX_ROOT_DEPTH] < deeper,
+                      params[P_MAX_ROOT_DEPTH], deeper)
+    state[S_ROOT_DEPTH] = np.where(growing, deeper, state[S_ROOT_DEPTH])
+
+    # Runners, crowns and fruits
+    state[S_RUNNER_NUMBER] += _RUNNER_RATE[stage] * state[S_CROWN_NUMBER]
+    state[S_CROWN_NUMBER] += _CROWN_RATE[stage] * state[S_CROWN_NUMBER]
+    state[S_FRUIT_NUMBER] += (params[P_FRUITS_PER_CROWN]
+                              * state[S_CROWN_NUMBER] * _FRUIT_RATE[stage])
+
+    return np.stack([
+        state[S_DAP], stage.astype(np.float64), state[S_THERMAL_TIME],
+        state[S_BIOMASS], state[S_LAI], state[S_ROOT_DEPTH],
+        state[S_FRUIT_NUMBER], state[S_FRUIT_BIOMASS],
+        state[S_LEAF_BIOMASS], state[S_STEM_BIOMASS],
+        state[S_ROOT_BIOMASS], state[S_CROWN_NUMBER],
+        state[S_RUNNER_NUMBER], water_stress, drivers[:, D_DAYLENGTH],
+        photosynthesis, transpiration,
+    ])
+
+
+def _record_rows(scenarios, d, out, value_index, day, dap, stage, values,
+                 n_rows, everyone):
+    """Record the output rows ``out`` (one column each) of ``scenarios``."""
+    rows = n_rows[scenarios]
+    if everyone and rows.min() == rows.max():
+        # Every scenario writes the same row, so use plain slicing
+        rows = rows[0]
+        scenarios = slice(None)
+    day[scenarios, rows] = d
+    dap[scenarios, rows] = out[0]
+    stage[scenarios, rows] = out[1]
+    values[scenarios, :, rows] = out[value_index + 2].T
+    n_rows[scenarios] += 1
+
+
+def _simulate_batch_numpy(state, params, thresholds, n_days, driver_index,
+                          drivers, every, value_index, day, dap, stage,
+                          values, n_rows, stage_day, last, stop, stop_when):
+    """NumPy counterpart of :func:`_simulate_batch`.
+
+    Takes the same arguments and fills the same outputs, advancing each
+    day for all scenarios whose season has not ended yet.  ``stop_when``
+    is called with the ``(N_OUTPUTS, scenarios)`` output block of the day
+    and returns one flag per scenario (or a single flag for all).
+    """
+    n = state.shape[1]
+    previous = np.full(n, -1)
+    running = np.ones(n, dtype=bool)
+    n_rows[:] = 0
+    stop[:, STOP_AT] = -1
+    stopping = stop_when is not _never or (stop[:, :STOP_FILL] >= 0).any()
+    for d in range(int(n_days.max()) if n else 0):
+        within = d < n_days
+        held = ()
+        if not running.all():
+            held = np.flatnonzero(within & ~running & (stop[:, STOP_FILL] != 0))
+        if len(held):
+            tables = driver_index[held]
+            state[S_DAP, held] += 1.0
+            state[S_THERMAL_TIME, held] += drivers[tables, d, D_THERMAL_TIME]
+            last[held, 0] = state[S_DAP, held]
+            last[held, 2] = state[S_THERMAL_TIME, held]
+            last[held, 14] = drivers[tables, d, D_DAYLENGTH]
+            if every > 0 and d % every == 0:
+                _record_rows(held, d, last[held].T, value_index, day, dap,
+                             stage, values, n_rows, False)
+
+        active = np.flatnonzero(within & running)
+        if not len(active):
+            continue
+        everyone = len(active) == n
+        columns = slice(None) if everyone else active
+        day_state = state if everyone else state[:, active]
+        out = _advance_days(
+            day_state, params[:, columns], thresholds[:, columns],
+            drivers[driver_index[columns], d])
+        if not everyone:
+            state[:, active] = day_state
+        last[active] = out.T
+
+        current = out[1].astype(np.int64)
+        changed = current != previous[active]
+        first = changed & (stage_day[active, current] < 0)
+        stage_day[active[first], current[first]] = d
+        previous[active] = current
+        if every > 0:
+            recorded = np.full(len(active), d % every == 0)
+        elif every == 0:
+            recorded = changed
+        else:
+            recorded = np.zeros(len(active), dtype=bool)
+        if recorded.any():
+            _record_rows(active[recorded], d, out[:, recorded], value_index,
+                         day, dap, stage, values, n_rows,
+                         everyone and recorded.all())
+
+        if not stopping:
+            continue
+        limits = stop[active]
+        fired = (((limits[:, STOP_STAGE] >= 0)
+                  & (current >= limits[:, STOP_STAGE]))
+                 | (limits[:, STOP_DAY] == d)
+                 | ((limits[:, STOP_DAP] >= 0)
+                    & (out[0] >= limits[:, STOP_DAP]))
+                 | np.broadcast_to(np.asarray(stop_when(out), dtype=bool),
+                                   len(active)))
+        if fired.any():
+            ended = active[fired]
+            stop[ended, STOP_AT] = d
+            running[ended] = False
+            filled = ended[stop[ended, STOP_FILL] != 0]
+            last[filled[:, None], [13, 15, 16]] = np.nan
+
+
+def _simulate_season_numpy(state, params, thresholds, drivers, every,
+                           value_index, day, dap, stage, values, stage_day,
+                           last, stop, stop_when):
+    """NumPy counterpart of :func:`_simulate_season` (a batch of one)."""
+    n_rows = np.zeros(1, dtype=np.int64)
+    _simulate_batch_numpy(
+        state[:, None], params[:, None], thresholds[:, None],
+        np.array([len(drivers)]), np.zeros(1, dtype=np.int64),
+        drivers[None], every, value_index, day[None], dap[None], stage[None],
+        values[None], n_rows, stage_day[None], last[None], stop[None],
+        stop_when)
+    return int(n_rows[0])
+
+
+# Engine entry points of the active backend
+if BACKEND == 'numba':
+    _drivers_engine = _compute_drivers
+    _season_engine = _simulate_season
+    _batch_engine = _simulate_batch
+else:
+    _drivers_engine = _compute_drivers_numpy
+    _season_engine = _simulate_season_numpy
+    _batch_engine = _simulate_batch_numpy
+
+
+def _thermal_time_series(tmin, tmax, tbase, topt, tmax_th):
+    """Vectorized :func:`_thermal_time` over whole weather arrays."""
+    tavg = (tmin + tmax) / 2.0
+    return np.select(
+        [tavg <= tbase, tavg <= topt, tavg <= tmax_th],
+        [0.0, tavg - tbase,
+         topt - tbase - (tavg - topt) * ((topt - tbase) / (tmax_th - topt))],
+        default=0.0,
+    )
+
+
+def _day_of_year(dates):
+    """Return the day of year (1-366) for an array of ``datetime64`` days."""
+    dates = dates.astype('datetime64[D]')
+    return (dates - dates.astype('datetime64[Y]')).astype(np.int64) + 1
+
+
+def _weather_arrays(weather_data_df):
+    """Return contiguous float arrays for the engine from weather data."""
+    return {
+        column: np.ascontiguousarray(weather_data_df[column],
+                                     dtype=np.float64)
+        for column in WEATHER_COLUMNS
+    }
+
+
+def _season_window(dates, planting_date, end_date=None):
+    """Return the ``slice`` of ``dates`` from planting to ``end_date``.
+
+    The planting day is found by binary search on the day ordinals of the
+    sorted weather dates; the window ends on ``end_date`` (inclusive) or
+    with the weather.
+    """
+    planting = np.datetime64(planting_date, 'D')
+    start = int(np.searchsorted(dates, planting))
+    if start >= len(dates) or dates[start] != planting:
+        raise ValueError(
+            f"Planting date {planting} must fall within the weather data")
+    stop = len(dates)
+    if end_date is not None:
+        stop = int(np.searchsorted(dates, np.datetime64(end_date, 'D'),
+                                   side='right'))
+        if stop <= start:
+            raise ValueError(
+                f"End date {end_date} precedes planting date {planting}")
+    return slice(start, stop)
+
+
+def _stage_window(window, dates, weather, cultivar_params, thresholds,
+                  stage):
+    """Shorten ``window`` to end on the day ``stage`` is entered.
+
+    The day comes from :func:`stage_calendar`, so the season is cut
+    before it is simulated; the window is unchanged if the stage is not
+    reached.
+    """
+    names = list(STAGE_NAMES)
+    if stage not in names:
+        raise ValueError(f"Unknown stage {stage!r}; expected one of {names}")
+    season = {'date': dates[window], 'tmin': weather['tmin'][window],
+              'tmax': weather['tmax'][window]}
+    reached = stage_calendar(season, dates[window.start], cultivar_params,
+                             thresholds)[names.index(stage)]
+    if np.isnat(reached):
+        return window
+    return slice(window.start, window.start + int(
+        (reached - dates[window.start]).astype(np.int64)) + 1)
+
+
+@dataclass
+class StopCondition:
+    """
+    Conditions that end a season early, checked inside the engine loop.
+
+    The season stops after the first day that meets any of the set
+    conditions.  By default the results end on that day; with ``fill``
+    the remaining days are still recorded, holding the plant state while
+    DAP, thermal time and daylength advance, and with the daily
+    ``water_stress``, ``photosynthesis`` and ``transpiration`` as ``NaN``.
+
+    Attributes:
+    -----------
+    stage : str, optional
+        Stop on the day the crop enters this stage of ``STAGE_NAMES`` (or
+        a later one), e.g. ``'SENESCENCE'``
+    date : str, optional
+        Stop on this date in format 'YYYY-MM-DD', which must be a day of
+        the season's weather
+    dap : int, optional
+        Stop once the days after planting reach this value
+    when : callable, optional
+        Stop on the first day ``when(row)`` is true, with ``row`` the
+        output of the day ordered as ``OUTPUT_COLUMNS``.  With numba it is
+        compiled for ``boolean(float64[:])``; the NumPy engine passes a
+        ``(N_OUTPUTS, scenarios)`` block instead, so element-wise tests
+        such as ``row[3] > 500.0`` suit both
+    fill : bool, optional
+        Keep recording to the end of the season once stopped
+    """
+    stage: str = None
+    date: str = None
+    dap: int = None
+    when: object = None
+    fill: bool = False
+
+
+# Stop predicates compiled for the engine, keyed by the Python function
+_STOP_PREDICATES = {}
+
+
+def _stop_array(stop, dates):
+    """Return the engine stop array of a :class:`StopCondition`.
+
+    ``dates`` are the days of the season the stop date is looked up in;
+    a stop date that is not one of them raises ``ValueError``.
+    """
+    array = np.full(N_STOP, -1, dtype=np.int64)
+    array[STOP_FILL] = 0
+    if stop is None:
+        return array
+    if stop.stage is not None:
+        if stop.stage not in STAGE_CODES:
+            raise ValueError(f"Unknown stage {stop.stage!r}; "
+                             f"expected one of {list(STAGE_NAMES)}")
+        array[STOP_STAGE] = STAGE_CODES[stop.stage]
+    if stop.date is not None:
+        date = np.datetime64(stop.date, 'D')
+        day = int(np.searchsorted(dates, date))
+        if day == len(dates) or dates[day] != date:
+            if len(dates) and dates[0] <= date <= dates[-1]:
+                raise ValueError(f"Stop date {stop.date} falls in a gap "
+                                 f"of the weather data")
+            raise ValueError(f"Stop date {stop.date} is outside the season "
+                             f"({_date_range(dates)})")
+        array[STOP_DAY] = day
+    if stop.dap is not None:
+        array[STOP_DAP] = int(stop.dap)
+    array[STOP_FILL] = int(bool(stop.fill))
+    return array
+
+
+def _date_range(dates):
+    """Describe the first and last of ``dates`` for error messages."""
+    if not len(dates):
+        return 'no weather days'
+    return f"{dates[0]} to {dates[-1]}"
+
+
+def _stop_predicate(stop):
+    """Return the ``when`` test of a :class:`StopCondition` for the engine."""
+    when = None if stop is None else stop.when
+    if when is None:
+        return _never
+    function = getattr(when, 'py_func', when)
+    if BACKEND != 'numba':
+        return function
+    predicate = _STOP_PREDICATES.get(function)
+    if predicate is None:
+        predicate = njit(_PREDICATE_SIGNATURE, nogil=True)(function)
+        _STOP_PREDICATES[function] = predicate
+    return predicate
+
+
+# Days between the state checkpoints kept by CropgroStrawberry.resimulate
+CHECKPOINT_EVERY = 14
+
+# Recently used weather drivers keyed by a digest of weather and parameters
+_DRIVER_CACHE = OrderedDict()
+_DRIVER_CACHE_SIZE = 256
+_DRIVER_CACHE_LOCK = threading.Lock()
+
+
+def _season_drivers(dates, weather, params):
+    """Return the ``(days, N_DRIVERS)`` drivers of a season, cached.
+
+    The cache is keyed by the content of the weather arrays and the
+    driver parameters, so calibration runs that only change ``rue``,
+    ``sla`` or ``k_light`` reuse the drivers of the first run.
+    """
+    day_of_year = _day_of_year(np.asarray(dates).astype('datetime64[D]'))
+    digest = hashlib.blake2b(day_of_year.tobytes(), digest_size=16)
+    for column in WEATHER_COLUMNS:
+        digest.update(weather[column].tobytes())
+    digest.update(params[_DRIVER_PARAMS].tobytes())
+    key = digest.digest()
+
+    with _DRIVER_CACHE_LOCK:
+        drivers = _DRIVER_CACHE.get(key)
+        if drivers is not None:
+            _DRIVER_CACHE.move_to_end(key)
+            return drivers
+    drivers = np.empty((len(day_of_year), N_DRIVERS))
+    _drivers_engine(params, day_of_year,
+                    *(weather[c] for c in WEATHER_COLUMNS), drivers)
+    with _DRIVER_CACHE_LOCK:
+        _DRIVER_CACHE[key] = drivers
+        if len(_DRIVER_CACHE) > _DRIVER_CACHE_SIZE:
+            _DRIVER_CACHE.popitem(last=False)
+    return drivers
+
+
+def _param_vector(latitude, soil_properties, cultivar_params):
+    """Return cultivar, soil and site parameters as a flat engine array."""
+    params = np.empty(N_PARAMS)
+    params[P_TBASE] = cultivar_params['tbase']
+    params[P_TOPT] = cultivar_params['topt']
+    params[P_TMAX_TH] = cultivar_params['tmax_th']
+    params[P_RUE] = cultivar_params['rue']
+    params[P_K_LIGHT] = cultivar_params['k_light']
+    params[P_SLA] = cultivar_params['sla']
+    params[P_FRUITS_PER_CROWN] = cultivar_params['potential_fruits_per_crown']
+    params[P_MAX_ROOT_DEPTH] = soil_properties['max_root_depth']
+    params[P_FIELD_CAPACITY] = soil_properties['field_capacity']
+    params[P_WILTING_POINT] = soil_properties['wilting_point']
+    params[P_LATITUDE] = latitude
+    params[P_CO2] = 400.0
+    params[P_PLANT_DENSITY] = cultivar_params.get('plant_density', 5.0)
+    return params
+
+
+def _state_vector(plant_state, thermal_time=0.0, days_after_planting=0,
+                  stage_names=STAGE_NAMES):
+    """Return a :class:`PlantState` as a flat engine state array."""
+    state = np.zeros(N_STATE)
+    state[S_BIOMASS] = plant_state.biomass
+    state[S_LAI] = plant_state.leaf_area_index
+    state[S_ROOT_DEPTH] = plant_state.root_depth
+    state[S_FRUIT_NUMBER] = plant_state.fruit_number
+    state[S_FRUIT_BIOMASS] = plant_state.fruit_biomass
+    state[S_LEAF_BIOMASS] = plant_state.leaf_biomass
+    state[S_STEM_BIOMASS] = plant_state.stem_biomass
+    state[S_ROOT_BIOMASS] = plant_state.root_biomass
+    state[S_STAGE] = list(stage_names).index(plant_state.phenological_stage)
+    state[S_DEV_RATE] = plant_state.development_rate
+    state[S_CROWN_NUMBER] = plant_state.crown_number
+    state[S_RUNNER_NUMBER] = plant_state.runner_number
+    state[S_THERMAL_TIME] = thermal_time
+    state[S_DAP] = days_after_planting
+    return state
+
+
+def _record_every(frequency):
+    """Translate a recording frequency into the ``every`` kernel argument.
+
+    ``'daily'`` records every day, an integer ``n`` every ``n`` days
+    starting on the first, ``'stage'`` the days on which the stage changes
+    and ``'summary'`` no days at all.
+    """
+    if isinstance(frequency, str):
+        codes = {'daily': 1, 'stage': 0, 'summary': -1}
+        if frequency not in codes:
+            raise ValueError(
+                f"Unknown output frequency {frequency!r}; expected "
+                f"'daily', 'stage', 'summary' or a number of days")
+        return codes[frequency]
+    if int(frequency) != frequency or frequency < 1:
+        raise ValueError(
+            f"Output frequency must be a positive number of days, "
+            f"got {frequency!r}")
+    return int(frequency)
+
+
+def _record_capacity(every, n_days, n_stages):
+    """Return the number of rows recorded for a season of ``n_days``."""
+    if every > 0:
+        return -(-n_days // every)
+    if every == 0:
+        return min(n_days, n_stages)
+    return 0
+
+
+def _value_columns(variables):
+    """Return the names and ``VALUE_COLUMNS`` indices of output variables."""
+    if variables is None:
+        variables = VALUE_COLUMNS
+    elif isinstance(variables, str):
+        variables = (variables,)
+    unknown = [v for v in variables if v not in VALUE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown output variables: {', '.join(unknown)}")
+    variables = tuple(variables)
+    return variables, np.array([VALUE_COLUMNS.index(v) for v in variables],
+                               dtype=np.int64)
+
+
+def _stage_dates(dates, stage_day):
+    """Map the first day index of each stage to dates (``NaT`` if unset)."""
+    stage_dates = np.full(stage_day.shape, np.datetime64('NaT'),
+                          dtype='datetime64[D]')
+    reached = stage_day >= 0
+    stage_dates[reached] = dates[stage_day[reached]]
+    return stage_dates
+
+
+class SimulationResults:
+    """
+    Model outputs stored as preallocated typed columns.
+
+    ``dap`` and ``stage`` are integer columns (``stage`` holds codes into
+    ``stage_names``) and the float outputs listed in ``variables`` are the
+    rows of ``values``.  Conversion to pandas only happens in
+    :meth:`to_frame`.  Indexing with a position returns the record of one
+    day as a dict, so the buffer can be used like the former list of
+    daily records.
+
+    Whatever days were recorded, ``final`` holds the full output row
+    (``OUTPUT_COLUMNS``) of the last simulated day and ``stage_dates`` the
+    date each stage was first reached; :meth:`summary` reports both.
+    """
+
+    def __init__(self, capacity=0, stage_names=STAGE_NAMES, dates=None,
+                 dap=None, stage=None, values=None, size=None,
+                 variables=VALUE_COLUMNS, final=None, stage_dates=None):
+        self.stage_names = tuple(stage_names)
+        self.variables = tuple(variables)
+        self.dates = (np.empty(capacity, dtype='datetime64[D]')
+                      if dates is None else dates)
+        self.dap = np.zeros(capacity, dtype=np.int32) if dap is None else dap
+        self.stage = (np.zeros(capacity, dtype=np.int8)
+                      if stage is None else stage)
+        self.values = (np.empty((len(self.variables), capacity))
+                       if values is None else values)
+        self.size = 0 if size is None else size
+        self.final = np.full(N_OUTPUTS, np.nan) if final is None else final
+        self.stage_dates = (
+            np.full(len(self.stage_names), np.datetime64('NaT'),
+                    dtype='datetime64[D]')
+            if stage_dates is None else stage_dates)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.column(key)
+        if key < 0:
+            key += self.size
+        if not 0 <= key < self.size:
+            raise IndexError("results index out of range")
+        record = {
+            'date': str(self.dates[key]),
+            'dap': int(self.dap[key]),
+            'stage': self.stage_names[self.stage[key]],
+        }
+        for name, column in zip(self.variables, self.values[:, key]):
+            record[name] = float(column)
+        return record
+
+    def __iter__(self):
+        return (self[i] for i in range(self.size))
+
+    def column(self, name):
+        """Return the filled part of one output column."""
+        if name == 'date':
+            return self.dates[:self.size]
+        if name == 'dap':
+            return self.dap[:self.size]
+        if name == 'stage':
+            return self.stage[:self.size]
+        if name not in self.variables:
+            raise KeyError(f"{name!r} was not recorded")
+        return self.values[self.variables.index(name), :self.size]
+
+    def stage_labels(self):
+        """Return the stage of every day as names instead of codes."""
+        return np.array(self.stage_names, dtype=object)[self.column('stage')]
+
+    def summary(self, variables=('fruit_biomass', 'biomass')):
+        """
+        Return end-of-season values and the stage dates.
+
+        Parameters:
+        -----------
+        variables : sequence of str, optional
+            Entries of ``OUTPUT_COLUMNS`` reported for the last day
+
+        Returns:
+        --------
+        dict
+            Final value of each variable and, under ``'stage_dates'``, the
+            date each stage was reached (None if it was not)
+        """
+        summary = {name: float(self.final[OUTPUT_COLUMNS.index(name)])
+                   for name in variables}
+        summary['stage_dates'] = {
+            name: (None if np.isnat(date) else date.astype(object))
+            for name, date in zip(self.stage_names, self.stage_dates)
+        }
+        return summary
+
+    def _reserve(self, size):
+        """Grow the buffer to hold at least ``size`` records."""
+        if size <= len(self.dap):
+            return
+        capacity = max(16, 2 * self.size, size)
+        self.dates = np.resize(self.dates, capacity)
+        self.dap = np.resize(self.dap, capacity)
+        self.stage = np.resize(self.stage, capacity)
+        values = np.empty((len(self.variables), capacity))
+        values[:, :self.size] = self.values[:, :self.size]
+        self.values = values
+
+    def append(self, record):
+        """Append the record of one day, growing the buffer if needed."""
+        self._reserve(self.size + 1)
+        i = self.size
+        date = np.datetime64(record['date'], 'D')
+        stage = self.stage_names.index(record['stage'])
+        self.dates[i] = date
+        self.dap[i] = record['dap']
+        self.stage[i] = stage
+        for k, name in enumerate(self.variables):
+            self.values[k, i] = record[name]
+        self.final[0] = record['dap']
+        self.final[1] = stage
+        for k, name in enumerate(VALUE_COLUMNS):
+            self.final[k + 2] = record[name]
+        if np.isnat(self.stage_dates[stage]):
+            self.stage_dates[stage] = date
+        self.size += 1
+
+    def extend(self, other):
+        """Append the results of a later part of the season.
+
+        ``other`` must record the same variables; its last day becomes
+        ``final`` and it dates the stages not reached before.
+        """
+        if other.variables != self.variables:
+            raise ValueError("Results record different variables")
+        rows = slice(self.size, self.size + other.size)
+        self._reserve(rows.stop)
+        self.dates[rows] = other.dates[:other.size]
+        self.dap[rows] = other.dap[:other.size]
+        self.stage[rows] = other.stage[:other.size]
+        self.values[:, rows] = other.values[:, :other.size]
+        self.size = rows.stop
+        if not np.isnan(other.final[0]):
+            self.final[:] = other.final
+        unset = np.isnat(self.stage_dates)
+        self.stage_dates[unset] = other.stage_dates[unset]
+
+    def to_frame(self):
+        """Return the results as a DataFrame with a categorical stage."""
+        import pandas as pd
+
+        columns = {
+            'date': np.datetime_as_string(self.column('date'), unit='D'),
+            'dap': self.column('dap'),
+            'stage': pd.Categorical.from_codes(self.column('stage'),
+                                               self.stage_names),
+        }
+        for k, name in enumerate(self.variables):
+            columns[name] = self.values[k, :self.size]
+        return pd.DataFrame(columns)
+
+
 class CropgroStrawberry:
     """
     A Python implementation of the CROPGRO-Strawberry crop model.
     
     This model simulates strawberry growth and development based on 
     environmental conditions, plant characteristics, and management practices.
+
+    Each instance owns its state and results and the compiled kernels
+    release the GIL, so separate instances can be driven from several
+    threads at once.
     """
     
     def __init__(self, latitude, planting_date, soil_properties, 
@@ -175,21 +1394,18 @@ class CropgroStrawberry:
         self.thermal_time = 0.0
         
         # Phenological stages and their thermal time requirements
-        self.phenology_stages = {
-            'GERMINATION': 0,
-            'EMERGENCE': 50,
-            'JUVENILE': 100, 
-            'VEGETATIVE': 200,
-            'FLORAL_INDUCTION': 400,
-            'FLOWERING': 600,
-            'FRUIT_SET': 700,
-            'FRUIT_DEVELOPMENT': 800,
-            'FRUIT_MATURITY': 1000,
-            'SENESCENCE': 1500
-        }
+        self.phenology_stages = dict(zip(STAGE_NAMES, STAGE_THRESHOLDS))
         
         # Results storage
-        self.results = []
+        self.results = SimulationResults(
+            stage_names=self.phenology_stages)
+
+        # Last simulated day (None before the season starts)
+        self.last_date = None
+
+        # Weather, parameters and state checkpoints of the last
+        # resimulate() run (None when results come from another method)
+        self._history = None
         
     def calculate_daylength(self, day_of_year):
         """
@@ -228,6 +1444,29 @@ class CropgroStrawberry:
         tmax_th = self.cultivar['tmax_th']  # Maximum threshold temperature
         
         return _thermal_time(tmin, tmax, tbase, topt, tmax_th)
+
+    def stage_calendar(self, weather_data_df):
+        """
+        Return the date each phenological stage is reached from planting.
+
+        Parameters:
+        -----------
+        weather_data_df : pandas.DataFrame, mapping or structured array
+            Daily weather covering the planting date
+
+        Returns:
+        --------
+        dict
+            Stage name mapped to the date it is entered (``None`` if the
+            stage is not reached within the weather data)
+        """
+        calendar = stage_calendar(
+            weather_data_df, self.planting_date.strftime('%Y-%m-%d'),
+            self.cultivar, list(self.phenology_stages.values()))
+        return {
+            stage: None if np.isnat(date) else date.astype(datetime)
+            for stage, date in zip(self.phenology_stages, calendar)
+        }
     
     def update_phenology(self, thermal_time_today):
         """
@@ -442,6 +1681,10 @@ class CropgroStrawberry:
     def simulate_day(self, weather_data):
         """
         Simulate one day of strawberry growth.
+
+        The day is stepped with the per-day methods of the model, whatever
+        its date; ``last_date`` becomes this day, so a later
+        :meth:`advance` continues from it.
         
         Parameters:
         -----------
@@ -496,8 +1739,8 @@ class CropgroStrawberry:
         photosynthesis *= (1 - water_stress)
         
         # Convert canopy assimilation to per-plant biomass
-        # Assume a density of five plants per square metre
-        plant_density = 5.0  # plants/m²
+        # (five plants per square metre unless the cultivar sets PPOP)
+        plant_density = self.cultivar.get('plant_density', 5.0)  # plants/m²
         daily_biomass = photosynthesis / plant_density
         
         # Subtract respiration costs from produced biomass
@@ -534,6 +1777,11 @@ class CropgroStrawberry:
             'photosynthesis': photosynthesis,
             'transpiration': transpiration
         })
+
+        # The state now ends on this day: advance() continues from it, and
+        # resimulate() has no checkpoints of it to restart from
+        self.last_date = np.datetime64(current_date.date(), 'D')
+        self._history = None
     
     def calculate_water_stress(self, rainfall, transpiration):
         """
@@ -582,86 +1830,418 @@ class CropgroStrawberry:
             tmax,
         )
     
-    def simulate_growth(self, weather_data_df):
+    def simulate_growth(self, weather_data_df, as_frame=True,
+                        variables=None, frequency='daily', end_date=None,
+                        until_stage=None, stop=None):
         """
-        Simulate strawberry growth for a period defined by the weather data.
+        Simulate strawberry growth from the planting date.
+
+        The planting date is located in the weather dates by binary search
+        and only the days from planting to ``end_date`` (or the end of the
+        weather) are simulated, so DAP 1 is the planting day.
         
         Parameters:
         -----------
-        weather_data_df : pandas.DataFrame
-            DataFrame containing daily weather data with the following columns:
-            - date: Date in 'YYYY-MM-DD' format
+        weather_data_df : pandas.DataFrame, mapping or structured array
+            Daily weather data with the following columns:
+            - date: Date in 'YYYY-MM-DD' format or ``datetime64``
             - tmax: Maximum temperature (°C)
             - tmin: Minimum temperature (°C)
             - solar_radiation: Solar radiation (MJ/m²)
             - rainfall: Rainfall (mm)
             - rh: Relative humidity (%)
             - wind_speed: Wind speed (m/s)
+        as_frame : bool, optional
+            Return a DataFrame (default) or the columnar
+            :class:`SimulationResults` buffer without converting to pandas
+        variables : sequence of str, optional
+            Entries of ``VALUE_COLUMNS`` to record (default: all); date,
+            dap and stage are always kept
+        frequency : str or int, optional
+            Days to record: ``'daily'`` (default), a number of days
+            between records, ``'stage'`` for the days a new stage is
+            entered or ``'summary'`` for none
+        end_date : str, optional
+            Last day to simulate in format 'YYYY-MM-DD', such as the
+            final harvest (default: the last day of the weather)
+        until_stage : str, optional
+            Stop on the day the crop enters this stage of ``STAGE_NAMES``,
+            e.g. ``'SENESCENCE'``, if that comes before ``end_date``
+        stop : StopCondition, optional
+            Conditions checked each day that end the season early, or
+            hold the plant state for the rest of it
+
+        Returns:
+        --------
+        pandas.DataFrame, SimulationResults or dict
+            Recorded simulation results; with ``frequency='summary'`` the
+            dict of :meth:`SimulationResults.summary`
+        """
+        every = _record_every(frequency)
+        variables, value_index = _value_columns(variables)
+        dates = np.asarray(weather_data_df['date']).astype('datetime64[D]')
+        weather = _weather_arrays(weather_data_df)
+        window = _season_window(dates, self.planting_date, end_date)
+        if until_stage is not None:
+            window = _stage_window(window, dates, weather, self.cultivar,
+                                   self._stage_thresholds(), until_stage)
+        weather = {column: values[window]
+                   for column, values in weather.items()}
+        results = self._run_season(dates[window], weather, every, variables,
+                                   value_index, stop)
+
+        self.results = results
+        self._history = None
+        if every < 0:
+            return results.summary()
+        return results.to_frame() if as_frame else results
+
+    def advance(self, weather_data_df, as_frame=True):
         """
-        # Reset results
-        self.results = []
-        
-        # Simulate each day using itertuples for speed
-        for row in weather_data_df.itertuples(index=False):
-            weather_day = {
-                'date': row.date,
-                'tmax': row.tmax,
-                'tmin': row.tmin,
-                'solar_radiation': row.solar_radiation,
-                'rainfall': row.rainfall,
-                'rh': row.rh,
-                'wind_speed': row.wind_speed,
-            }
-            self.simulate_day(weather_day)
-        
-        # Convert results to DataFrame
-        self.results_df = pd.DataFrame(self.results)
-        return self.results_df
+        Continue the season with the days after the last simulated one.
+
+        The model carries on from its current state, so keeping a season
+        up to date from a daily feed (see ``dssat_weather.WeatherFeed``)
+        costs only the new days instead of a rerun from planting.  Days up
+        to the last simulated one are skipped; a season not started yet
+        begins on the planting date.  The new days are recorded daily and
+        appended to ``results``.
+
+        Parameters:
+        -----------
+        weather_data_df : pandas.DataFrame, mapping or structured array
+            Daily weather as for :meth:`simulate_growth`; it must continue
+            without a gap from the last simulated day
+        as_frame : bool, optional
+            Return a DataFrame (default) or a :class:`SimulationResults`
+
+        Returns:
+        --------
+        pandas.DataFrame or SimulationResults
+            Results of the newly simulated days
+        """
+        dates = np.asarray(weather_data_df['date']).astype('datetime64[D]')
+        weather = _weather_arrays(weather_data_df)
+        if self.last_date is None:
+            window = _season_window(dates, self.planting_date)
+        else:
+            start = int(np.searchsorted(dates, self.last_date, side='right'))
+            if start < len(dates) and dates[start] != self.last_date + 1:
+                raise ValueError(f"Weather resumes on {dates[start]}, "
+                                 f"expected {self.last_date + 1}")
+            window = slice(start, len(dates))
+        weather = {column: values[window]
+                   for column, values in weather.items()}
+        variables, value_index = _value_columns(self.results.variables)
+        results = self._run_season(dates[window], weather, 1, variables,
+                                   value_index)
+
+        self.results.extend(results)
+        if self._history is not None:
+            history = self._history
+            history['dates'] = np.concatenate([history['dates'],
+                                               dates[window]])
+            for column, values in weather.items():
+                history['weather'][column] = np.concatenate(
+                    [history['weather'][column], values])
+        return results.to_frame() if as_frame else results
+
+    def resimulate(self, weather_data_df, as_frame=True,
+                   checkpoint_every=CHECKPOINT_EVERY):
+        """
+        Simulate the season, recomputing only what revised weather changed.
+
+        The first call simulates from planting to the end of the weather,
+        recording every day and keeping the state at the start of every
+        ``checkpoint_every`` days.  Later calls compare the weather with
+        the previous one, restart from the last checkpoint before the
+        first changed (or new) day and recompute only the rest of the
+        season; the results from that day on are replaced, so none of
+        them survive a revision of earlier weather.
+
+        Parameters:
+        -----------
+        weather_data_df : pandas.DataFrame, mapping or structured array
+            Daily weather as for :meth:`simulate_growth`, with any revised
+            or appended days
+        as_frame : bool, optional
+            Return a DataFrame (default) or the :class:`SimulationResults`
+        checkpoint_every : int, optional
+            Days between state checkpoints
+
+        Returns:
+        --------
+        pandas.DataFrame or SimulationResults
+            Daily results of the whole season
+        """
+        dates = np.asarray(weather_data_df['date']).astype('datetime64[D]')
+        window = _season_window(dates, self.planting_date)
+        dates = dates[window]
+        weather = _weather_arrays(weather_data_df)
+        weather = {column: values[window].copy()
+                   for column, values in weather.items()}
+        params = self._pack_params()
+        n = len(dates)
+
+        # First day whose weather differs from the previous run
+        history = self._history
+        start = 0
+        if (history is not None and history['every'] == checkpoint_every
+                and np.array_equal(history['params'], params)):
+            m = min(n, len(history['dates']))
+            changed = history['dates'][:m] != dates[:m]
+            for column in WEATHER_COLUMNS:
+                old = history['weather'][column][:m]
+                new = weather[column][:m]
+                changed |= (old != new) & ~(np.isnan(old) & np.isnan(new))
+            start = int(np.argmax(changed)) if changed.any() else m
+            if start == n == len(history['dates']):
+                return self.results.to_frame() if as_frame else self.results
+
+        # Restart from the checkpoint before that day (the initial state
+        # when parameters changed); the last day is always recomputed so
+        # the final outputs are current
+        if history is not None:
+            restart = min(min(start, n - 1) // checkpoint_every,
+                          len(history['checkpoints']) - 1)
+            checkpoints = list(history['checkpoints'][:restart + 1])
+            state = checkpoints.pop().copy()
+        else:
+            # Without checkpoints start from the newly planted crop, not
+            # from a state left by simulate_growth() or advance()
+            restart = 0
+            checkpoints = []
+            state = _state_vector(PlantState(),
+                                  stage_names=list(self.phenology_stages))
+        first = restart * checkpoint_every
+
+        results = SimulationResults(n, self.phenology_stages)
+        if first:
+            previous = self.results
+            results.dates[:first] = previous.dates[:first]
+            results.dap[:first] = previous.dap[:first]
+            results.stage[:first] = previous.stage[:first]
+            results.values[:, :first] = previous.values[:, :first]
+        results.dates[first:] = dates[first:]
+        results.size = n
+
+        drivers = _season_drivers(
+            dates[first:], {column: values[first:]
+                            for column, values in weather.items()}, params)
+        thresholds = self._stage_thresholds()
+        variables, value_index = _value_columns(None)
+        day = np.empty(checkpoint_every, dtype=np.int64)
+        stage_day = np.full(len(self.phenology_stages), -1, dtype=np.int64)
+        stop = _stop_array(None, dates)
+        for begin in range(first, n, checkpoint_every):
+            end = min(begin + checkpoint_every, n)
+            checkpoints.append(state.copy())
+            _season_engine(
+                state, params, thresholds, drivers[begin - first:end - first],
+                1, value_index, day, results.dap[begin:end],
+                results.stage[begin:end], results.values[:, begin:end],
+                stage_day, results.final, stop, _never)
+        codes, entered = np.unique(results.stage[:n], return_index=True)
+        results.stage_dates[codes] = results.dates[entered]
+
+        self._unpack_state(state)
+        self.last_date = dates[-1]
+        self.results = results
+        self._history = {
+            'every': checkpoint_every,
+            'params': params,
+            'dates': dates,
+            'weather': weather,
+            'checkpoints': np.array(checkpoints),
+        }
+        return results.to_frame() if as_frame else results
+
+    def _run_season(self, dates, weather, every, variables, value_index,
+                    stop=None):
+        """Simulate ``dates`` from the current state in the engine.
+
+        Returns the recorded :class:`SimulationResults` and leaves the
+        state of the last simulated day on the model.
+        """
+        params = self._pack_params()
+        drivers = _season_drivers(dates, weather, params)
+
+        # Run the whole season in the compiled engine
+        state = self._pack_state()
+        results = SimulationResults(
+            _record_capacity(every, len(dates), len(self.phenology_stages)),
+            self.phenology_stages, variables=variables)
+        day = np.empty(len(results.dap), dtype=np.int64)
+        stage_day = np.full(len(self.phenology_stages), -1, dtype=np.int64)
+        stops = _stop_array(stop, dates)
+        results.size = _season_engine(
+            state, params, self._stage_thresholds(), drivers, every,
+            value_index, day, results.dap, results.stage, results.values,
+            stage_day, results.final, stops, _stop_predicate(stop))
+        results.dates[:results.size] = dates[day[:results.size]]
+        results.stage_dates = _stage_dates(dates, stage_day)
+        self._unpack_state(state)
+        if len(dates):
+            halted = stops[STOP_AT] >= 0 and not stops[STOP_FILL]
+            self.last_date = dates[stops[STOP_AT] if halted else -1]
+        return results
+
+    def snapshot(self):
+        """
+        Return the full model state as a fixed-layout binary record.
+
+        The record (a ``SNAPSHOT_DTYPE`` scalar) holds the parameters,
+        the plant state, the last simulated day with its outputs and the
+        stage dates, but not the daily results.  ``snapshot.tobytes()``
+        gives its compact binary form and arrays of snapshots can be
+        written with ``tofile`` and read back with ``np.fromfile``.
+        """
+        record = np.zeros((), dtype=SNAPSHOT_DTYPE)
+        record['version'] = SNAPSHOT_VERSION
+        record['cultivar'] = str(self.cultivar.get('name', '')).encode()
+        record['planting_date'] = np.datetime64(self.planting_date, 'D')
+        record['last_date'] = (np.datetime64('NaT') if self.last_date is None
+                               else self.last_date)
+        record['params'] = self._pack_params()
+        record['thresholds'] = self._stage_thresholds()
+        record['state'] = self._pack_state()
+        record['final'] = self.results.final
+        record['stage_dates'] = self.results.stage_dates
+        return record[()]
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """
+        Rebuild a model from :meth:`snapshot`, ready to continue.
+
+        Parameters:
+        -----------
+        snapshot : numpy.void or bytes
+            A ``SNAPSHOT_DTYPE`` record or its bytes
+
+        Returns:
+        --------
+        CropgroStrawberry
+            Model in the saved state; :meth:`advance` continues the season
+            exactly as the original model would
+        """
+        if isinstance(snapshot, (bytes, bytearray, memoryview)):
+            snapshot = np.frombuffer(snapshot, dtype=SNAPSHOT_DTYPE)[0]
+        if snapshot['version'] != SNAPSHOT_VERSION:
+            raise ValueError(
+                f"Unsupported snapshot version {snapshot['version']}")
+        params = snapshot['params']
+        soil = {'max_root_depth': params[P_MAX_ROOT_DEPTH],
+                'field_capacity': params[P_FIELD_CAPACITY],
+                'wilting_point': params[P_WILTING_POINT]}
+        cultivar = {'name': snapshot['cultivar'].decode(),
+                    'tbase': params[P_TBASE],
+                    'topt': params[P_TOPT],
+                    'tmax_th': params[P_TMAX_TH],
+                    'rue': params[P_RUE],
+                    'k_light': params[P_K_LIGHT],
+                    'sla': params[P_SLA],
+                    'potential_fruits_per_crown': params[P_FRUITS_PER_CROWN],
+                    'plant_density': params[P_PLANT_DENSITY]}
+        model = cls(params[P_LATITUDE], str(snapshot['planting_date']), soil,
+                    cultivar)
+        model.phenology_stages = dict(zip(STAGE_NAMES,
+                                          snapshot['thresholds']))
+        model.results = SimulationResults(
+            stage_names=model.phenology_stages,
+            final=snapshot['final'].copy(),
+            stage_dates=snapshot['stage_dates'].copy())
+        model._unpack_state(snapshot['state'])
+        if not np.isnat(snapshot['last_date']):
+            model.last_date = snapshot['last_date']
+        return model
+
+    @property
+    def results_df(self):
+        """Daily results of the model as a DataFrame."""
+        return self.results.to_frame()
+
+    def _pack_state(self):
+        """Return the current plant state as a flat engine state array."""
+        return _state_vector(self.plant_state, self.thermal_time,
+                             self.days_after_planting,
+                             list(self.phenology_stages))
+
+    def _unpack_state(self, state):
+        """Copy a flat engine state array back onto the model attributes."""
+        ps = self.plant_state
+        ps.biomass = float(state[S_BIOMASS])
+        ps.leaf_area_index = float(state[S_LAI])
+        ps.root_depth = float(state[S_ROOT_DEPTH])
+        ps.fruit_number = float(state[S_FRUIT_NUMBER])
+        ps.fruit_biomass = float(state[S_FRUIT_BIOMASS])
+        ps.leaf_biomass = float(state[S_LEAF_BIOMASS])
+        ps.stem_biomass = float(state[S_STEM_BIOMASS])
+        ps.root_biomass = float(state[S_ROOT_BIOMASS])
+        ps.phenological_stage = list(self.phenology_stages)[
+            int(state[S_STAGE])]
+        ps.development_rate = float(state[S_DEV_RATE])
+        ps.crown_number = float(state[S_CROWN_NUMBER])
+        ps.runner_number = float(state[S_RUNNER_NUMBER])
+        self.thermal_time = float(state[S_THERMAL_TIME])
+        self.days_after_planting = int(state[S_DAP])
+
+    def _pack_params(self):
+        """Return cultivar, soil and site parameters as a flat array."""
+        return _param_vector(self.latitude, self.soil, self.cultivar)
+
+    def _stage_thresholds(self):
+        """Return the thermal time threshold of each stage as an array."""
+        return np.array(list(self.phenology_stages.values()),
+                        dtype=np.float64)
     
     def plot_results(self):
         """Plot key simulation results."""
-        if not hasattr(self, 'results_df') or len(self.results_df) == 0:
+        import matplotlib.pyplot as plt
+
+        if len(self.results) == 0:
             print("No simulation results to plot. "
                   "Run simulate_growth() first.")
             return
         
+        results_df = self.results_df
         fig, axs = plt.subplots(3, 2, figsize=(14, 12))
         
         # Plot biomass
-        axs[0, 0].plot(self.results_df['dap'], self.results_df['biomass'], 
+        axs[0, 0].plot(results_df['dap'], results_df['biomass'], 
                       'b-', label='Total')
-        axs[0, 0].plot(self.results_df['dap'], 
-                      self.results_df['leaf_biomass'], 'g-', label='Leaf')
-        axs[0, 0].plot(self.results_df['dap'], 
-                      self.results_df['stem_biomass'], 'k-', label='Stem')
-        axs[0, 0].plot(self.results_df['dap'], 
-                      self.results_df['root_biomass'], 'r-', label='Root')
-        axs[0, 0].plot(self.results_df['dap'], 
-                      self.results_df['fruit_biomass'], 'm-', label='Fruit')
+        axs[0, 0].plot(results_df['dap'], 
+                      results_df['leaf_biomass'], 'g-', label='Leaf')
+        axs[0, 0].plot(results_df['dap'], 
+                      results_df['stem_biomass'], 'k-', label='Stem')
+        axs[0, 0].plot(results_df['dap'], 
+                      results_df['root_biomass'], 'r-', label='Root')
+        axs[0, 0].plot(results_df['dap'], 
+                      results_df['fruit_biomass'], 'm-', label='Fruit')
         axs[0, 0].set_xlabel('Days After Planting')
         axs[0, 0].set_ylabel('Biomass (g/plant)')
         axs[0, 0].set_title('Plant Biomass')
         axs[0, 0].legend()
         
         # Plot LAI
-        axs[0, 1].plot(self.results_df['dap'], 
-                      self.results_df['leaf_area_index'], 'g-')
+        axs[0, 1].plot(results_df['dap'], 
+                      results_df['leaf_area_index'], 'g-')
         axs[0, 1].set_xlabel('Days After Planting')
         axs[0, 1].set_ylabel('LAI (m²/m²)')
         axs[0, 1].set_title('Leaf Area Index')
         
         # Plot fruit number
-        axs[1, 0].plot(self.results_df['dap'], 
-                      self.results_df['fruit_number'], 'm-')
+        axs[1, 0].plot(results_df['dap'], 
+                      results_df['fruit_number'], 'm-')
         axs[1, 0].set_xlabel('Days After Planting')
         axs[1, 0].set_ylabel('Fruits (number/plant)')
         axs[1, 0].set_title('Fruit Number')
         
         # Plot crowns and runners
-        axs[1, 1].plot(self.results_df['dap'], 
-                      self.results_df['crown_number'], 'b-', label='Crowns')
-        axs[1, 1].plot(self.results_df['dap'], 
-                      self.results_df['runner_number'], 'r-', 
+        axs[1, 1].plot(results_df['dap'], 
+                      results_df['crown_number'], 'b-', label='Crowns')
+        axs[1, 1].plot(results_df['dap'], 
+                      results_df['runner_number'], 'r-', 
                       label='Runners')
         axs[1, 1].set_xlabel('Days After Planting')
         axs[1, 1].set_ylabel('Number per plant')
@@ -669,8 +2249,8 @@ class CropgroStrawberry:
         axs[1, 1].legend()
         
         # Plot water stress
-        axs[2, 0].plot(self.results_df['dap'], 
-                      self.results_df['water_stress'], 'r-')
+        axs[2, 0].plot(results_df['dap'], 
+                      results_df['water_stress'], 'r-')
         axs[2, 0].set_xlabel('Days After Planting')
         axs[2, 0].set_ylabel('Water Stress (0-1)')
         axs[2, 0].set_title('Water Stress Factor')
@@ -679,9 +2259,9 @@ class CropgroStrawberry:
         # Convert stages to numeric values for plotting
         stages = list(self.phenology_stages.keys())
         stage_values = [stages.index(stage) 
-                       for stage in self.results_df['stage']]
+                       for stage in results_df['stage']]
         
-        axs[2, 1].plot(self.results_df['dap'], stage_values, 'b-')
+        axs[2, 1].plot(results_df['dap'], stage_values, 'b-')
         axs[2, 1].set_xlabel('Days After Planting')
         axs[2, 1].set_ylabel('Development Stage')
         axs[2, 1].set_yticks(range(len(stages)))
@@ -692,9 +2272,598 @@ class CropgroStrawberry:
         return fig
 
 
+@dataclass
+class BatchResults:
+    """
+    Outputs of :func:`simulate_batch` as typed column blocks per scenario.
+
+    ``day``, ``dap`` and ``stage`` are ``(scenarios, rows)`` integer arrays
+    and ``values`` is ``(scenarios, len(variables), rows)``.  Scenario ``j``
+    recorded ``n_rows[j]`` rows, taken on days ``day[j]`` of its season;
+    entries past that are ``NaN`` (stage ``-1``).  ``final_values`` holds
+    the ``OUTPUT_COLUMNS`` of the last day of every season,
+    ``stage_dates`` the date each stage was reached and ``stop_day`` the
+    day index a :class:`StopCondition` ended each season on (``-1`` if
+    it ran to the end).
+    """
+    dates: list
+    planting_dates: np.ndarray
+    n_days: np.ndarray
+    variables: tuple
+    n_rows: np.ndarray
+    day: np.ndarray
+    dap: np.ndarray
+    stage: np.ndarray
+    values: np.ndarray
+    final_values: np.ndarray
+    stage_dates: np.ndarray
+    final_state: np.ndarray
+    stop_day: np.ndarray = None
+
+    def __len__(self):
+        return len(self.n_days)
+
+    def column(self, name):
+        """Return one output variable as a ``(rows, scenarios)`` array."""
+        if name == 'dap':
+            return self.dap.T
+        if name == 'stage':
+            return self.stage.T
+        if name not in self.variables:
+            raise KeyError(f"{name!r} was not recorded")
+        return self.values[:, self.variables.index(name), :].T
+
+    def final(self, name):
+        """Return the value of a variable on the last day of each season."""
+        return self.final_values[:, OUTPUT_COLUMNS.index(name)]
+
+    def scenario(self, scenario):
+        """Return the results of one scenario as a view on the columns."""
+        size = int(self.n_rows[scenario])
+        dates = np.empty(self.day.shape[1], dtype='datetime64[D]')
+        dates[:size] = self.dates[scenario][self.day[scenario, :size]]
+        return SimulationResults(
+            dates=dates,
+            dap=self.dap[scenario],
+            stage=self.stage[scenario],
+            values=self.values[scenario],
+            size=size,
+            variables=self.variables,
+            final=self.final_values[scenario],
+            stage_dates=self.stage_dates[scenario],
+        )
+
+    def to_frame(self, scenario):
+        """Return the results of one scenario as a DataFrame."""
+        return self.scenario(scenario).to_frame()
+
+
+def _is_sequence(values):
+    """Return whether ``values`` holds one entry per scenario.
+
+    Structured arrays are a single weather table, not a sequence.
+    """
+    if isinstance(values, np.ndarray):
+        return values.dtype.names is None
+    return isinstance(values, (list, tuple))
+
+
+def _broadcast(values, n):
+    """Repeat a single value ``n`` times; sequences are returned as lists."""
+    if _is_sequence(values):
+        if len(values) != n:
+            raise ValueError(
+                f"Expected {n} scenario values, got {len(values)}")
+        return list(values)
+    return [values] * n
+
+
+def simulate_batch(latitudes, planting_dates, soil_properties,
+                   cultivar_params, weather, parallel=False, n_threads=None,
+                   variables=None, frequency='daily', end_dates=None,
+                   until_stage=None, stop=None, genotypes=None):
+    """
+    Simulate many independent scenarios in one vectorized call.
+
+    All scenarios are advanced in one call to the compiled engine with
+    their states held as struct-of-arrays.  Each scenario starts on its
+    planting date, found in its weather by binary search, and stops at its
+    end date or the end of its weather series.
+    Every argument may be a single value shared by all scenarios or a
+    sequence with one entry per scenario.
+
+    Parameters:
+    -----------
+    latitudes : float or sequence of float
+        Site latitude in decimal degrees
+    planting_dates : str or sequence of str
+        Planting date in format 'YYYY-MM-DD'; it must be a day of the
+        scenario's weather
+    soil_properties : dict or sequence of dict
+        Soil properties as passed to :class:`CropgroStrawberry`
+    cultivar_params : dict or sequence of dict
+        Cultivar parameters as passed to :class:`CropgroStrawberry`, or
+        cultivar codes (``VAR#``) when ``genotypes`` is given
+    weather : weather table or sequence of weather tables
+        Daily weather with the columns expected by
+        :meth:`CropgroStrawberry.simulate_growth`, as a DataFrame, a
+        mapping of arrays or a structured array
+    parallel : bool, optional
+        Spread the scenarios over several cores; each scenario gives the
+        same result as a serial run (ignored by the NumPy backend, which
+        already advances all scenarios together)
+    n_threads : int, optional
+        Number of cores used when ``parallel`` is set (default: all),
+        capped at numba's ``NUMBA_NUM_THREADS``
+    variables : sequence of str, optional
+        Entries of ``VALUE_COLUMNS`` to record (default: all)
+    frequency : str or int, optional
+        Days to record, as in :meth:`CropgroStrawberry.simulate_growth`;
+        with ``'summary'`` only the final values and stage dates are kept
+    end_dates : str or sequence of str, optional
+        Last day simulated in each scenario (default: end of its weather)
+    until_stage : str, optional
+        Stop each scenario on the day it enters this stage
+    stop : StopCondition or sequence of StopCondition, optional
+        Conditions that end each season early, as in
+        :meth:`CropgroStrawberry.simulate_growth`; all scenarios must
+        share the same ``when`` predicate (or none)
+    genotypes : GenotypeTable, optional
+        Genotype table of :func:`dssat_genotype.load_genotypes` in which
+        the ``cultivar_params`` codes are looked up
+
+    Returns:
+    --------
+    BatchResults
+        Recorded outputs, stage dates and final state of every scenario
+    """
+    if genotypes is not None:
+        cultivar_params = (genotypes.cultivars(cultivar_params)
+                           if _is_sequence(cultivar_params)
+                           else genotypes.cultivar(cultivar_params))
+    every = _record_every(frequency)
+    variables, value_index = _value_columns(variables)
+    args = (latitudes, planting_dates, soil_properties, cultivar_params,
+            weather, end_dates, stop)
+    sizes = [len(a) for a in args if _is_sequence(a)]
+    n = max(sizes) if sizes else 1
+    (latitudes, planting_dates, soil_properties, cultivar_params, weather,
+     end_dates, stop) = (_broadcast(a, n) for a in args)
+
+    params = np.empty((N_PARAMS, n))
+    for j in range(n):
+        params[:, j] = _param_vector(latitudes[j], soil_properties[j],
+                                     cultivar_params[j])
+    thresholds = np.repeat(
+        np.array(STAGE_THRESHOLDS, dtype=np.float64)[:, None], n, axis=1)
+    state = np.repeat(_state_vector(PlantState())[:, None], n, axis=1)
+
+    # Each scenario is windowed from its planting date
+    def season_window(j, w_dates, columns):
+        window = _season_window(w_dates, planting_dates[j], end_dates[j])
+        if until_stage is not None:
+            window = _stage_window(window, w_dates, columns,
+                                   cultivar_params[j], STAGE_THRESHOLDS,
+                                   until_stage)
+        return window
+
+    return _run_batch(state, params, thresholds, weather, season_window,
+                      stop, every, variables, value_index,
+                      np.array(planting_dates, dtype='datetime64[D]'),
+                      parallel, n_threads)
+
+
+def _by_code(values, code, treatment):
+    """Return the entry of ``values`` for a FileX code of a treatment.
+
+    ``values`` is keyed by the codes when it is a mapping other than a
+    plain dict, such as a :class:`dssat_genotype.GenotypeTable`, a
+    :class:`dssat_soil.SoilIndex` or a dict wrapped in
+    ``types.MappingProxyType``; anything else is one value shared by all
+    treatments.  Only the entry of ``code`` is looked up.
+    """
+    if isinstance(values, dict) or not isinstance(values, Mapping):
+        return values
+    try:
+        return values[code]
+    except KeyError:
+        raise KeyError(f"Treatment {treatment.number}: nothing given for "
+                       f"{code!r}") from None
+
+
+def simulate_experiment(experiment, latitude, soil_properties,
+                        cultivar_params, weather, treatments=None, **options):
+    """
+    Simulate the treatments of a DSSAT experiment in one batch.
+
+    Like ``CRGRO048 A`` for the Fortran model, every treatment of the
+    FileX is run: each scenario is planted on the treatment's planting
+    date at its ``PPOP`` plant population and ends with its last
+    scheduled harvest (or its weather when it has none).
+
+    Soil, cultivar and weather inputs given as a plain dict are shared by
+    all treatments; other mappings are looked up by the treatment's codes
+    (wrap a dict keyed by codes in ``types.MappingProxyType``).
+
+    Parameters:
+    -----------
+    experiment : dssat_filex.Experiment
+        Parsed FileX, as returned by :func:`dssat_filex.read_filex`
+    latitude : float or dict
+        Site latitude, or a mapping of weather station codes (``WSTA``)
+        to latitudes
+    soil_properties : dict or SoilIndex
+        Soil properties, or a mapping of soil profile IDs (``ID_SOIL``)
+        to them such as :func:`dssat_soil.build_soil_index`
+    cultivar_params : dict or GenotypeTable
+        Cultivar parameters, or a mapping of cultivar codes (``INGENO``)
+        to them such as :func:`dssat_genotype.load_genotypes`
+    weather : weather table or mapping
+        Daily weather covering every season, or a mapping of weather
+        station codes to weather tables
+    treatments : sequence of int, optional
+        Treatment numbers to run (default: all, in file order)
+    **options
+        Passed on to :func:`simulate_batch` (``variables``,
+        ``frequency``, ``parallel``, ...)
+
+    Returns:
+    --------
+    BatchResults
+        One scenario per treatment, in the order of ``treatments``
+    """
+    if treatments is None:
+        selected = list(experiment.treatments)
+    else:
+        selected = [experiment.treatment(number) for number in treatments]
+    if not selected:
+        raise ValueError(f"{experiment.path}: no treatments to simulate")
+
+    latitudes, plantings, soils, cultivars, tables, ends = (
+        [], [], [], [], [], [])
+    for t in selected:
+        if t.planting is None or t.planting.date is None:
+            raise ValueError(f"Treatment {t.number} has no planting date")
+        station = t.field.wsta if t.field else None
+        latitudes.append(latitude[station] if isinstance(latitude, dict)
+                         else latitude)
+        plantings.append(str(t.planting.date))
+        soils.append(_by_code(soil_properties,
+                              t.field.id_soil if t.field else None, t))
+        cultivar = _by_code(cultivar_params,
+                            t.cultivar.ingeno if t.cultivar else None, t)
+        if t.planting.ppop is not None:
+            cultivar = dict(cultivar, plant_density=t.planting.ppop)
+        cultivars.append(cultivar)
+        tables.append(_by_code(weather, station, t))
+        last = t.last_harvest
+        ends.append(None if last is None else str(last))
+    return simulate_batch(latitudes, plantings, soils, cultivars, tables,
+                          end_dates=ends, **options)
+
+
+def fork(model, futures, variables=None, frequency='daily', stop=None,
+         parallel=False, n_threads=None):
+    """
+    Continue one season along many alternative futures in one batch.
+
+    The shared part of the season, such as the observed weather up to
+    today, is simulated once by ``model``.  Its state is then cloned into
+    one branch per weather table of ``futures`` (historical years, climate
+    analogues, management options) and all branches are advanced together
+    from the day after the last simulated one.
+
+    Parameters:
+    -----------
+    model : CropgroStrawberry or snapshot
+        Model that has simulated the season up to the fork day, or a
+        :meth:`CropgroStrawberry.snapshot` of one
+    futures : sequence of weather tables
+        Weather of each branch; days up to the fork day are ignored and
+        the rest must continue it without a gap
+    variables : sequence of str, optional
+        Entries of ``VALUE_COLUMNS`` to record (default: all)
+    frequency : str or int, optional
+        Days to record, as in :func:`simulate_batch`
+    stop : StopCondition or sequence of StopCondition, optional
+        Conditions that end each branch early
+    parallel : bool, optional
+        Spread the branches over several cores
+    n_threads : int, optional
+        Number of cores used when ``parallel`` is set (default: all),
+        capped at numba's ``NUMBA_NUM_THREADS``
+
+    Returns:
+    --------
+    BatchResults
+        One scenario per branch.  Branches start on the same day, so with
+        daily recording ``values`` is the ``(branches, variables, days)``
+        ensemble and :meth:`BatchResults.column` gives ``(days, branches)``
+        arrays; ``stage_dates`` include the stages reached before the fork
+    """
+    if not isinstance(model, CropgroStrawberry):
+        model = CropgroStrawberry.from_snapshot(model)
+    if model.last_date is None:
+        raise ValueError("The model has not simulated any day to fork from")
+    every = _record_every(frequency)
+    variables, value_index = _value_columns(variables)
+    n = len(futures)
+    stop = _broadcast(stop, n)
+
+    params = np.repeat(model._pack_params()[:, None], n, axis=1)
+    thresholds = np.repeat(model._stage_thresholds()[:, None], n, axis=1)
+    state = np.repeat(model._pack_state()[:, None], n, axis=1)
+
+    # Every branch starts on the day after the fork
+    first = model.last_date + 1
+
+    def branch_window(j, w_dates, columns):
+        start = int(np.searchsorted(w_dates, first))
+        if start < len(w_dates) and w_dates[start] != first:
+            raise ValueError(f"Weather of branch {j} resumes on "
+                             f"{w_dates[start]}, expected {first}")
+        return slice(start, len(w_dates))
+
+    results = _run_batch(
+        state, params, thresholds, list(futures), branch_window, stop,
+        every, variables, value_index,
+        np.repeat(np.datetime64(model.planting_date, 'D'), n), parallel,
+        n_threads)
+    before = model.results.stage_dates
+    reached = ~np.isnat(before)
+    results.stage_dates[:, reached] = before[reached]
+    return results
+
+
+def _run_batch(state, params, thresholds, weather, season_window, stop,
+               every, variables, value_index, planting_dates, parallel=False,
+               n_threads=None):
+    """Advance the ``(N_STATE, scenarios)`` states in one engine call.
+
+    Scenario ``j`` simulates the days ``season_window(j, dates, columns)``
+    of its weather table ``weather[j]``.  Returns the
+    :class:`BatchResults`.
+    """
+    n = state.shape[1]
+    if len({id(None if s is None else s.when) for s in stop}) > 1:
+        raise ValueError("All scenarios must share the stop predicate")
+
+    # Scenarios sharing a weather table are packed together
+    groups = {}
+    for j, w in enumerate(weather):
+        groups.setdefault(id(w), (w, []))[1].append(j)
+    dates = [None] * n
+    n_days = np.zeros(n, dtype=np.int64)
+    tables = {}
+    driver_index = np.empty(n, dtype=np.int64)
+    stops = np.empty((n, N_STOP), dtype=np.int64)
+    for w, members in groups.values():
+        w_dates = np.asarray(w['date']).astype('datetime64[D]')
+        columns = _weather_arrays(w)
+        for j in members:
+            window = season_window(j, w_dates, columns)
+            dates[j] = w_dates[window]
+            n_days[j] = len(dates[j])
+            stops[j] = _stop_array(stop[j], dates[j])
+
+            # One driver table per distinct weather window and driver
+            # parameters
+            key = (id(w), window.start, window.stop,
+                   params[_DRIVER_PARAMS, j].tobytes())
+            if key not in tables:
+                season = {column: values[window]
+                          for column, values in columns.items()}
+                tables[key] = (len(tables),
+                               _season_drivers(dates[j], season,
+                                               params[:, j]))
+            driver_index[j] = tables[key][0]
+
+    # Driver tables are padded to the longest season
+    n_max = int(n_days.max()) if n else 0
+    drivers = np.zeros((len(tables), n_max, N_DRIVERS))
+    for index, table in tables.values():
+        drivers[index, :len(table)] = table
+
+    n_record = _record_capacity(every, n_max, N_STAGES)
+    n_rows = np.zeros(n, dtype=np.int64)
+    day = np.zeros((n, n_record), dtype=np.int64)
+    dap = np.zeros((n, n_record), dtype=np.int32)
+    stage = np.full((n, n_record), -1, dtype=np.int8)
+    values = np.full((n, len(variables), n_record), np.nan)
+    stage_day = np.full((n, N_STAGES), -1, dtype=np.int64)
+    last = np.full((n, N_OUTPUTS), np.nan)
+    args = (state, params, thresholds, n_days, driver_index, drivers, every,
+            value_index, day, dap, stage, values, n_rows, stage_day, last,
+            stops, _stop_predicate(stop[0] if n else None))
+    if parallel and BACKEND == 'numba':
+        previous = get_num_threads()
+        if n_threads is not None:
+            # numba cannot start more threads than its pool was sized for
+            set_num_threads(min(n_threads, config.NUMBA_NUM_THREADS))
+        try:
+            _simulate_batch_parallel(*args)
+        finally:
+            set_num_threads(previous)
+    else:
+        _batch_engine(*args)
+
+    stage_dates = np.empty((n, N_STAGES), dtype='datetime64[D]')
+    for j in range(n):
+        stage_dates[j] = _stage_dates(dates[j], stage_day[j])
+    return BatchResults(
+        dates=dates,
+        planting_dates=planting_dates,
+        n_days=n_days,
+        variables=variables,
+        n_rows=n_rows,
+        day=day,
+        dap=dap,
+        stage=stage,
+        values=values,
+        final_values=last,
+        stage_dates=stage_dates,
+        final_state=state,
+        stop_day=stops[:, STOP_AT],
+    )
+
+
+def compute_drivers(weather, latitude, cultivar_params, co2=400.0):
+    """
+    Precompute the state-independent daily terms of a season.
+
+    Daylength, thermal time, the temperature and CO2 factors of
+    photosynthesis, reference evapotranspiration, the wind modifier and
+    the respiration Q10 factor only depend on weather and parameters.
+    They are computed once per weather series and cached, so scenarios
+    that share weather only run the plant-state recurrence.
+
+    Parameters:
+    -----------
+    weather : pandas.DataFrame, mapping or structured array
+        Daily weather with the columns expected by
+        :meth:`CropgroStrawberry.simulate_growth`
+    latitude : float
+        Site latitude in decimal degrees
+    cultivar_params : dict
+        Cultivar parameters with ``tbase``, ``topt`` and ``tmax_th``
+    co2 : float, optional
+        Atmospheric CO2 concentration (ppm)
+
+    Returns:
+    --------
+    numpy.ndarray
+        ``(days, len(DRIVER_COLUMNS))`` array of daily drivers; it is
+        shared with the cache and must not be modified
+    """
+    params = np.zeros(N_PARAMS)
+    params[P_LATITUDE] = latitude
+    params[P_TBASE] = cultivar_params['tbase']
+    params[P_TOPT] = cultivar_params['topt']
+    params[P_TMAX_TH] = cultivar_params['tmax_th']
+    params[P_CO2] = co2
+    return _season_drivers(np.asarray(weather['date']),
+                           _weather_arrays(weather), params)
+
+
+def stage_calendar(weather, planting_dates, cultivar_params,
+                   thresholds=STAGE_THRESHOLDS):
+    """
+    Return the date each phenological stage is reached.
+
+    Thermal time only depends on weather and cultivar, so the stage
+    calendar is found from the cumulative thermal time of the season with
+    a binary search against the stage thresholds, without running the
+    growth model.  As in :meth:`CropgroStrawberry.update_phenology` at most
+    one stage is entered per day and the planting date is the first
+    simulated day.
+
+    Parameters:
+    -----------
+    weather : pandas.DataFrame, mapping or structured array
+        Daily weather with ``date``, ``tmin`` and ``tmax`` columns
+    planting_dates : str or sequence of str
+        One or many planting dates in format 'YYYY-MM-DD'
+    cultivar_params : dict
+        Cultivar parameters with ``tbase``, ``topt`` and ``tmax_th``
+    thresholds : sequence of float, optional
+        Thermal time required to enter each stage of ``STAGE_NAMES``
+
+    Returns:
+    --------
+    numpy.ndarray
+        ``datetime64[D]`` dates with one column per stage and one row per
+        planting date (1-D for a single planting date); ``NaT`` marks
+        stages not reached before the weather ends
+    """
+    dates = np.asarray(weather['date']).astype('datetime64[D]')
+    tt = _thermal_time_series(
+        np.asarray(weather['tmin'], dtype=np.float64),
+        np.asarray(weather['tmax'], dtype=np.float64),
+        cultivar_params['tbase'], cultivar_params['topt'],
+        cultivar_params['tmax_th'])
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+
+    planting = np.asarray(planting_dates, dtype='datetime64[D]')
+    starts = np.searchsorted(dates, planting.ravel())
+    if np.any(starts >= len(dates)) or np.any(
+            dates[np.minimum(starts, len(dates) - 1)] != planting.ravel()):
+        raise ValueError("Planting dates must fall within the weather data")
+
+    calendar = np.full((len(starts), len(thresholds)), np.datetime64('NaT'),
+                       dtype='datetime64[D]')
+    steps = np.arange(len(thresholds) - 1)
+    for i, start in enumerate(starts):
+        cumulative = np.cumsum(tt[start:])
+        first = np.searchsorted(cumulative, thresholds[1:], side='left')
+        # A stage can only be entered the day after the previous one
+        day = np.maximum.accumulate(first - steps) + steps
+        reached = day < len(cumulative)
+        calendar[i, 0] = dates[start]
+        calendar[i, 1:][reached] = dates[start + day[reached]]
+    return calendar.reshape(planting.shape + (len(thresholds),))
+
+
+# Engine kernels with their explicit signatures
+_KERNELS = (
+    _calc_daylength, _thermal_time, _temperature_effect, _co2_effect,
+    _light_interception, _photosynthesis, _reference_et, _crop_coefficient,
+    _transpiration, _water_stress, _respiration_factor, _organ_respiration,
+    _maintenance_resp, _compute_drivers, _advance_day, _record, _never,
+    _simulate_season, _simulate_batch, _simulate_batch_parallel,
+)
+
+
+def warmup():
+    """
+    Compile the engine kernels into the on-disk cache and exercise them.
+
+    The kernels are compiled for their signatures when the module is
+    imported and stored next to this file, so later processes only load
+    them.  Running this once after installing or editing the model, before
+    launching many short processes, keeps every process on the fast path.
+    A short season is run through the serial and parallel engines to
+    check the cached code.
+
+    Returns:
+    --------
+    dict
+        ``'cached'`` or ``'compiled'`` for each kernel, depending on
+        whether this process loaded it from the cache (``'not compiled'``
+        with the NumPy backend)
+    """
+    weather = {
+        'date': np.arange('2024-01-01', '2024-01-11', dtype='datetime64[D]'),
+        'tmax': np.full(10, 25.0),
+        'tmin': np.full(10, 12.0),
+        'solar_radiation': np.full(10, 18.0),
+        'rainfall': np.zeros(10),
+        'rh': np.full(10, 70.0),
+        'wind_speed': np.full(10, 2.0),
+    }
+    soil = {'max_root_depth': 50.0, 'field_capacity': 200.0,
+            'wilting_point': 50.0}
+    cultivar = {'tbase': 4.0, 'topt': 22.0, 'tmax_th': 35.0, 'rue': 2.5,
+                'k_light': 0.6, 'sla': 0.02,
+                'potential_fruits_per_crown': 10.0}
+    serial = simulate_batch(0.0, '2024-01-01', soil, cultivar, weather)
+    threaded = simulate_batch(0.0, '2024-01-01', soil, cultivar, weather,
+                              parallel=True)
+    if not np.array_equal(serial.final_state, threaded.final_state):
+        raise RuntimeError("Serial and parallel engines disagree")
+    if BACKEND != 'numba':
+        return {kernel.__name__: 'not compiled' for kernel in _KERNELS}
+    return {
+        kernel.__name__: ('cached' if kernel.stats.cache_hits
+                          else 'compiled')
+        for kernel in _KERNELS
+    }
+
+
 # Example usage of the CROPGRO-Strawberry model
 def run_example_simulation():
     """Run the model with synthetic weather data and return results."""
+    import pandas as pd
+
     # Define soil properties
     soil_properties = {
         'max_root_depth': 50.0,  # cm
@@ -776,6 +2945,20 @@ def run_example_simulation():
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Run the CROPGRO-Strawberry example simulation.")
+    parser.add_argument(
+        '--warmup', action='store_true',
+        help="compile and cache the model kernels, then exit")
+    args = parser.parse_args()
+
+    if args.warmup:
+        for kernel, status in warmup().items():
+            print(f"{kernel}: {status}")
+        sys.exit(0)
+
     # Run example simulation
     model, results, fig = run_example_simulation()
     
@@ -788,4 +2971,5 @@ if __name__ == "__main__":
     print(f"Final phenological stage: {results['stage'].iloc[-1]}")
     
     # Show plot
+    import matplotlib.pyplot as plt
     plt.show()
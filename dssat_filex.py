@@ -0,0 +1,340 @@
+"""Reader for DSSAT experiment (FileX, e.g. ``.SRX``) files.
+
+A FileX is a list of ``*SECTION`` blocks, each holding one or more tables
+under ``@`` header lines.  The tables are fixed-width like the weather
+files (see :mod:`dssat_fixedwidth`), with header names padded by dots that
+may lead as well as trail (``...........XCRD``).  The first column of a
+table is the level number through which ``*TREATMENTS`` refers to the
+other sections, and a level may span several tables (the two ``*FIELDS``
+tables) or several rows (the ``*HARVEST DETAILS`` schedule).
+
+Values are typed as they are read: integers, floats and text, ``None``
+for blank and ``-99`` fields, and ``datetime64`` days for date columns.
+:func:`read_filex` resolves the factor levels of every treatment into a
+:class:`Treatment` with its cultivar, field, planting and harvest dates,
+and caches parsed experiments by the hash of the file content, in memory
+and in the archive directory next to the file, so the validation scripts
+re-reading the same file, each in its own process, do not parse it again.
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+
+from dssat_fixedwidth import MISSING, table_extents
+from dssat_weather import ARCHIVE_DIR, decode_dates
+
+# Columns holding YYDDD/YYYYDDD date codes
+DATE_COLUMNS = frozenset({
+    'PDATE', 'EDATE', 'HDATE', 'ICDAT', 'SDATE', 'IDATE', 'FDATE', 'RDATE',
+    'TDATE', 'CDATE', 'ODATE', 'WMDATE', 'PFRST', 'PLAST', 'HFRST', 'HLAST',
+})
+
+# Identifier and name columns kept as text even when they look numeric
+TEXT_COLUMNS = frozenset({
+    'TNAME', 'CR', 'INGENO', 'CNAME', 'ID_FIELD', 'WSTA', 'ID_SOIL',
+    'FLNAME', 'SLTX', 'PCR', 'ICNAME', 'PLNAME', 'HNAME', 'SNAME',
+})
+
+# Factor level columns of *TREATMENTS and the sections they refer to
+FACTORS = {
+    'CU': 'CULTIVARS', 'FL': 'FIELDS', 'SA': 'SOIL ANALYSIS',
+    'IC': 'INITIAL CONDITIONS', 'MP': 'PLANTING DETAILS',
+    'MI': 'IRRIGATION AND WATER MANAGEMENT', 'MF': 'FERTILIZERS',
+    'MR': 'RESIDUES AND ORGANIC FERTILIZER', 'MC': 'CHEMICAL APPLICATIONS',
+    'MT': 'TILLAGE AND ROTATIONS', 'ME': 'ENVIRONMENT MODIFICATIONS',
+    'MH': 'HARVEST DETAILS', 'SM': 'SIMULATION CONTROLS',
+}
+
+# Parsed experiments kept in memory, keyed by content digest
+FILEX_CACHE_SIZE = 64
+
+# Directory of parsed experiments in the archive directory of a FileX
+FILEX_ARCHIVE = 'filex'
+
+_ARCHIVE_VERSION = 1
+
+
+@dataclass
+class Cultivar:
+    """A ``*CULTIVARS`` level: crop code, cultivar code and name."""
+    level: int
+    crop: str
+    ingeno: str
+    name: str
+
+
+@dataclass
+class Field:
+    """A ``*FIELDS`` level with its weather station and soil profile."""
+    level: int
+    id: str
+    wsta: str
+    id_soil: str
+    values: dict = field(default_factory=dict)
+
+
+@dataclass
+class Planting:
+    """A ``*PLANTING DETAILS`` level.
+
+    ``ppop`` is the plant population at planting in plants/m², ``plrs``
+    the row spacing in cm.
+    """
+    level: int
+    date: np.datetime64
+    emergence: np.datetime64
+    ppop: float
+    ppoe: float
+    plrs: float
+    values: dict = field(default_factory=dict)
+
+
+@dataclass
+class Treatment:
+    """A ``*TREATMENTS`` row with its factor levels resolved."""
+    number: int
+    name: str
+    levels: dict
+    cultivar: Cultivar = None
+    field: Field = None
+    planting: Planting = None
+    harvests: np.ndarray = None
+
+    @property
+    def last_harvest(self):
+        """Date of the last scheduled harvest (``None`` if none)."""
+        if self.harvests is None or not len(self.harvests):
+            return None
+        return self.harvests.max()
+
+
+@dataclass
+class Experiment:
+    """A parsed FileX.
+
+    ``sections`` maps every section name to its tables, each a list of
+    row dicts keyed by column name; ``treatments`` holds the resolved
+    treatments in file order.
+    """
+    path: str
+    code: str
+    name: str
+    sections: dict
+    treatments: list
+    digest: str = ''
+
+    def treatment(self, number):
+        """Return the treatment numbered ``number``."""
+        for treatment in self.treatments:
+            if treatment.number == number:
+                return treatment
+        raise KeyError(f"{self.path}: no treatment {number}")
+
+    def levels(self, section):
+        """Return the rows of ``section`` merged per level number.
+
+        Rows of different tables with the same level are merged into one
+        dict; tables repeating a level (soil layers, harvest dates) keep
+        their rows as a list under ``'rows'``.
+        """
+        merged = OrderedDict()
+        for table in self.sections.get(section, []):
+            counts = {}
+            for row in table:
+                level = next(iter(row.values()))
+                counts[level] = counts.get(level, 0) + 1
+            for row in table:
+                level = next(iter(row.values()))
+                entry = merged.setdefault(level, {})
+                if counts[level] > 1:
+                    entry.setdefault('rows', []).append(row)
+                else:
+                    entry.update(row)
+        return merged
+
+
+def _parse_value(name, text):
+    """Return the typed value of a field, ``None`` when missing."""
+    text = text.strip()
+    if not text:
+        return None
+    if name in TEXT_COLUMNS:
+        return None if text == '-99' else text
+    try:
+        value = int(text)
+    except ValueError:
+        try:
+            value = float(text)
+        except ValueError:
+            return text
+    if value <= MISSING:
+        return None
+    if name in DATE_COLUMNS:
+        return decode_dates(value)[2][()] if value > 0 else None
+    return value
+
+
+def _parse_sections(text):
+    """Return the title line and the tables of every section of a FileX."""
+    title = ''
+    sections = OrderedDict()
+    tables = None
+    extents = None
+    for line in text.splitlines():
+        if not line.strip() or line[:1] == '!':
+            continue
+        if line[:1] == '*':
+            name, _, rest = line[1:].partition(':')
+            name = name.split('  ')[0].strip().upper()
+            if name == 'EXP.DETAILS':
+                title = rest.strip()
+            tables = sections.setdefault(name, [])
+            extents = None
+        elif line[:1] == '@':
+            extents = table_extents(line, TEXT_COLUMNS)
+            if tables is not None:
+                tables.append([])
+        elif extents and tables:
+            tables[-1].append({
+                name: _parse_value(name, line[start:stop])
+                for name, start, stop in extents})
+    return title, sections
+
+
+def _resolve(experiment):
+    """Build the treatments of ``experiment`` from its factor levels."""
+    cultivars = {level: Cultivar(level, row.get('CR'), row.get('INGENO'),
+                                 row.get('CNAME'))
+                 for level, row in experiment.levels('CULTIVARS').items()}
+    fields = {level: Field(level, row.get('ID_FIELD'), row.get('WSTA'),
+                           row.get('ID_SOIL'), row)
+              for level, row in experiment.levels('FIELDS').items()}
+    plantings = {level: Planting(level, row.get('PDATE'), row.get('EDATE'),
+                                 row.get('PPOP'), row.get('PPOE'),
+                                 row.get('PLRS'), row)
+                 for level, row in experiment.levels('PLANTING DETAILS').items()}
+    harvests = {}
+    for level, row in experiment.levels('HARVEST DETAILS').items():
+        rows = row.get('rows', [row])
+        harvests[level] = np.array(
+            [r['HDATE'] for r in rows if r.get('HDATE') is not None],
+            dtype='datetime64[D]')
+
+    treatments = []
+    for table in experiment.sections.get('TREATMENTS', []):
+        for row in table:
+            levels = {factor: row.get(factor) or 0 for factor in FACTORS}
+            treatments.append(Treatment(
+                number=row['N'], name=row.get('TNAME') or '',
+                levels=levels,
+                cultivar=cultivars.get(levels['CU']),
+                field=fields.get(levels['FL']),
+                planting=plantings.get(levels['MP']),
+                harvests=harvests.get(levels['MH'])))
+    return treatments
+
+
+_FILEX_CACHE = OrderedDict()
+_FILEX_CACHE_LOCK = threading.Lock()
+
+
+def parse_filex(raw, path=''):
+    """Parse the bytes of a FileX into an :class:`Experiment`."""
+    title, sections = _parse_sections(
+        raw.replace(b'\0', b'').decode('latin-1'))
+    code, _, name = title.partition(' ')
+    experiment = Experiment(str(path), code, name.strip(), sections, [],
+                            hashlib.blake2b(raw).hexdigest())
+    experiment.treatments = _resolve(experiment)
+    return experiment
+
+
+def _archive_path(path, digest):
+    """Return the file holding the parse of FileX ``path`` with ``digest``."""
+    directory = os.path.dirname(os.path.abspath(path))
+    return os.path.join(directory, ARCHIVE_DIR, FILEX_ARCHIVE,
+                        f'{digest}.pickle')
+
+
+def _load_parsed(archive, digest):
+    """Return the experiment in ``archive`` if parsed from ``digest``."""
+    try:
+        with open(archive, 'rb') as f:
+            version, experiment = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError,
+            TypeError, ValueError):
+        return None
+    if (version != _ARCHIVE_VERSION or not isinstance(experiment, Experiment)
+            or experiment.digest != digest):
+        return None
+    return experiment
+
+
+def _store_parsed(archive, experiment):
+    """Write ``experiment`` to ``archive``; a read-only tree is skipped."""
+    try:
+        os.makedirs(os.path.dirname(archive), exist_ok=True)
+        with open(archive + '.tmp', 'wb') as f:
+            pickle.dump((_ARCHIVE_VERSION, experiment), f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(archive + '.tmp', archive)
+    except OSError:
+        pass
+
+
+def read_filex(path, cache=True):
+    """Read a FileX, reusing the parse of a file with the same content.
+
+    Experiments are cached by content digest, in memory and in
+    ``.archive/filex`` next to the file, so an edited file is parsed again
+    while a rerun, another process or a copy under another name is not;
+    the copy gets its own :class:`Experiment` with ``path`` set to it,
+    sharing the parsed tables.  The cached tables are shared; copy them
+    before modifying them.  ``cache=False`` skips the archive directory.
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    digest = hashlib.blake2b(raw).hexdigest()
+    with _FILEX_CACHE_LOCK:
+        experiment = _FILEX_CACHE.get(digest)
+        if experiment is not None:
+            _FILEX_CACHE.move_to_end(digest)
+    if experiment is None:
+        archive = _archive_path(path, digest)
+        experiment = _load_parsed(archive, digest) if cache else None
+        if experiment is None:
+            experiment = parse_filex(raw, path)
+            if cache:
+                _store_parsed(archive, experiment)
+        with _FILEX_CACHE_LOCK:
+            _FILEX_CACHE[digest] = experiment
+            if len(_FILEX_CACHE) > FILEX_CACHE_SIZE:
+                _FILEX_CACHE.popitem(last=False)
+    if experiment.path != str(path):
+        experiment = replace(experiment, path=str(path))
+    return experiment
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="List the treatments of DSSAT experiment files.")
+    parser.add_argument('files', nargs='+', help="FileX paths (.SRX, ...)")
+    args = parser.parse_args()
+    for path in args.files:
+        experiment = read_filex(path)
+        print(f"{experiment.code}: {experiment.name}")
+        for t in experiment.treatments:
+            cultivar = t.cultivar.ingeno if t.cultivar else '-'
+            station = t.field.wsta if t.field else '-'
+            planted = t.planting.date if t.planting else '-'
+            n_harvests = 0 if t.harvests is None else len(t.harvests)
+            print(f"  {t.number:3d} {t.name:25s} {cultivar:8s} {station:6s} "
+                  f"planted {planted}, {n_harvests} harvests")
@@ -0,0 +1,114 @@
+"""Fixed-width table parsing shared by the DSSAT file readers.
+
+DSSAT data files (weather, FileX, soil, genotype and output files) hold
+tables under ``@`` header lines whose values are right-aligned under the
+last character of their column header, so a field spans from just after
+the previous header to the end of its own (the rule implemented by
+``PARSE_HEADERS`` in ``Utilities/READS.for``).  :func:`field_extents`
+applies that rule and :func:`table_extents` extends it to tables whose
+first column is a level number or code and whose text columns are
+left-aligned.  :func:`data_rows` collects the rows of a table and
+:func:`parse_columns` converts them column by column into float arrays.
+
+Missing values (blank fields and the DSSAT ``-99`` sentinel) become
+``NaN``.
+"""
+
+import numpy as np
+
+# DSSAT marks missing values with -99; anything at or below is missing
+MISSING = -99.0
+
+
+def field_extents(header):
+    """Return ``(name, start, stop)`` of every field under a header line.
+
+    A field ends with its header name and starts one character after the
+    end of the previous name; the last field runs to the end of the row.
+    """
+    extents = []
+    stop = 0
+    for name in header[1:].split():
+        begin = header.index(name, stop if stop else 1)
+        start = stop + 1 if stop else 0
+        stop = begin + len(name)
+        extents.append([name.rstrip('.').upper(), start, stop])
+    if extents:
+        extents[-1][2] = None
+    return extents
+
+
+def table_extents(header, left=()):
+    """Return ``(name, start, stop)`` of every field of a level table.
+
+    Numbers follow the rule of :func:`field_extents`: a field ends with
+    its header name and starts one character after the previous one.
+    Columns in ``left`` are left-aligned under the start of their name
+    instead and run up to the next field, as ``UFGA010700`` under
+    ``ID_SOIL``.  The first field (the level number, or a code as
+    ``SR0001`` under ``@VAR#``) runs from the beginning of the row to the
+    next field, and dots are stripped from both ends of the names.
+    """
+    extents = []
+    end = 0
+    for token in header[1:].split():
+        begin = header.index(token, end if end else 1)
+        name = token.strip('.').upper()
+        start = begin if name in left and end else (end + 1 if end else 0)
+        end = begin + len(token)
+        extents.append([name, start, end])
+    for extent, following in zip(extents, extents[1:]):
+        if extent[0] in left:
+            extent[2] = following[1]
+    if len(extents) > 1:
+        extents[0][2] = extents[1][1]
+    if extents:
+        extents[-1][2] = None
+    return extents
+
+
+def parse_number(text):
+    """Return a float from a fixed-width field, ``NaN`` when missing."""
+    try:
+        value = float(text)
+    except ValueError:
+        return np.nan
+    return np.nan if value <= MISSING else value
+
+
+def data_rows(lines):
+    """Return the data rows of ``lines`` up to the next section, as bytes."""
+    rows = []
+    for line in lines:
+        if line[:1] in ('@', '*'):
+            break
+        if line.strip() and line[:1] != '!':
+            rows.append(line.encode('latin-1'))
+    return rows
+
+
+def parse_columns(rows, extents):
+    """Convert the fixed-width data rows into one float array per field."""
+    width = max(len(row) for row in rows)
+    block = np.array(rows, dtype=f'S{width}').view(np.uint8)
+    block = block.reshape(len(rows), width)
+    # Treat the NUL padding past the end of short rows as blanks
+    block[block == 0] = ord(' ')
+
+    columns = {}
+    for name, start, stop in extents:
+        stop = width if stop is None else min(stop, width)
+        if start >= stop:
+            columns[name] = np.full(len(rows), np.nan)
+            continue
+        cells = np.ascontiguousarray(block[:, start:stop])
+        blank = (cells == ord(' ')).all(axis=1)
+        cells[blank, -1] = ord('0')
+        text = cells.view(f'S{stop - start}').ravel()
+        try:
+            values = text.astype(np.float64)
+        except ValueError:
+            values = np.array([parse_number(t) for t in text])
+        values[blank | (values <= MISSING)] = np.nan
+        columns[name] = values
+    return columns
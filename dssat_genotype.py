@@ -0,0 +1,322 @@
+"""Reader for DSSAT genotype files (``.CUL``, ``.ECO`` and ``.SPE``).
+
+The cultivar and ecotype files are fixed-width tables like the weather
+and experiment files (see :mod:`dssat_fixedwidth`): one row per cultivar keyed
+by ``VAR#`` and one per ecotype keyed by ``ECO#``, with the names
+left-aligned under ``VRNAME``/``ECONAME``.  :func:`load_genotypes` reads
+the three files of a model (``SRGRO048`` by default) into a
+:class:`GenotypeTable`: one float array per coefficient with a row per
+cultivar, the ecotype coefficients joined on ``ECO#``, and the species
+coefficients used by the engine.  The table is cached in the archive
+directory next to the files and rebuilt only when their content changes.
+
+:meth:`GenotypeTable.cultivars` maps the coefficients of many cultivars
+at once onto the ``cultivar_params`` of the engine, so a batch can be
+given a column of cultivar codes instead of hand-built dicts.
+"""
+
+import hashlib
+import os
+import re
+from collections.abc import Mapping
+
+import numpy as np
+
+from dssat_fixedwidth import data_rows, parse_columns, table_extents
+from dssat_weather import ARCHIVE_DIR
+
+# Genotype files shipped with the DSSAT sources
+GENOTYPE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'dssat-csm-os-develop', 'Data', 'Genotype')
+
+# Name columns, left-aligned under their header
+NAME_COLUMNS = frozenset({'VRNAME', 'ECONAME'})
+
+_CACHE_VERSION = 1
+
+# SLAVR is in cm²/g, the engine's specific leaf area in m²/g
+SLA_FACTOR = 1e-4
+
+# Radiation use efficiency (g/MJ) per unit of LFMAX (mg CO2/m²/s): the
+# generic 2.5 g/MJ of the validation scripts at the LFMAX of Radiance
+RUE_PER_LFMAX = 2.5 / 1.35
+
+# Engine parameters without a counterpart in the genotype files
+ENGINE_DEFAULTS = {'potential_fruits_per_crown': 10.0}
+
+
+class GenotypeTable(Mapping):
+    """Cultivar coefficients of a crop model as indexed column arrays.
+
+    ``columns`` holds one array per ``.CUL`` and ``.ECO`` coefficient, in
+    the row order of ``codes`` (``NaN`` for cultivars whose ecotype is
+    missing), and ``species`` the ``.SPE`` values used by the engine.  As
+    a mapping, the table gives the engine ``cultivar_params`` of a
+    cultivar code.
+    """
+
+    def __init__(self, codes, columns, species, source=''):
+        self.codes = np.asarray(codes)
+        self.columns = columns
+        self.species = species
+        self.source = source
+        self._order = np.argsort(self.codes, kind='stable')
+        self._sorted = self.codes[self._order]
+        self._engine = None
+        self._cultivars = {}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        return iter(self.codes.tolist())
+
+    def __contains__(self, code):
+        return self.rows([code], missing=-1)[0] >= 0
+
+    def __getitem__(self, code):
+        return self.cultivar(code)
+
+    def rows(self, codes, missing=None):
+        """Return the row of every cultivar code in ``codes``.
+
+        Unknown codes raise ``KeyError``, or get row ``missing`` when it
+        is given.
+        """
+        codes = np.asarray(codes, dtype=str)
+        if not len(self._sorted):
+            found = np.zeros(codes.shape, dtype=bool)
+            rows = np.zeros(codes.shape, dtype=np.int64)
+        else:
+            pos = np.searchsorted(self._sorted, codes)
+            pos[pos == len(self._sorted)] = 0
+            found = self._sorted[pos] == codes
+            rows = self._order[pos]
+        if missing is None:
+            if not found.all():
+                raise KeyError(f"{self.source}: unknown cultivars "
+                               f"{sorted(set(codes[~found].tolist()))}")
+            return rows
+        return np.where(found, rows, missing)
+
+    def column(self, name, codes=None):
+        """Return coefficient ``name`` of all cultivars or of ``codes``."""
+        values = self.columns[name]
+        return values if codes is None else values[self.rows(codes)]
+
+    def engine_columns(self, codes=None):
+        """Return the engine parameters of ``codes`` as one array each."""
+        if self._engine is None:
+            self._engine = _engine_columns(self.columns, self.species,
+                                           len(self))
+        if codes is None:
+            return self._engine
+        rows = self.rows(codes)
+        return {name: values[rows] for name, values in self._engine.items()}
+
+    def cultivar(self, code):
+        """Return the engine ``cultivar_params`` of cultivar ``code``.
+
+        The dict is shared by later calls; copy it before modifying it.
+        """
+        params = self._cultivars.get(code)
+        if params is None:
+            row = self.rows([code])[0]
+            params = {name: values[row].item()
+                      for name, values in self.engine_columns().items()}
+            self._cultivars[code] = params
+        return params
+
+    def cultivars(self, codes):
+        """Return the ``cultivar_params`` of every code in ``codes``."""
+        unique, inverse = np.unique(codes, return_inverse=True)
+        self.rows(unique)
+        params = [self.cultivar(code) for code in unique.tolist()]
+        return [params[i] for i in inverse.ravel()]
+
+
+def _engine_columns(columns, species, n):
+    """Map genotype coefficients onto the engine's cultivar parameters."""
+    def spe(name, index=None, default=np.nan):
+        value = species.get(name)
+        if value is None:
+            return np.full(n, default)
+        value = value[0 if index is None else index]
+        return np.full(n, value)
+
+    def cul(name):
+        return columns.get(name, np.full(n, np.nan))
+
+    engine = {
+        'name': columns['VRNAME'],
+        # Cardinal temperatures of vegetative development
+        'tbase': spe('TB', 0),
+        'topt': spe('TO1', 0),
+        'tmax_th': spe('TM', 0),
+        'rue': cul('LFMAX') * RUE_PER_LFMAX,
+        'k_light': spe('KCAN'),
+        'sla': cul('SLAVR') * SLA_FACTOR,
+    }
+    for name, value in ENGINE_DEFAULTS.items():
+        engine[name] = np.full(n, value)
+    return engine
+
+
+def _read_table(raw, key):
+    """Return the key codes and columns of the table of a CUL/ECO file."""
+    lines = raw.replace(b'\0', b'').decode('latin-1').splitlines()
+    header = next((i for i, line in enumerate(lines)
+                   if line[:1] == '@'), None)
+    if header is None:
+        return np.empty(0, dtype='U6'), {}
+    extents = table_extents(lines[header], NAME_COLUMNS)
+    # Skip the column numbering line under the .ECO header
+    rows = [row for row in data_rows(lines[header + 1:])
+            if row[:extents[0][2]].strip()]
+    if not rows:
+        return np.empty(0, dtype='U6'), {}
+    numbers = parse_columns(rows, extents)
+    text = [row.decode('latin-1') for row in rows]
+
+    columns = {}
+    for name, start, stop in extents:
+        if name in NAME_COLUMNS or name.endswith('#'):
+            columns[name] = np.array([row[start:stop].strip()
+                                      for row in text])
+        else:
+            columns[name] = numbers[name]
+    return columns.pop(key), columns
+
+
+# Species lines whose trailing label names every value, e.g.
+# "41.00 61.00  0.67  0.50   PARMAX,PHTMAX,KCAN, KC_SLOPE"
+_SPECIES_NAMES = re.compile(r'[A-Z][A-Z0-9_]*(?:,\s*[A-Z][A-Z0-9_]*)*')
+
+# Columns of the cardinal temperature rows of the phenology section
+_CARDINAL = ('TB', 'TO1', 'TO2', 'TM')
+
+
+def _read_species(raw):
+    """Return the named scalar and cardinal temperature species values."""
+    species = {}
+    cardinal = None
+    for line in raw.replace(b'\0', b'').decode('latin-1').splitlines():
+        if line[:1] == '!':
+            names = line[1:].split()
+            cardinal = [] if names[:4] == list(_CARDINAL) else None
+            continue
+        values = []
+        tokens = line.split()
+        while tokens:
+            try:
+                values.append(float(tokens[0]))
+            except ValueError:
+                break
+            tokens.pop(0)
+        if cardinal is not None and len(values) >= 5:
+            cardinal.append(values[:4])
+            for i, name in enumerate(_CARDINAL):
+                species[name] = np.array([row[i] for row in cardinal])
+            continue
+        match = _SPECIES_NAMES.match(' '.join(tokens))
+        if values and match:
+            names = [n.strip() for n in match.group().split(',')]
+            if len(names) > 1 or len(values) == 1:
+                for name, value in zip(names, values):
+                    species.setdefault(name, np.array([value]))
+    return species
+
+
+def parse_genotypes(cul, eco=b'', spe=b'', source=''):
+    """Build the :class:`GenotypeTable` of the bytes of the three files."""
+    codes, columns = _read_table(cul, 'VAR#')
+    eco_codes, eco_columns = _read_table(eco, 'ECO#')
+    if len(eco_codes) and 'ECO#' in columns:
+        order = np.argsort(eco_codes)
+        pos = np.searchsorted(eco_codes, columns['ECO#'], sorter=order)
+        rows = order[np.minimum(pos, len(order) - 1)]
+        found = eco_codes[rows] == columns['ECO#']
+        for name, values in eco_columns.items():
+            if name in columns:
+                continue
+            joined = values[rows]
+            if joined.dtype.kind == 'f':
+                joined[~found] = np.nan
+            else:
+                joined[~found] = ''
+            columns[name] = joined
+    return GenotypeTable(codes, columns, _read_species(spe), source)
+
+
+def _save_table(path, table, digest):
+    """Write ``table`` to the ``.npz`` cache ``path``."""
+    arrays = {'codes': table.codes,
+              'meta': np.array([str(_CACHE_VERSION), digest])}
+    arrays.update({f'col:{name}': values
+                   for name, values in table.columns.items()})
+    arrays.update({f'spe:{name}': values
+                   for name, values in table.species.items()})
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(path + '.tmp', path)
+
+
+def _load_table(path, digest, source):
+    """Return the table cached in ``path`` if built from ``digest``."""
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if data['meta'].tolist() != [str(_CACHE_VERSION), digest]:
+                return None
+            columns = {key[4:]: data[key] for key in data.files
+                       if key.startswith('col:')}
+            species = {key[4:]: data[key] for key in data.files
+                       if key.startswith('spe:')}
+            return GenotypeTable(data['codes'], columns, species, source)
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def load_genotypes(directory=GENOTYPE_DIR, model='SRGRO048', cache=None):
+    """Load the ``.CUL``/``.ECO``/``.SPE`` files of ``model``.
+
+    The parsed table is kept in ``cache`` (default:
+    ``DIRECTORY/.archive/MODEL.npz``) with the digest of the files, and
+    reused until one of them changes.  The ``.ECO`` and ``.SPE`` files
+    are optional.
+    """
+    raw = []
+    for ext in ('.CUL', '.ECO', '.SPE'):
+        path = os.path.join(directory, model + ext)
+        if ext != '.CUL' and not os.path.exists(path):
+            raw.append(b'')
+            continue
+        with open(path, 'rb') as f:
+            raw.append(f.read())
+    digest = hashlib.blake2b(b'\0'.join(raw), digest_size=16).hexdigest()
+    source = os.path.join(directory, model)
+    cache = cache or os.path.join(directory, ARCHIVE_DIR, model + '.npz')
+    table = _load_table(cache, digest, source)
+    if table is None:
+        table = parse_genotypes(*raw, source=source)
+        try:
+            _save_table(cache, table, digest)
+        except OSError:
+            pass
+    return table
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="List the cultivars of a DSSAT genotype file.")
+    parser.add_argument('model', nargs='?', default='SRGRO048')
+    parser.add_argument('--directory', default=GENOTYPE_DIR)
+    args = parser.parse_args()
+    table = load_genotypes(args.directory, args.model)
+    engine = table.engine_columns()
+    for i, code in enumerate(table.codes):
+        print(f"{code} {engine['name'][i]:16s} "
+              + ' '.join(f"{name}={engine[name][i]:.4g}"
+                         for name in engine if name != 'name'))
@@ -0,0 +1,621 @@
+"""Run the DSSAT Fortran model on many experiments at once.
+
+``dscsm048`` reads its inputs from and writes its outputs (``PlantGro.OUT``,
+``Summary.OUT``, ...) to the current directory, so two experiments run
+in the same folder overwrite each other.  :func:`run_experiment` stages
+the FileX and the input files beside it (observed data, soil, weather and
+genotype files) as links into a private scratch directory, on tmpfs when
+available, runs the model there and moves the outputs into a directory of
+their own, by default ``.archive/runs/EXPERIMENT`` next to the FileX.
+:func:`run_experiments` runs a number of such processes concurrently, so
+a whole set of experiments takes about as long as its slowest run.
+
+Finished runs are kept in a content-addressed cache next to the FileX
+(``.archive/fortran``), keyed by the digest of the executable and of
+every input file the model reads (see :func:`run_inputs`).  An entry
+holds the compressed outputs and the parsed ``PlantGro.OUT`` table; when
+the key of a run matches one, the outputs are restored from it and the
+model is not started.  The least recently used entries are removed once
+the cache grows past :data:`CACHE_LIMIT` bytes.
+"""
+
+import fnmatch
+import glob
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from dssat_filex import read_filex
+from dssat_fixedwidth import data_rows, field_extents, parse_columns
+from dssat_weather import ARCHIVE_DIR
+
+# Executable of the Docker image, tried before the local build
+DSSAT_EXECUTABLES = ('/app/dssat/dscsm048',)
+
+# Crop model run on the experiments
+MODEL = 'CRGRO048'
+
+# Output directories created in the archive directory of an experiment
+RUNS_DIR = 'runs'
+
+# Input files read from the experiment directory besides the FileX
+INPUT_PATTERNS = ('*.SOL', '*.WTH', '*.WTG', '*.CLI', '*.CUL', '*.ECO',
+                  '*.SPE')
+
+# tmpfs mounts used for scratch directories when writable
+SCRATCH_DIRS = ('/dev/shm',)
+
+# Seconds a single run may take before it is killed
+RUN_TIMEOUT = 600
+
+# Console output of the model kept with the outputs of every run
+LOG_NAME = 'dscsm048.log'
+
+# Profile naming the data directories of the model, looked up next to
+# the executable, in $DSSAT_HOME and in the default directory like
+# PATHD in InputModule/PATH.for (OSDefsLINUX.for / OSDefsWINDOWS.for)
+PROFILE_NAME = 'DSSATPRO.V48' if os.name == 'nt' else 'DSSATPRO.L48'
+STANDARD_DIR = 'C:\\DSSAT48\\' if os.name == 'nt' else '/DSSAT48/'
+
+# Profile codes of the data directories read by a run and the directory
+# of the installation used when the profile has no such line
+DATA_CODES = {
+    'WED': 'Weather', 'WGD': os.path.join('Weather', 'Gen'),
+    'CLD': os.path.join('Weather', 'Climate'), 'SLD': 'Soil',
+    'CRD': 'Genotype',
+}
+
+# Weather file extensions and the profile code of their directory
+WEATHER_CODES = {'WTH': 'WED', 'WTG': 'WGD', 'CLI': 'CLD'}
+
+# Settings files read from the directory of the profile
+SETTINGS_PATTERNS = ('*.CDE', 'DSCSM048.CTR', 'MODEL.ERR')
+
+# Cache directory created in the archive directory of an experiment
+CACHE_DIR = 'fortran'
+
+# Size in bytes above which the least recently used entries are removed
+CACHE_LIMIT = 256 * 2**20
+
+_CACHE_VERSION = 1
+
+# Output file whose daily tables are stored parsed in the cache
+TABLE_OUTPUT = 'PlantGro.OUT'
+
+
+@dataclass
+class RunResult:
+    """Outcome of one ``dscsm048`` run.
+
+    ``returncode`` is ``None`` when the run was killed after ``timeout``
+    seconds; ``outputs`` lists the files collected into ``output_dir``.
+    ``key`` is the cache key of the run and ``cached`` tells whether the
+    outputs were restored from the cache instead of running the model.
+    """
+    srx: str
+    output_dir: str
+    args: list
+    returncode: int = None
+    elapsed: float = 0.0
+    timeout: float = None
+    outputs: tuple = ()
+    stdout: str = ''
+    stderr: str = ''
+    key: str = ''
+    cached: bool = False
+
+    @property
+    def ok(self):
+        return self.returncode == 0
+
+    def check_returncode(self):
+        """Raise like :func:`subprocess.run` if the run did not succeed."""
+        if self.returncode is None:
+            raise subprocess.TimeoutExpired(self.args, self.timeout,
+                                            self.stdout, self.stderr)
+        if self.returncode:
+            raise subprocess.CalledProcessError(self.returncode, self.args,
+                                                self.stdout, self.stderr)
+
+
+def find_executable(dssat_dir='dssat-csm-os-develop'):
+    """Return the path of ``dscsm048``: the Docker build, else ``dssat_dir``."""
+    locations = list(DSSAT_EXECUTABLES)
+    locations.append(os.path.join(os.path.abspath(dssat_dir), 'dscsm048'))
+    for location in locations:
+        if os.path.exists(location):
+            return location
+    listed = '\n  '.join(locations)
+    raise FileNotFoundError(
+        f"DSSAT executable not found in any of these locations:\n  {listed}")
+
+
+def experiment_inputs(srx_path):
+    """Return the files ``dscsm048`` may read from the experiment directory.
+
+    These are the FileX, its observed data files (``.SRA``/``.SRT`` for a
+    ``.SRX``) and the files matching :data:`INPUT_PATTERNS`, which DSSAT
+    looks up in the experiment directory before its data directories.
+    """
+    directory = os.path.dirname(os.path.abspath(srx_path))
+    stem, ext = os.path.splitext(os.path.basename(srx_path))
+    names = {stem.upper() + ext.upper()}
+    names.update(stem.upper() + ext[:-1].upper() + observed
+                 for observed in 'AT')
+    paths = []
+    for entry in sorted(os.listdir(directory)):
+        path = os.path.join(directory, entry)
+        upper = entry.upper()
+        if os.path.isfile(path) and (
+                upper in names
+                or any(fnmatch.fnmatch(upper, pattern)
+                       for pattern in INPUT_PATTERNS)):
+            paths.append(path)
+    return paths
+
+
+def scratch_dir():
+    """Return the first writable tmpfs of :data:`SCRATCH_DIRS`, else ``None``."""
+    for path in SCRATCH_DIRS:
+        if os.path.isdir(path) and os.access(path, os.W_OK | os.X_OK):
+            return path
+    return None
+
+
+def _stage(paths, directory):
+    """Link (or copy, where links are not allowed) ``paths`` into ``directory``."""
+    for path in paths:
+        target = os.path.join(directory, os.path.basename(path))
+        try:
+            os.symlink(path, target)
+        except OSError:
+            shutil.copy2(path, target)
+
+
+def _replace_dir(output_dir, fill):
+    """Replace ``output_dir`` by a directory populated by ``fill(path)``.
+
+    The new directory is assembled beside ``output_dir`` and swapped in
+    at the end, so readers never see a mix of two runs.
+    """
+    parent = os.path.dirname(os.path.abspath(output_dir))
+    os.makedirs(parent, exist_ok=True)
+    assembled = tempfile.mkdtemp(dir=parent, prefix='.run-')
+    try:
+        fill(assembled)
+        shutil.rmtree(output_dir, ignore_errors=True)
+        os.replace(assembled, output_dir)
+    except BaseException:
+        shutil.rmtree(assembled, ignore_errors=True)
+        raise
+
+
+def _collect(directory, staged, output_dir, log):
+    """Move the files written in ``directory`` into ``output_dir``."""
+    outputs = sorted(entry for entry in os.listdir(directory)
+                     if entry not in staged
+                     and os.path.isfile(os.path.join(directory, entry)))
+
+    def fill(assembled):
+        for entry in outputs:
+            shutil.move(os.path.join(directory, entry),
+                        os.path.join(assembled, entry))
+        with open(os.path.join(assembled, LOG_NAME), 'w') as f:
+            f.write(log)
+
+    _replace_dir(output_dir, fill)
+    return tuple(outputs)
+
+
+def default_output_dir(srx_path):
+    """Return ``.archive/runs/EXPERIMENT`` next to the FileX ``srx_path``."""
+    directory = os.path.dirname(os.path.abspath(srx_path))
+    stem = os.path.splitext(os.path.basename(srx_path))[0]
+    return os.path.join(directory, ARCHIVE_DIR, RUNS_DIR, stem)
+
+
+def find_profile(executable):
+    """Return the path of the profile (``DSSATPRO.L48``) ``executable`` reads.
+
+    Raises ``FileNotFoundError`` when there is none, as the model itself
+    stops without one; a local build must be installed first.
+    """
+    locations = [os.path.dirname(os.path.abspath(executable))]
+    if os.environ.get('DSSAT_HOME'):
+        locations.append(os.environ['DSSAT_HOME'])
+    locations.append(STANDARD_DIR)
+    for location in locations:
+        path = os.path.join(location, PROFILE_NAME)
+        if os.path.isfile(path):
+            return path
+    listed = '\n  '.join(os.path.join(location, PROFILE_NAME)
+                         for location in locations)
+    raise FileNotFoundError(
+        f"{PROFILE_NAME} of {executable} not found in any of these "
+        f"locations:\n  {listed}")
+
+
+def read_profile(path):
+    """Return the directory of every code in the profile ``path``.
+
+    Lines read ``WED C: \\DSSAT48\\Weather`` or, on Linux,
+    ``WED // /app/dssat/Weather``: the code, a drive and the directory.
+    """
+    directories = {}
+    with open(path, encoding='latin-1') as f:
+        for line in f:
+            fields = line[3:].split()
+            code = line[:3]
+            if len(fields) < 2 or not code.strip() or code in directories:
+                continue
+            drive, directory = fields[0], fields[1]
+            if drive.strip('/'):
+                directory = drive + directory
+            directories[code] = os.path.normpath(directory)
+    return directories
+
+
+def data_dirs(executable):
+    """Return the data directories of :data:`DATA_CODES` for ``executable``.
+
+    They come from the profile of the executable; codes it lacks default
+    to the directories of the installation next to it.
+    """
+    profile = read_profile(find_profile(executable))
+    home = os.path.dirname(os.path.abspath(executable))
+    return {code: profile.get(code, os.path.join(home, default))
+            for code, default in DATA_CODES.items()}
+
+
+def run_inputs(srx_path, executable, model=MODEL):
+    """Return the files a run of the FileX ``srx_path`` reads.
+
+    Besides the executable, its profile and settings files and the
+    inputs staged from the experiment directory
+    (:func:`experiment_inputs`), these are the files DSSAT falls back to
+    in the data directories of the profile (:func:`data_dirs`): the
+    weather files of the experiment's stations, the soil files of its
+    soil IDs and the genotype files of its crops.
+    """
+    experiment = read_filex(srx_path)
+    stations = {t.field.wsta for t in experiment.treatments
+                if t.field and t.field.wsta}
+    soils = {t.field.id_soil[:2] for t in experiment.treatments
+             if t.field and t.field.id_soil}
+    crops = {t.cultivar.crop for t in experiment.treatments
+             if t.cultivar and t.cultivar.crop}
+
+    profile = find_profile(executable)
+    directories = data_dirs(executable)
+    paths = [executable, profile]
+    for pattern in SETTINGS_PATTERNS:
+        paths += sorted(glob.glob(os.path.join(os.path.dirname(profile),
+                                               pattern)))
+    for path in experiment_inputs(srx_path):
+        name = os.path.basename(path).upper()
+        # Weather files of other stations are staged but never read
+        if (os.path.splitext(name)[1][1:] not in WEATHER_CODES
+                or name.startswith(tuple(stations))):
+            paths.append(path)
+    for station in sorted(stations):
+        for ext, code in WEATHER_CODES.items():
+            paths += sorted(glob.glob(os.path.join(
+                directories[code], f'{station}*.{ext}')))
+    paths += [os.path.join(directories['SLD'], f'{prefix}.SOL')
+              for prefix in sorted(soils)]
+    paths.append(os.path.join(directories['SLD'], 'SOIL.SOL'))
+    paths += [os.path.join(directories['CRD'], f'{crop}{model[2:]}.{ext}')
+              for crop in sorted(crops) for ext in ('CUL', 'ECO', 'SPE')]
+    return [path for path in dict.fromkeys(paths) if os.path.isfile(path)]
+
+
+# Digests of unchanged files, keyed by path, size and modification time
+_DIGESTS = {}
+_DIGESTS_LOCK = threading.Lock()
+
+
+def _file_digest(path):
+    """Return the content digest of ``path``, reused while it is unchanged."""
+    info = os.stat(path)
+    stamp = (os.path.abspath(path), info.st_size, info.st_mtime_ns)
+    with _DIGESTS_LOCK:
+        digest = _DIGESTS.get(stamp)
+    if digest is None:
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        digest = h.digest()
+        with _DIGESTS_LOCK:
+            _DIGESTS[stamp] = digest
+    return digest
+
+
+def run_key(srx_path, executable, model=MODEL):
+    """Return the cache key of a run: a digest of all of its inputs.
+
+    The model code and the names and contents of the files in
+    :func:`run_inputs` enter the key, so editing, adding or removing any
+    of them gives a new key, while moving the experiment does not.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f'{_CACHE_VERSION}\0{model}\0'.encode())
+    for path in run_inputs(srx_path, executable, model):
+        name = 'executable' if path == executable else os.path.basename(path)
+        h.update(name.upper().encode() + b'\0' + _file_digest(path))
+    return h.hexdigest()
+
+
+def default_cache_dir(srx_path):
+    """Return ``.archive/fortran`` next to the FileX ``srx_path``."""
+    directory = os.path.dirname(os.path.abspath(srx_path))
+    return os.path.join(directory, ARCHIVE_DIR, CACHE_DIR)
+
+
+def read_table(raw):
+    """Parse the daily tables of the runs of a ``PlantGro.OUT`` file.
+
+    Returns one float array per column over the rows of all runs, with
+    the treatment of every row in ``TRNO``.
+    """
+    lines = raw.replace(b'\0', b'').decode('latin-1').splitlines()
+    tables = []
+    treatment = None
+    for i, line in enumerate(lines):
+        if line.startswith(' TREATMENT'):  # " TREATMENT  1   : Radiance"
+            treatment = int(line.split(':')[0].split()[1])
+        elif line[:1] == '@':
+            rows = data_rows(lines[i + 1:])
+            if rows:
+                columns = parse_columns(rows, field_extents(line))
+                number = treatment if treatment is not None else len(tables) + 1
+                columns['TRNO'] = np.full(len(rows), float(number))
+                tables.append(columns)
+    names = list(dict.fromkeys(['TRNO'] + [name for columns in tables
+                                           for name in columns]))
+    return {name: np.concatenate([
+        columns.get(name, np.full(len(columns['TRNO']), np.nan))
+        for columns in tables]) if tables else np.empty(0)
+        for name in names}
+
+
+def read_plantgro(path):
+    """Parse the ``PlantGro.OUT`` file ``path`` with :func:`read_table`."""
+    with open(path, 'rb') as f:
+        return read_table(f.read())
+
+
+def _entry_path(cache_dir, key):
+    return os.path.join(cache_dir, key + '.npz')
+
+
+def _store(cache_dir, key, output_dir, limit):
+    """Keep the files of ``output_dir`` as the cache entry of ``key``."""
+    arrays = {'meta': np.array([str(_CACHE_VERSION), key])}
+    for entry in sorted(os.listdir(output_dir)):
+        with open(os.path.join(output_dir, entry), 'rb') as f:
+            raw = f.read()
+        arrays[f'file:{entry}'] = np.frombuffer(raw, dtype=np.uint8)
+        if entry.upper() == TABLE_OUTPUT.upper():
+            arrays.update({f'table:{name}': values
+                           for name, values in read_table(raw).items()})
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, prefix='.entry-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp, _entry_path(cache_dir, key))
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    prune_cache(cache_dir, limit)
+
+
+def _restore(cache_dir, key, output_dir):
+    """Recreate ``output_dir`` from the cache entry of ``key``.
+
+    Returns the restored output names, or ``None`` without an entry.
+    """
+    path = _entry_path(cache_dir, key)
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if data['meta'].tolist() != [str(_CACHE_VERSION), key]:
+                return None
+            files = {name[5:]: data[name].tobytes() for name in data.files
+                     if name.startswith('file:')}
+    except (OSError, KeyError, ValueError):
+        return None
+    # Mark the entry as recently used
+    os.utime(path)
+
+    def fill(assembled):
+        for entry, raw in files.items():
+            with open(os.path.join(assembled, entry), 'wb') as f:
+                f.write(raw)
+
+    _replace_dir(output_dir, fill)
+    return tuple(entry for entry in files if entry != LOG_NAME)
+
+
+def cached_table(result, cache_dir=None):
+    """Return the parsed ``PlantGro.OUT`` table cached for ``result``.
+
+    The columns are those of :func:`read_table`; ``None`` when the run
+    has no cache entry or no such output.
+    """
+    if not result.key:
+        return None
+    cache_dir = cache_dir or default_cache_dir(result.srx)
+    try:
+        with np.load(_entry_path(cache_dir, result.key),
+                     allow_pickle=False) as data:
+            table = {name[6:]: data[name] for name in data.files
+                     if name.startswith('table:')}
+    except (OSError, ValueError):
+        return None
+    return table or None
+
+
+def prune_cache(cache_dir, limit=CACHE_LIMIT):
+    """Remove the least recently used entries beyond ``limit`` bytes."""
+    entries = []
+    for entry in os.listdir(cache_dir):
+        if not entry.endswith('.npz'):
+            continue
+        try:
+            info = os.stat(os.path.join(cache_dir, entry))
+        except FileNotFoundError:
+            continue
+        entries.append((info.st_mtime, info.st_size, entry))
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries):
+        if total <= limit:
+            break
+        try:
+            os.unlink(os.path.join(cache_dir, entry))
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def run_experiment(srx_path, executable=None, output_dir=None,
+                   timeout=RUN_TIMEOUT, scratch=None, model=MODEL,
+                   cache=None, cache_limit=CACHE_LIMIT):
+    """Run all treatments of the FileX ``srx_path`` in a scratch directory.
+
+    The outputs replace those of the previous run in ``output_dir``
+    (default: :func:`default_output_dir`), together with the console
+    output in :data:`LOG_NAME`.  Failures are reported in the returned
+    :class:`RunResult` rather than raised; call
+    :meth:`RunResult.check_returncode` to raise them.
+
+    Successful runs are stored in the cache directory ``cache`` (default:
+    :func:`default_cache_dir`, ``False`` to disable it), and a run whose
+    inputs match a stored one restores its outputs without starting the
+    model.  When the inputs cannot be determined because the executable
+    has no profile, the model is run uncached with a warning.
+    """
+    executable = executable or find_executable()
+    if os.sep in executable:
+        executable = os.path.abspath(executable)  # the run changes directory
+    output_dir = output_dir or default_output_dir(srx_path)
+    args = [executable, model, 'A', os.path.basename(srx_path)]
+    result = RunResult(os.path.abspath(srx_path), output_dir, args,
+                       timeout=timeout)
+    if cache is not False:
+        try:
+            result.key = run_key(srx_path, executable, model)
+        except FileNotFoundError as e:
+            warnings.warn(f"Running {srx_path} without the output cache: "
+                          f"{e}", stacklevel=2)
+            cache = False
+    if cache is not False:
+        cache = cache or default_cache_dir(srx_path)
+        outputs = _restore(cache, result.key, output_dir)
+        if outputs is not None:
+            result.returncode = 0
+            result.outputs = outputs
+            result.cached = True
+            return result
+    paths = experiment_inputs(srx_path)
+    with tempfile.TemporaryDirectory(prefix='dssat-',
+                                     dir=scratch or scratch_dir()) as work:
+        _stage(paths, work)
+        start = time.perf_counter()
+        try:
+            process = subprocess.run(args, cwd=work, capture_output=True,
+                                     text=True, errors='replace',
+                                     timeout=timeout)
+        except subprocess.TimeoutExpired as e:
+            # subprocess.run kills the model before raising
+            result.stdout = _text(e.stdout)
+            result.stderr = _text(e.stderr)
+        else:
+            result.returncode = process.returncode
+            result.stdout = process.stdout
+            result.stderr = process.stderr
+        result.elapsed = time.perf_counter() - start
+        staged = {os.path.basename(path) for path in paths}
+        result.outputs = _collect(work, staged, output_dir,
+                                  result.stdout + result.stderr)
+    if cache is not False and result.ok:
+        try:
+            _store(cache, result.key, output_dir, cache_limit)
+        except OSError:
+            pass
+    return result
+
+
+def _text(output):
+    """Decode the partial output attached to ``TimeoutExpired``."""
+    if isinstance(output, bytes):
+        return output.decode('utf-8', 'replace')
+    return output or ''
+
+
+def run_experiments(srx_paths, executable=None, jobs=None,
+                    timeout=RUN_TIMEOUT, output_dirs=None, scratch=None,
+                    model=MODEL, cache=None, cache_limit=CACHE_LIMIT):
+    """Run :func:`run_experiment` on every FileX, ``jobs`` at a time.
+
+    ``jobs`` defaults to the number of CPUs and ``output_dirs``, if given,
+    to one directory per FileX.  Returns the :class:`RunResult` of every
+    experiment in the order of ``srx_paths``; a failed run does not stop
+    the others.  ``cache`` and ``cache_limit`` are passed on to every
+    run.
+    """
+    srx_paths = list(srx_paths)
+    executable = executable or find_executable()
+    if output_dirs is None:
+        output_dirs = [None] * len(srx_paths)
+    if len(output_dirs) != len(srx_paths):
+        raise ValueError(f"{len(output_dirs)} output directories for "
+                         f"{len(srx_paths)} experiments")
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(srx_paths) or 1))
+    # The model runs in subprocesses, so threads are enough to wait on them
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(run_experiment, path, executable, output_dir,
+                               timeout, scratch, model, cache, cache_limit)
+                   for path, output_dir in zip(srx_paths, output_dirs)]
+        return [future.result() for future in futures]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Run DSSAT on experiment files concurrently.")
+    parser.add_argument(
+        'files', nargs='*',
+        help="FileX paths (default: every .SRX of the strawberry data)")
+    parser.add_argument('--dssat-dir', default='dssat-csm-os-develop')
+    parser.add_argument('--jobs', '-j', type=int, default=None)
+    parser.add_argument('--timeout', type=float, default=RUN_TIMEOUT)
+    parser.add_argument('--no-cache', action='store_true',
+                        help="run the model even when a cached run matches")
+    args = parser.parse_args()
+    files = args.files or sorted(glob.glob(os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        'dssat-csm-data-develop', 'Strawberry', '*.SRX')))
+    start = time.perf_counter()
+    results = run_experiments(files, find_executable(args.dssat_dir),
+                              args.jobs, args.timeout,
+                              cache=False if args.no_cache else None)
+    for result in results:
+        status = ('timed out' if result.returncode is None
+                  else 'cached' if result.cached
+                  else f"exit {result.returncode}")
+        print(f"{os.path.basename(result.srx):14s} {status:10s} "
+              f"{result.elapsed:7.1f} s  {len(result.outputs)} files "
+              f"-> {result.output_dir}")
+    print(f"{len(results)} runs in {time.perf_counter() - start:.1f} s")
+    raise SystemExit(0 if all(result.ok for result in results) else 1)
@@ -0,0 +1,354 @@
+"""Reader for DSSAT soil profile (``.SOL``) files.
+
+A soil file holds one profile after another, each starting with a
+``*ID_SOIL`` line (``*UFGA010700  SCS  S  180 Candler``) followed by the
+site, surface and layer tables.  The layer tables are fixed-width like
+the weather files (see :mod:`dssat_fixedwidth`), one row per layer with its
+bottom depth ``SLB`` in cm.
+
+:func:`build_soil_index` scans soil files once for the byte offset of
+every profile and keeps the index in the archive directory, rescanning
+only files whose size or time changed.  :meth:`SoilIndex.profile` then
+seeks straight to a profile and parses just its lines into a
+:class:`SoilProfile`, so a gridded run over thousands of soil IDs reads a
+few hundred bytes per profile instead of whole files.  As a mapping the
+index gives the engine's ``soil_properties`` of a soil ID.
+"""
+
+import glob
+import os
+import re
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from dssat_fixedwidth import (data_rows, parse_columns, parse_number,
+                              table_extents)
+from dssat_weather import ARCHIVE_DIR
+
+# Index file created in the archive directory of the first source
+SOIL_INDEX = 'soil.npz'
+
+_INDEX_VERSION = 2
+
+_FILES_DTYPE = np.dtype([
+    ('path', 'U256'), ('size', 'i8'), ('mtime', 'i8'),
+])
+
+_PROFILES_DTYPE = np.dtype([
+    ('id', 'U16'), ('file', 'i8'), ('offset', 'i8'), ('length', 'i8'),
+])
+
+# Layer columns holding text (master horizon)
+LAYER_TEXT = frozenset({'SLMH'})
+
+# Parsed profiles kept in memory per index
+PROFILE_CACHE_SIZE = 4096
+
+# Profile lines: "*" and the soil ID, up to the next profile
+_PROFILE = re.compile(rb'^\*(\S+)', re.MULTILINE)
+
+
+@dataclass
+class SoilProfile:
+    """One soil profile with its layer table as arrays.
+
+    ``layers`` holds one array per layer column (``SLB`` bottom depth in
+    cm, ``SLLL``/``SDUL``/``SSAT`` water contents in cm³/cm³, ``SRGF``
+    root growth factor, ...).
+    """
+    id: str
+    source: str
+    texture: str
+    depth: float
+    name: str
+    site: dict = field(default_factory=dict)
+    surface: dict = field(default_factory=dict)
+    layers: dict = field(default_factory=dict)
+
+    @property
+    def thickness(self):
+        """Thickness of every layer in cm."""
+        bottom = self.layers['SLB']
+        return np.diff(bottom, prepend=0.0)
+
+    def engine_properties(self):
+        """Return the engine ``soil_properties`` of the profile.
+
+        Roots may grow to the bottom of the deepest layer with a root
+        growth factor (``SRGF``) above zero.  ``field_capacity`` and
+        ``wilting_point`` are the drained upper and lower limits averaged
+        over that depth, in mm of water per m of soil as the engine
+        multiplies them by the root depth in m.
+        """
+        bottom = self.layers['SLB']
+        top = bottom - self.thickness
+        srgf = self.layers.get('SRGF', np.full(len(bottom), np.nan))
+        rooted = ~(srgf <= 0.0)
+        if rooted.any():
+            max_root_depth = float(bottom[rooted].max())
+        else:
+            max_root_depth = float(bottom[-1]) if len(bottom) else self.depth
+        weight = np.clip(np.minimum(bottom, max_root_depth) - top, 0.0, None)
+
+        def mean(name):
+            values = self.layers.get(name, np.full(len(bottom), np.nan))
+            known = ~np.isnan(values)
+            if not (weight[known] > 0).any():
+                return np.nan
+            return float(np.average(values[known], weights=weight[known])
+                         * 1000.0)
+
+        return {
+            'max_root_depth': max_root_depth,
+            'field_capacity': mean('SDUL'),
+            'wilting_point': mean('SLLL'),
+        }
+
+
+def _parse_header(line):
+    """Return ``(id, source, texture, depth, name)`` of a profile line."""
+    line = line.split('!')[0]
+    return (line[1:11].strip(), line[13:24].strip(), line[25:30].strip(),
+            parse_number(line[31:36]), line[37:].strip())
+
+
+def _parse_site(row):
+    """Return the ``@SITE`` row, whose family runs to the end of the line."""
+    return {'SITE': row[1:12].strip(), 'COUNTRY': row[13:24].strip(),
+            'LAT': parse_number(row[25:33]),
+            'LONG': parse_number(row[34:42]),
+            'FAMILY': row[43:].strip()}
+
+
+def parse_profile(text):
+    """Parse the lines of one profile into a :class:`SoilProfile`."""
+    lines = text.splitlines()
+    profile = SoilProfile(*_parse_header(lines[0]))
+    i = 1
+    while i < len(lines):
+        line = lines[i]
+        i += 1
+        if line[:1] != '@':
+            continue
+        rows = data_rows(lines[i:])
+        names = line[1:].split()
+        if not names or not rows:
+            continue
+        if names[0].upper() == 'SITE':
+            profile.site = _parse_site(rows[0].decode('latin-1'))
+            continue
+        extents = table_extents(line)
+        if names[0].upper() != 'SLB':
+            row = rows[0].decode('latin-1')
+            for name, start, stop in extents:
+                text = row[start:stop].strip()
+                value = parse_number(text)
+                profile.surface[name] = (
+                    text if np.isnan(value) and text and text != '-99'
+                    else value)
+            continue
+        columns = parse_columns(rows, extents)
+        text = {name: np.array([row.decode('latin-1')[start:stop].strip()
+                                for row in rows])
+                for name, start, stop in extents if name in LAYER_TEXT}
+        layers = profile.layers
+        if not layers:
+            layers.update(columns)
+            layers.update(text)
+            continue
+        # Later tables are matched to the layers of the first by depth
+        bottom = layers['SLB']
+        row = {depth: i for i, depth in enumerate(columns['SLB'].tolist())}
+        take = np.array([row.get(depth, -1) for depth in bottom.tolist()],
+                        dtype=np.int64)
+        for name, values in columns.items():
+            if name in layers:
+                continue
+            values = text.get(name, values)
+            layers[name] = np.where(take >= 0, values[take], (
+                '' if values.dtype.kind == 'U' else np.nan))
+    if 'SLB' not in profile.layers:
+        raise ValueError(f"{profile.id}: no layer table")
+    return profile
+
+
+def _scan(path):
+    """Return the ``(id, offset, length)`` of every profile in a file."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    starts = [(m.group(1).decode('latin-1'), m.start())
+              for m in _PROFILE.finditer(raw)]
+    ends = [start for _, start in starts[1:]] + [len(raw)]
+    return [(name, start, end - start)
+            for (name, start), end in zip(starts, ends)
+            if not name.upper().startswith('SOILS')]
+
+
+class SoilIndex(Mapping):
+    """Byte-offset index of the profiles of a set of soil files.
+
+    ``files`` lists the indexed files with the size and modification
+    time they were scanned at, ``profiles`` the ID, file, offset and
+    length of every profile.  A soil ID found in several files resolves
+    to its first profile in file order.
+    """
+
+    def __init__(self, files, profiles):
+        self.files = files
+        self.profiles = profiles
+        self._rows = {}
+        for row, soil_id in enumerate(profiles['id'].tolist()):
+            self._rows.setdefault(soil_id, row)
+        self._cache = OrderedDict()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __contains__(self, soil_id):
+        return soil_id in self._rows
+
+    def __getitem__(self, soil_id):
+        return self.properties(soil_id)
+
+    def profile(self, soil_id):
+        """Read and parse profile ``soil_id`` from its file."""
+        profile = self._cache.get(soil_id)
+        if profile is not None:
+            self._cache.move_to_end(soil_id)
+            return profile
+        row = self._rows.get(soil_id)
+        if row is None:
+            raise KeyError(f"Unknown soil profile {soil_id!r}")
+        entry = self.profiles[row]
+        with open(str(self.files['path'][entry['file']]), 'rb') as f:
+            f.seek(int(entry['offset']))
+            text = f.read(int(entry['length'])).decode('latin-1')
+        profile = parse_profile(text)
+        self._cache[soil_id] = profile
+        if len(self._cache) > PROFILE_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return profile
+
+    def properties(self, soil_id):
+        """Return the engine ``soil_properties`` of profile ``soil_id``."""
+        return self.profile(soil_id).engine_properties()
+
+
+def _source_files(source, pattern):
+    """Return the soil files of a file, directory or list of them."""
+    if isinstance(source, (str, os.PathLike)):
+        source = [source]
+    paths = []
+    for item in source:
+        item = os.path.abspath(item)
+        if os.path.isdir(item):
+            paths.extend(sorted(glob.glob(os.path.join(item, pattern))))
+        else:
+            paths.append(item)
+    return paths
+
+
+def _open_index(index):
+    """Return the files and profiles stored in ``index``, or None."""
+    try:
+        with np.load(index, allow_pickle=False) as data:
+            if data['meta'].tolist() != [str(_INDEX_VERSION)]:
+                return None
+            files, profiles = data['files'], data['profiles']
+    except (OSError, KeyError, ValueError):
+        return None
+    if files.dtype != _FILES_DTYPE or profiles.dtype != _PROFILES_DTYPE:
+        return None
+    return files, profiles
+
+
+def _write_index(index, files, profiles):
+    """Write the index arrays to the ``.npz`` file ``index``.
+
+    Both arrays go into one file that replaces the old index in a single
+    rename, so ``files`` and ``profiles`` always come from the same build.
+    """
+    os.makedirs(os.path.dirname(index), exist_ok=True)
+    with open(index + '.tmp', 'wb') as f:
+        np.savez(f, files=files, profiles=profiles,
+                 meta=np.array([str(_INDEX_VERSION)]))
+    os.replace(index + '.tmp', index)
+
+
+def build_soil_index(source, index=None, pattern='*.SOL'):
+    """Index the profiles of soil files by byte offset.
+
+    ``source`` is a ``.SOL`` file, a directory or a list of them, in
+    order of precedence.  The index is stored in the ``.npz`` file
+    ``index`` (default: ``.archive/soil.npz`` next to the first source)
+    and only the files whose size or modification time changed are
+    scanned again.
+    Returns the :class:`SoilIndex`.
+    """
+    paths = _source_files(source, pattern)
+    if index is None:
+        first = paths[0] if paths else os.path.abspath(source)
+        base = first if os.path.isdir(first) else os.path.dirname(first)
+        index = os.path.join(base, ARCHIVE_DIR, SOIL_INDEX)
+    old = _open_index(index)
+    known = {}
+    if old is not None:
+        old_files, old_profiles = old
+        order = np.argsort(old_profiles['file'], kind='stable')
+        split = np.searchsorted(old_profiles['file'][order],
+                                np.arange(len(old_files) + 1))
+        for i, entry in enumerate(old_files):
+            known[str(entry['path'])] = (
+                entry, old_profiles[order[split[i]:split[i + 1]]])
+
+    files = np.zeros(len(paths), dtype=_FILES_DTYPE)
+    parts = []
+    stale = old is None or len(known) != len(paths)
+    for i, path in enumerate(paths):
+        stat = os.stat(path)
+        files[i] = (path, stat.st_size, stat.st_mtime_ns)
+        entry, rows = known.get(path, (None, None))
+        if (entry is not None and entry['size'] == stat.st_size
+                and entry['mtime'] == stat.st_mtime_ns):
+            rows = rows.copy()
+        else:
+            stale = True
+            scanned = _scan(path)
+            rows = np.zeros(len(scanned), dtype=_PROFILES_DTYPE)
+            if scanned:
+                ids, offsets, lengths = zip(*scanned)
+                rows['id'], rows['offset'], rows['length'] = (
+                    ids, offsets, lengths)
+        rows['file'] = i
+        parts.append(rows)
+    profiles = (np.concatenate(parts) if parts
+                else np.zeros(0, dtype=_PROFILES_DTYPE))
+    if stale or old[0]['path'].tolist() != paths:
+        _write_index(index, files, profiles)
+    return SoilIndex(files, profiles)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Index soil profiles and show their engine inputs.")
+    parser.add_argument(
+        'source', nargs='?',
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'dssat-csm-data-develop', 'Soil'),
+        help="soil file or directory of .SOL files")
+    parser.add_argument('ids', nargs='*', help="soil IDs to show")
+    args = parser.parse_args()
+    soils = build_soil_index(args.source)
+    print(f"{len(soils)} profiles in {len(soils.files)} files")
+    for soil_id in args.ids:
+        profile = soils.profile(soil_id)
+        print(f"{soil_id} {profile.name}: {len(profile.thickness)} layers, "
+              f"{soils[soil_id]}")
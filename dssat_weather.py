@@ -0,0 +1,946 @@
+"""Reader for DSSAT daily weather (``.WTH``) files.
+
+DSSAT weather files are fixed-width: every value is right-aligned under
+the last character of its column header, so a field spans from just after
+the previous header to the end of its own header (the rule implemented by
+``PARSE_HEADERS`` in ``Utilities/READS.for``, see
+:mod:`dssat_fixedwidth`).  Splitting rows on whitespace shifts every
+later column whenever a field is blank, as in the empty ``PAR``/``EVAP``
+columns of ``UFBA1601.WTH``.
+
+The data block of a file is read in one pass into a byte matrix and every
+column is sliced and converted as a whole, and the ``YYDDD``/``YYYYDDD``
+date codes are decoded to day of year and ``datetime64`` with array
+arithmetic, so a directory of a thousand files loads in a few seconds.
+
+Missing values (blank fields and the DSSAT ``-99`` sentinel) are stored
+as ``NaN``.
+
+``build_archive`` converts a weather directory once into a columnar
+archive of memory-mapped ``.npy`` arrays with a file and station-year
+index (run ``python dssat_weather.py``); later runs open it in
+milliseconds and rebuild only the files that changed.  ``season`` stitches
+the yearly files of a station into one continuous planting-to-harvest
+series.
+
+``clean_archive`` runs a vectorized quality control over the whole archive
+in one pass: values that are missing, physically impossible or with TMIN
+above TMAX are flagged, short gaps are interpolated, long temperature gaps
+are filled from the station ``TAV``/``AMP`` climate and missing radiation
+is estimated from the temperature range.  The cleaned columns and their
+QC flags are cached in the archive next to the raw arrays.
+
+Station feeds that append a line to their files every day are picked up
+incrementally: ``build_archive`` parses only the appended lines of a file
+that grew, and ``WeatherFeed`` returns just the days added since its last
+update, for :meth:`CropgroStrawberry.advance` to continue a season with.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from dssat_fixedwidth import (MISSING, data_rows, field_extents,
+                              parse_columns, parse_number)
+
+# Two-digit years up to this value belong to the 2000s (DATES.for Y2K_DOY)
+Y2K_PIVOT = 35
+
+# Alternative station header names and the name used here
+STATION_ALIASES = {
+    'LATITUDE': 'LAT', 'WTHLAT': 'LAT',
+    'LONGITUD': 'LONG', 'LONGITUDE': 'LONG', 'WTHLONG': 'LONG',
+    'WELEV': 'ELEV', 'TAMP': 'AMP', 'CCO2': 'CO2',
+}
+
+# Model weather columns: (DSSAT header, value used when the column or a
+# value is missing; None when the column is required)
+MODEL_COLUMNS = {
+    'tmax': ('TMAX', None),
+    'tmin': ('TMIN', None),
+    'solar_radiation': ('SRAD', None),
+    'rainfall': ('RAIN', 0.0),
+    'rh': ('RHUM', 70.0),
+    'wind_speed': ('WIND', 2.0),
+}
+
+
+@dataclass
+class WeatherFile:
+    """Daily weather of one ``.WTH`` file as typed column arrays."""
+    path: str
+    station: dict
+    year: np.ndarray
+    doy: np.ndarray
+    date: np.ndarray
+    columns: dict = field(default_factory=dict)
+    qc: dict = field(default_factory=dict)
+
+    def __len__(self):
+        return len(self.date)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def to_weather(self):
+        """Return the weather as the column mapping used by the model.
+
+        Missing optional values (rain, humidity, wind) take the model
+        defaults; missing temperatures and radiation stay ``NaN``.
+        """
+        weather = {'date': self.date}
+        for name, (header, default) in MODEL_COLUMNS.items():
+            values = self.columns.get(header)
+            if values is None:
+                if default is None:
+                    raise ValueError(f"{self.path}: no {header} column")
+                values = np.full(len(self), default)
+            elif default is not None:
+                values = np.where(np.isnan(values), default, values)
+            weather[name] = values
+        return weather
+
+    def to_frame(self):
+        """Return the model weather columns as a pandas DataFrame."""
+        import pandas as pd
+
+        return pd.DataFrame(self.to_weather())
+
+
+def decode_dates(codes):
+    """Decode DSSAT date codes to ``(year, day_of_year, datetime64[D])``.
+
+    Codes up to ``99365`` are ``YYDDD`` with the DSSAT century rule (years
+    up to 35 are 20xx); larger codes are four-digit-year ``YYYYDDD``.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    year = codes // 1000
+    doy = codes - year * 1000
+    short = codes <= 99365
+    year = np.where(short & (year <= Y2K_PIVOT), year + 2000,
+                    np.where(short, year + 1900, year))
+    dates = ((year - 1970).astype('datetime64[Y]').astype('datetime64[D]')
+             + (doy - 1).astype('timedelta64[D]'))
+    return year, doy, dates
+
+
+def _parse_station(header, row):
+    """Return the station description from its header and value rows."""
+    station = {}
+    for name, start, stop in field_extents(header):
+        text = row[start:stop].strip()
+        name = STATION_ALIASES.get(name, name)
+        if not text:
+            continue
+        if name in ('INSI', 'SITE'):
+            station[name] = text
+        else:
+            station[name] = parse_number(text)
+    return station
+
+
+def read_wth(path):
+    """Read a DSSAT ``.WTH`` file into a :class:`WeatherFile`."""
+    with open(path, 'rb') as f:
+        return _parse_wth(f.read(), path)
+
+
+def _parse_wth(raw, path):
+    """Parse the bytes of a ``.WTH`` file read from ``path``."""
+    station, header, rows = _split_wth(raw, path)
+    return _parse_rows(rows, header, path, station)
+
+
+def _split_wth(raw, path):
+    """Return the station, ``@DATE`` header line and data rows of a file."""
+    lines = raw.replace(b'\0', b'').decode('latin-1').splitlines()
+
+    station = {}
+    header = None
+    for i, line in enumerate(lines):
+        if not line.startswith('@'):
+            continue
+        names = line[1:].split()
+        if names and names[0].upper() == 'DATE':
+            header = i
+            break
+        if names and names[0].upper() in ('INSI', 'LATITUDE', 'LAT'):
+            values = next((l for l in lines[i + 1:] if l.strip()), '')
+            station = _parse_station(line, values)
+    if header is None:
+        raise ValueError(f"{path}: no @DATE header")
+    rows = data_rows(lines[header + 1:])
+    return station, lines[header], rows
+
+
+def _parse_rows(rows, header, path, station):
+    """Return the :class:`WeatherFile` of data rows under ``header``."""
+    extents = field_extents(header)
+    if not rows:
+        empty = np.empty(0, dtype=np.int64)
+        return WeatherFile(str(path), station, empty, empty,
+                           np.empty(0, dtype='datetime64[D]'),
+                           {name: np.empty(0) for name, _, _ in extents[1:]})
+    columns = parse_columns(rows, extents)
+    codes = columns.pop(extents[0][0])
+    dated = ~np.isnan(codes)
+    if not dated.all():
+        codes = codes[dated]
+        columns = {name: values[dated] for name, values in columns.items()}
+    year, doy, dates = decode_dates(codes)
+    return WeatherFile(str(path), station, year, doy, dates, columns)
+
+
+def _appended_rows(raw, size):
+    """Return the data rows appended to a file after its first ``size`` bytes.
+
+    Returns None unless the old content ended with a complete line and
+    the new bytes hold only data rows, i.e. the file was extended in place.
+    """
+    if not 0 < size <= len(raw) or raw[size - 1:size] not in (b'\n', b'\r'):
+        return None
+    lines = raw[size:].replace(b'\0', b'').decode('latin-1').splitlines()
+    if any(line[:1] in ('@', '*') for line in lines):
+        return None
+    return data_rows(lines)
+
+
+def _concat_weather(weather, extra):
+    """Return ``weather`` followed by the days of ``extra``."""
+    columns = {}
+    for name in {**weather.columns, **extra.columns}:
+        columns[name] = np.concatenate([
+            part.columns.get(name, np.full(len(part), np.nan))
+            for part in (weather, extra)])
+    return WeatherFile(extra.path, weather.station,
+                       np.concatenate([weather.year, extra.year]),
+                       np.concatenate([weather.doy, extra.doy]),
+                       np.concatenate([weather.date, extra.date]), columns)
+
+
+def read_wth_file(path, clean=True):
+    """Parse a DSSAT ``.WTH`` file into a pandas DataFrame for the model.
+
+    With ``clean`` the weather goes through :func:`clean_weather` first.
+    """
+    weather = read_wth(path)
+    return (clean_weather(weather) if clean else weather).to_frame()
+
+
+def read_weather_dir(directory, pattern='*.WTH'):
+    """Read every weather file in ``directory`` keyed by file stem."""
+    paths = sorted(glob.glob(os.path.join(directory, pattern)))
+    return {os.path.splitext(os.path.basename(p))[0]: read_wth(p)
+            for p in paths}
+
+
+# QC flag bits of a value: why it was rejected and how it was filled
+QC_MISSING = 1        # missing in the file
+QC_RANGE = 2          # outside physical limits
+QC_TMIN_TMAX = 4      # TMIN above TMAX on the day
+QC_INTERPOLATED = 8   # interpolated over a short gap
+QC_CLIMATE = 16       # station climate (TAV/AMP temperature, no rain)
+QC_ESTIMATED = 32     # radiation estimated from the temperature range
+
+# Physical limits of the DSSAT weather variables (SRAD is also checked
+# against the extraterrestrial radiation of the day)
+QC_LIMITS = {
+    'TMAX': (-60.0, 60.0),
+    'TMIN': (-70.0, 45.0),
+    'SRAD': (0.0, 45.0),
+    'RAIN': (0.0, 1000.0),
+    'RHUM': (0.0, 100.0),
+    'WIND': (0.0, 2000.0),
+    'DEWP': (-70.0, 45.0),
+    'TDEW': (-70.0, 45.0),
+    'PAR': (0.0, 100.0),
+}
+
+# Longest gap in days filled by linear interpolation
+QC_MAX_GAP = 3
+
+# Hargreaves-Samani radiation coefficient for interior locations
+HARGREAVES_KRS = 0.16
+
+
+def _extraterrestrial_radiation(latitude, doy):
+    """Return the daily extraterrestrial radiation (MJ/m2/d, FAO-56 eq. 21)."""
+    phi = np.radians(latitude)
+    angle = 2.0 * np.pi * doy / 365.0
+    distance = 1.0 + 0.033 * np.cos(angle)
+    declination = 0.409 * np.sin(angle - 1.39)
+    sunset = np.arccos(np.clip(-np.tan(phi) * np.tan(declination), -1.0, 1.0))
+    return (24.0 * 60.0 / np.pi * 0.0820 * distance
+            * (sunset * np.sin(phi) * np.sin(declination)
+               + np.cos(phi) * np.cos(declination) * np.sin(sunset)))
+
+
+def _climate_temperature(latitude, doy, tav, amp):
+    """Return the mean temperature of the day from the station climate.
+
+    Follows the DSSAT soil temperature model: a cosine of amplitude
+    ``AMP / 2`` around ``TAV`` peaking on day 200 (day 20 in the south).
+    """
+    hottest = np.where(latitude < 0.0, 20.0, 200.0)
+    return tav + amp / 2.0 * np.cos(2.0 * np.pi / 365.0 * (doy - hottest))
+
+
+def _interpolate(values, day, group, max_gap):
+    """Fill gaps of at most ``max_gap`` days by linear interpolation.
+
+    ``day`` is the day number of each row and ``group`` the file it comes
+    from; gaps are only bridged between values of the same file.  Returns
+    the filled values and the mask of the filled rows.
+    """
+    n = len(values)
+    rows = np.arange(n)
+    valid = ~np.isnan(values)
+    before = np.maximum.accumulate(np.where(valid, rows, -1))
+    after = np.minimum.accumulate(np.where(valid, rows, n)[::-1])[::-1]
+    gaps = np.flatnonzero(~valid & (before >= 0) & (after < n))
+    low, high = before[gaps], after[gaps]
+    span = day[high] - day[low]
+    keep = ((group[low] == group[gaps]) & (group[high] == group[gaps])
+            & (span > 0) & (span - 1 <= max_gap))
+    gaps, low, high, span = gaps[keep], low[keep], high[keep], span[keep]
+
+    values = values.copy()
+    values[gaps] = values[low] + ((values[high] - values[low])
+                                  * (day[gaps] - day[low]) / span)
+    filled = np.zeros(n, dtype=bool)
+    filled[gaps] = True
+    return values, filled
+
+
+def _group_mean(values, group, n_groups):
+    """Return the mean of the non-missing ``values`` of every group."""
+    valid = ~np.isnan(values)
+    count = np.bincount(group[valid], minlength=n_groups)
+    total = np.bincount(group[valid], values[valid], minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return total / count
+
+
+def _quality_control(date, doy, columns, group, station,
+                     max_gap=QC_MAX_GAP):
+    """Flag and fill the weather ``columns`` of many files at once.
+
+    ``group`` numbers the file of every row (rows of a file are
+    consecutive) and ``station`` maps ``LAT``, ``TAV`` and ``AMP`` to one
+    value per file.  A missing ``TAV``/``AMP`` is estimated from the
+    file's own temperatures.  Returns the cleaned columns and a ``uint8``
+    array of QC flag bits per column.
+    """
+    n_groups = len(station['LAT'])
+    day = date.astype(np.int64)
+    latitude = station['LAT'][group]
+    columns = {name: np.array(values, dtype=np.float64)
+               for name, values in columns.items()}
+    flags = {name: np.where(np.isnan(values), QC_MISSING, 0).astype(np.uint8)
+             for name, values in columns.items()}
+
+    # Reject impossible values
+    for name, (low, high) in QC_LIMITS.items():
+        if name in columns:
+            values = columns[name]
+            with np.errstate(invalid='ignore'):
+                bad = (values < low) | (values > high)
+            if name == 'SRAD':
+                with np.errstate(invalid='ignore'):
+                    bad |= values > _extraterrestrial_radiation(latitude, doy)
+            flags[name][bad] |= QC_RANGE
+            values[bad] = np.nan
+    if 'TMAX' in columns and 'TMIN' in columns:
+        tmax, tmin = columns['TMAX'], columns['TMIN']
+        with np.errstate(invalid='ignore'):
+            crossed = tmin > tmax
+        for name in ('TMAX', 'TMIN'):
+            flags[name][crossed] |= QC_TMIN_TMAX
+            columns[name][crossed] = np.nan
+
+    # Bridge short gaps; rain and radiation are not interpolated
+    for name, values in columns.items():
+        if name in ('RAIN', 'SRAD'):
+            continue
+        columns[name], filled = _interpolate(values, day, group, max_gap)
+        flags[name][filled] |= QC_INTERPOLATED
+
+    if 'TMAX' in columns and 'TMIN' in columns:
+        # Long temperature gaps from the station climate, with the mean
+        # diurnal range of the file around the climatological mean
+        tmax, tmin = columns['TMAX'], columns['TMIN']
+        mean = (tmax + tmin) / 2.0
+        tav = station['TAV'].copy()
+        amp = station['AMP'].copy()
+        own = _group_mean(mean, group, n_groups)
+        spread = _group_mean((mean - own[group]) ** 2, group, n_groups)
+        tav[np.isnan(tav)] = own[np.isnan(tav)]
+        amp[np.isnan(amp)] = 2.0 * np.sqrt(2.0 * spread[np.isnan(amp)])
+        diurnal = _group_mean(tmax - tmin, group, n_groups)
+        diurnal[np.isnan(diurnal)] = 10.0
+        climate = _climate_temperature(latitude, doy, tav[group], amp[group])
+        for name, sign in (('TMAX', 1.0), ('TMIN', -1.0)):
+            values = columns[name]
+            gaps = np.isnan(values)
+            values[gaps] = climate[gaps] + sign * diurnal[group[gaps]] / 2.0
+            flags[name][gaps & ~np.isnan(values)] |= QC_CLIMATE
+
+        # A filled value may cross the other temperature; move it
+        crossed = tmin > tmax
+        filled = (flags['TMIN'] & (QC_INTERPOLATED | QC_CLIMATE)) != 0
+        moved = crossed & filled
+        tmin[moved] = tmax[moved]
+        tmax[crossed & ~moved] = tmin[crossed & ~moved]
+
+    if 'RAIN' in columns:
+        gaps = np.isnan(columns['RAIN'])
+        columns['RAIN'][gaps] = 0.0
+        flags['RAIN'][gaps] |= QC_CLIMATE
+
+    if 'SRAD' in columns and 'TMAX' in columns and 'TMIN' in columns:
+        values = columns['SRAD']
+        gaps = np.isnan(values)
+        spread = np.maximum(columns['TMAX'][gaps] - columns['TMIN'][gaps], 0.0)
+        values[gaps] = (HARGREAVES_KRS * np.sqrt(spread)
+                        * _extraterrestrial_radiation(latitude[gaps],
+                                                      doy[gaps]))
+        flags['SRAD'][gaps & ~np.isnan(values)] |= QC_ESTIMATED
+    return columns, flags
+
+
+def clean_weather(weather, max_gap=QC_MAX_GAP):
+    """Return a :class:`WeatherFile` with QC-flagged and filled columns.
+
+    The flags of every column are in ``qc`` as ``QC_*`` bits; values that
+    could not be filled stay ``NaN``.
+    """
+    station = {key: np.array([weather.station.get(key, np.nan)], dtype=float)
+               for key in ('LAT', 'TAV', 'AMP')}
+    columns, flags = _quality_control(
+        weather.date, weather.doy, weather.columns,
+        np.zeros(len(weather), dtype=np.int64), station, max_gap)
+    return WeatherFile(weather.path, weather.station, weather.year,
+                       weather.doy, weather.date, columns, flags)
+
+
+# Station header fields kept in the archive index
+ARCHIVE_STATION = ('LAT', 'LONG', 'ELEV', 'TAV', 'AMP', 'REFHT', 'WNDHT')
+
+# Archive directory created inside the weather directory by default
+ARCHIVE_DIR = '.archive'
+
+_ARCHIVE_VERSION = 2
+
+# Subdirectory of an archive caching its cleaned columns and QC flags
+CLEAN_DIR = 'clean'
+
+# Smallest width of the file names in the archive index; longer names
+# widen the field for the whole index
+_NAME_WIDTH = 32
+
+
+def _index_dtype(width=_NAME_WIDTH):
+    """Return the archive index dtype for file names up to ``width`` long."""
+    return np.dtype([
+        ('name', f'U{width}'), ('file', f'U{width}'), ('station', 'U4'),
+        ('insi', 'U16'), ('start', 'i8'), ('stop', 'i8'),
+        ('first', 'M8[D]'), ('last', 'M8[D]'),
+        ('size', 'i8'), ('mtime', 'i8'), ('digest', 'S16'),
+        ('header', 'U256'),
+    ] + [(name, 'f8') for name in ARCHIVE_STATION])
+
+
+def _name_width(entry):
+    """Return the width of the file names of an index row."""
+    return entry.dtype['file'].itemsize // np.dtype('U1').itemsize
+
+
+def _swap_dir(staging, target):
+    """Replace the directory ``target`` by the directory ``staging``.
+
+    The old directory is renamed aside before the new one is renamed in
+    and removed afterwards, so ``target`` never holds files of two builds;
+    a reader opening it between the two renames finds no directory at
+    all and treats the archive as missing.
+    """
+    aside = target + '.old'
+    shutil.rmtree(aside, ignore_errors=True)
+    try:
+        os.rename(target, aside)
+    except FileNotFoundError:
+        aside = None
+    os.replace(staging, target)
+    if aside is not None:
+        shutil.rmtree(aside, ignore_errors=True)
+
+
+class WeatherArchive:
+    """Memory-mapped columnar archive of a directory of weather files.
+
+    Every variable is one ``.npy`` array holding the days of all files back
+    to back, ordered by station and date.  ``index`` has one row per file
+    with its row range, station header and the size, modification time and
+    digest of the source used by incremental rebuilds.  Files and
+    station-years are returned as slices of the memory maps, without
+    copying.  With ``cleaned`` the columns are the QC-cleaned arrays
+    cached by :func:`clean_archive` and ``qc`` holds their flags.
+    """
+
+    def __init__(self, directory, cleaned=False):
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('version') != _ARCHIVE_VERSION:
+            raise ValueError(f"{directory}: unsupported archive version")
+        self.directory = directory
+        self.source = meta['source']
+        self.variables = tuple(meta['variables'])
+        self.index = np.load(os.path.join(directory, 'index.npy'))
+        self.present = np.load(os.path.join(directory, 'present.npy'))
+        self.date = self._load('date')
+        self.year = self._load('year')
+        self.doy = self._load('doy')
+        self.columns = {name: self._load(name) for name in self.variables}
+        self.qc = {}
+        if cleaned:
+            self.columns = {name: self._load(os.path.join(CLEAN_DIR, name))
+                            for name in self.variables}
+            self.qc = {name: self._load(os.path.join(CLEAN_DIR, f'{name}.qc'))
+                       for name in self.variables}
+
+        self._rows = {name: i for i, name in enumerate(self.index['name'])}
+        self._stations = {}
+        self._years = {}
+        for i, entry in enumerate(self.index):
+            self._stations.setdefault(entry['station'], []).append(i)
+            if entry['stop'] == entry['start']:
+                continue
+            first = int(self.year[entry['start']])
+            last = int(self.year[entry['stop'] - 1])
+            for year in range(first, last + 1):
+                self._years.setdefault((entry['station'], year), []).append(i)
+
+    def _load(self, name):
+        path = os.path.join(self.directory, f'{name}.npy')
+        return np.load(path, mmap_mode='r' if len(self.index) else None)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, name):
+        return name in self._rows
+
+    def __getitem__(self, name):
+        return self.read(name)
+
+    def names(self):
+        """Return the file stems in archive order."""
+        return list(self.index['name'])
+
+    def stations(self):
+        """Return the sorted station codes in the archive."""
+        return sorted(self._stations)
+
+    def station(self, name):
+        """Return the station header of file ``name`` or station code.
+
+        For a station code the header of its first file is returned.
+        """
+        i = self._rows.get(name)
+        if i is None:
+            i = self._stations[name][0]
+        entry = self.index[i]
+        station = {'INSI': str(entry['insi'])}
+        station.update((key, float(entry[key])) for key in ARCHIVE_STATION)
+        return station
+
+    def coverage(self, station):
+        """Return the first and last day with weather for ``station``."""
+        entries = self.index[self._stations[station]]
+        return entries['first'].min(), entries['last'].max()
+
+    def files(self, station, year):
+        """Return the stems of the files of ``station`` covering ``year``."""
+        rows = self._years.get((station, int(year)), ())
+        return [str(self.index['name'][i]) for i in rows]
+
+    def season(self, station, start, end):
+        """Return the weather of ``station`` from ``start`` to ``end``.
+
+        Days are taken from every file of the station overlapping the
+        window, so a season planted in autumn continues into the next
+        year's file; where files overlap the earlier file wins.  The
+        series is a view of the archive when its days are stored
+        contiguously and stops at the last day available before ``end``.
+        Raises KeyError when the station has no weather in the window and
+        ValueError when days are missing inside it.
+        """
+        start = np.datetime64(start, 'D')
+        end = np.datetime64(end, 'D')
+        first = start.astype('datetime64[Y]').astype(int) + 1970
+        last = end.astype('datetime64[Y]').astype(int) + 1970
+        files = sorted({i for year in range(first, last + 1)
+                        for i in self._years.get((station, year), ())})
+        if not files:
+            raise KeyError(f"no weather for station {station} "
+                           f"between {start} and {end}")
+
+        entries = self.index[files]
+        rows = np.concatenate([np.arange(entry['start'], entry['stop'])
+                               for entry in entries])
+        dates = self.date[rows]
+        inside = (dates >= start) & (dates <= end)
+        rows, dates = rows[inside], dates[inside]
+        dates, unique = np.unique(dates, return_index=True)
+        rows = rows[unique]
+        if not len(rows):
+            raise KeyError(f"no weather for station {station} "
+                           f"between {start} and {end}")
+        missing = int((dates[-1] - dates[0]).astype(int)) + 1 - len(dates)
+        if missing:
+            raise ValueError(f"weather of station {station} misses "
+                             f"{missing} days between {start} and {end}")
+
+        if rows[-1] - rows[0] + 1 == len(rows):
+            rows = slice(int(rows[0]), int(rows[-1]) + 1)
+        present = self.present[files].any(axis=0)
+        columns = {variable: self.columns[variable][rows]
+                   for variable, used in zip(self.variables, present) if used}
+        qc = {variable: self.qc[variable][rows]
+              for variable in columns if variable in self.qc}
+        path = os.path.join(self.source,
+                            '+'.join(str(entry['file']) for entry in entries))
+        return WeatherFile(path, self.station(str(entries[0]['name'])),
+                           self.year[rows], self.doy[rows], self.date[rows],
+                           columns, qc)
+
+    def read(self, name):
+        """Return file ``name`` as a :class:`WeatherFile` of array views."""
+        i = self._rows[name]
+        entry = self.index[i]
+        rows = slice(entry['start'], entry['stop'])
+        columns = {variable: self.columns[variable][rows]
+                   for variable, present in zip(self.variables, self.present[i])
+                   if present}
+        qc = {variable: self.qc[variable][rows]
+              for variable in columns if variable in self.qc}
+        return WeatherFile(os.path.join(self.source, entry['file']),
+                           self.station(name), self.year[rows],
+                           self.doy[rows], self.date[rows], columns, qc)
+
+
+def _archive_entry(path, stat, digest, weather, header):
+    """Return the index row of a freshly parsed weather file."""
+    file = os.path.basename(path)
+    entry = np.zeros((), dtype=_index_dtype(max(_NAME_WIDTH, len(file))))
+    entry['name'] = os.path.splitext(file)[0]
+    entry['file'] = file
+    entry['station'] = file[:4].upper()
+    entry['insi'] = weather.station.get('INSI', '')
+    entry['stop'] = len(weather)
+    if len(weather):
+        entry['first'] = weather.date[0]
+        entry['last'] = weather.date[-1]
+    else:
+        entry['first'] = entry['last'] = np.datetime64('NaT')
+    entry['size'] = stat.st_size
+    entry['mtime'] = stat.st_mtime_ns
+    entry['digest'] = digest
+    entry['header'] = header
+    for key in ARCHIVE_STATION:
+        entry[key] = weather.station.get(key, np.nan)
+    return entry
+
+
+def _open_archive(archive):
+    """Return the archive in ``archive`` or None if absent or unreadable."""
+    try:
+        return WeatherArchive(archive)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def build_archive(source, archive=None, pattern='*.WTH', clean=False):
+    """Convert the weather files of ``source`` into a columnar archive.
+
+    Files whose size and modification time are unchanged since the last
+    build are copied from the previous archive, as are files with a new
+    time but the same content digest.  Files that only had days appended
+    since the last build (a station feed adding a line each day) keep
+    their old rows and only the new lines are parsed; other new and
+    edited files are parsed in full.  An archive that is already current
+    is opened as is.  Returns the :class:`WeatherArchive`, with the
+    cleaned columns of :func:`clean_archive` when ``clean`` is set.
+    """
+    archive = archive or os.path.join(source, ARCHIVE_DIR)
+    old = _open_archive(archive)
+    known = {} if old is None else {
+        str(entry['file']): i for i, entry in enumerate(old.index)}
+
+    # (index row, freshly parsed WeatherFile or None to reuse the old rows)
+    files = []
+    stale = old is None
+    paths = sorted(glob.glob(os.path.join(source, pattern)))
+    for path in paths:
+        stat = os.stat(path)
+        i = known.get(os.path.basename(path))
+        if i is not None:
+            entry = old.index[i].copy()
+            if (entry['size'] == stat.st_size
+                    and entry['mtime'] == stat.st_mtime_ns):
+                files.append((entry, i, None))
+                continue
+        with open(path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.blake2b(raw, digest_size=16).digest()
+        stale = True
+        if i is not None and entry['digest'] == digest:
+            entry['mtime'] = stat.st_mtime_ns
+            files.append((entry, i, None))
+            continue
+        if i is not None and entry['size'] < len(raw):
+            rows = _appended_rows(raw, int(entry['size']))
+            prefix = hashlib.blake2b(raw[:entry['size']], digest_size=16)
+            if rows is not None and prefix.digest() == entry['digest']:
+                name = str(entry['name'])
+                weather = _concat_weather(
+                    old.read(name),
+                    _parse_rows(rows, str(entry['header']), path, {}))
+                files.append((_archive_entry(path, stat, digest, weather,
+                                             str(entry['header'])),
+                              None, weather))
+                continue
+        station, header, rows = _split_wth(raw, path)
+        weather = _parse_rows(rows, header, path, station)
+        files.append((_archive_entry(path, stat, digest, weather, header),
+                      None, weather))
+    if stale or len(paths) != len(known):
+        _write_archive(archive, source, files, old)
+        old = WeatherArchive(archive)
+    return clean_archive(old) if clean else old
+
+
+def _write_archive(archive, source, files, old):
+    """Write the archive of ``files`` to ``archive``, replacing it.
+
+    The arrays are written to a staging directory that replaces the old
+    archive with :func:`_swap_dir`.
+    """
+    files.sort(key=lambda f: (str(f[0]['station']),
+                              f[0]['first'].astype(np.int64),
+                              str(f[0]['name'])))
+    variables = set()
+    for entry, i, weather in files:
+        if weather is None:
+            variables.update(v for v, present in
+                             zip(old.variables, old.present[i]) if present)
+        else:
+            variables.update(weather.columns)
+    variables = sorted(variables)
+    position = {name: k for k, name in enumerate(variables)}
+
+    n_rows = sum(int(entry['stop'] - entry['start'])
+                 for entry, _, _ in files)
+    width = max([_NAME_WIDTH] + [_name_width(entry) for entry, _, _ in files])
+    index = np.empty(len(files), dtype=_index_dtype(width))
+    present = np.zeros((len(files), len(variables)), dtype=bool)
+    date = np.empty(n_rows, dtype='datetime64[D]')
+    year = np.empty(n_rows, dtype=np.int16)
+    doy = np.empty(n_rows, dtype=np.int16)
+    columns = {name: np.full(n_rows, np.nan) for name in variables}
+
+    offset = 0
+    for k, (entry, i, weather) in enumerate(files):
+        if weather is None:
+            weather = old.read(str(entry['name']))
+        rows = slice(offset, offset + len(weather))
+        date[rows] = weather.date
+        year[rows] = weather.year
+        doy[rows] = weather.doy
+        for name, values in weather.columns.items():
+            columns[name][rows] = values
+            present[k, position[name]] = True
+        entry['start'], entry['stop'] = rows.start, rows.stop
+        index[k] = entry
+        offset = rows.stop
+
+    staging = archive + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    np.save(os.path.join(staging, 'index.npy'), index)
+    np.save(os.path.join(staging, 'present.npy'), present)
+    np.save(os.path.join(staging, 'date.npy'), date)
+    np.save(os.path.join(staging, 'year.npy'), year)
+    np.save(os.path.join(staging, 'doy.npy'), doy)
+    for name, values in columns.items():
+        np.save(os.path.join(staging, f'{name}.npy'), values)
+    with open(os.path.join(staging, 'meta.json'), 'w') as f:
+        json.dump({'version': _ARCHIVE_VERSION,
+                   'source': os.path.abspath(source),
+                   'variables': variables}, f, indent=1)
+    _swap_dir(staging, archive)
+
+
+def clean_archive(archive, max_gap=QC_MAX_GAP):
+    """Return the archive with QC-cleaned columns, computing them once.
+
+    All files are checked and filled together as in :func:`clean_weather`
+    and the result is cached in the ``clean`` subdirectory of the archive,
+    which a rebuild of the archive discards.  ``archive`` is a
+    :class:`WeatherArchive` or its directory.
+    """
+    if isinstance(archive, WeatherArchive):
+        archive = archive.directory
+    cache = os.path.join(archive, CLEAN_DIR)
+    try:
+        with open(os.path.join(cache, 'meta.json')) as f:
+            if json.load(f) == {'version': _ARCHIVE_VERSION,
+                                'max_gap': max_gap}:
+                return WeatherArchive(archive, cleaned=True)
+    except (OSError, ValueError):
+        pass
+
+    raw = WeatherArchive(archive)
+    index = raw.index
+    group = np.repeat(np.arange(len(index)), index['stop'] - index['start'])
+    station = {key: index[key] for key in ('LAT', 'TAV', 'AMP')}
+    columns, flags = _quality_control(raw.date, raw.doy.astype(np.int64),
+                                      raw.columns, group, station, max_gap)
+    # Variables absent from a file stay missing without flags
+    for k, name in enumerate(raw.variables):
+        absent = np.repeat(~raw.present[:, k], index['stop'] - index['start'])
+        columns[name][absent] = np.nan
+        flags[name][absent] = 0
+
+    staging = cache + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for name in raw.variables:
+        np.save(os.path.join(staging, f'{name}.npy'), columns[name])
+        np.save(os.path.join(staging, f'{name}.qc.npy'), flags[name])
+    with open(os.path.join(staging, 'meta.json'), 'w') as f:
+        json.dump({'version': _ARCHIVE_VERSION, 'max_gap': max_gap}, f)
+    _swap_dir(staging, cache)
+    return WeatherArchive(archive, cleaned=True)
+
+
+# Bytes before the read position of a feed checked to detect rewrites
+_FEED_CHECK = 64
+
+
+class WeatherFeed:
+    """Days appended to station weather files since the last update.
+
+    The read position, data header, station and last date of every file
+    are remembered (in the JSON file ``state`` when given, so a daily job
+    carries on where the previous one stopped) and :meth:`update` parses
+    only the lines added since.  A file that was rewritten instead of
+    extended is read again in full, still returning only the days after
+    the last one seen.  A partly written last line is left for the next
+    update.
+    """
+
+    def __init__(self, paths, state=None, pattern='*.WTH'):
+        if isinstance(paths, str):
+            paths = (sorted(glob.glob(os.path.join(paths, pattern)))
+                     if os.path.isdir(paths) else [paths])
+        self.paths = list(paths)
+        self.state = state
+        self.files = {}
+        if state is not None and os.path.exists(state):
+            with open(state) as f:
+                self.files = json.load(f)
+
+    def update(self):
+        """Return the new days of each file as a :class:`WeatherFile`.
+
+        The result is keyed by file stem and leaves out files without new
+        days.
+        """
+        new = {}
+        for path in self.paths:
+            weather = self._read(path)
+            if len(weather):
+                new[os.path.splitext(os.path.basename(path))[0]] = weather
+        if self.state is not None:
+            with open(self.state + '.tmp', 'w') as f:
+                json.dump(self.files, f, indent=1)
+            os.replace(self.state + '.tmp', self.state)
+        return new
+
+    def last(self, path):
+        """Return the last day read from ``path`` (``NaT`` if none)."""
+        known = self.files.get(path)
+        return np.datetime64(None if known is None else known['last'], 'D')
+
+    def _read(self, path):
+        """Return the days of ``path`` after the last one seen."""
+        known = self.files.get(path)
+        rows = None
+        with open(path, 'rb') as f:
+            if known is not None:
+                start = max(known['offset'] - _FEED_CHECK, 0)
+                f.seek(start)
+                raw = f.read()
+                check = raw[:known['offset'] - start]
+                if (len(check) == known['offset'] - start
+                        and hashlib.blake2b(check).hexdigest()
+                        == known['check']):
+                    raw = raw[:raw.rfind(b'\n') + 1]
+                    rows = _appended_rows(raw, known['offset'] - start)
+                    offset = start + len(raw)
+                    header, station = known['header'], known['station']
+            if rows is None:
+                f.seek(0)
+                raw = f.read()
+                raw = raw[:raw.rfind(b'\n') + 1]
+                station, header, rows = _split_wth(raw, path)
+                offset = len(raw)
+        weather = _parse_rows(rows, header, path, station)
+
+        last = self.last(path)
+        if not np.isnat(last) and len(weather):
+            keep = weather.date > last
+            weather = WeatherFile(
+                weather.path, station, weather.year[keep], weather.doy[keep],
+                weather.date[keep],
+                {name: values[keep]
+                 for name, values in weather.columns.items()})
+        self.files[path] = {
+            'offset': offset,
+            'check': hashlib.blake2b(raw[-_FEED_CHECK:]).hexdigest(),
+            'header': header,
+            'station': station,
+            'last': str(weather.date[-1]) if len(weather) else (
+                None if np.isnat(last) else str(last)),
+        }
+        return weather
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Build or update the columnar weather archive.")
+    parser.add_argument(
+        'source', nargs='?',
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'dssat-csm-data-develop', 'Weather'),
+        help="directory of .WTH files")
+    parser.add_argument('--archive', help="archive directory "
+                        f"(default: SOURCE/{ARCHIVE_DIR})")
+    args = parser.parse_args()
+    weather = build_archive(args.source, args.archive, clean=True)
+    print(f"{len(weather)} files, {len(weather.date)} days, "
+          f"{len(weather.stations())} stations in {weather.directory}")
+    rejected = QC_MISSING | QC_RANGE | QC_TMIN_TMAX
+    filled = QC_INTERPOLATED | QC_CLIMATE | QC_ESTIMATED
+    for name in ('TMAX', 'TMIN', 'SRAD', 'RAIN'):
+        if name in weather.qc:
+            flags = np.asarray(weather.qc[name])
+            print(f"{name}: {np.count_nonzero(flags & rejected)} rejected, "
+                  f"{np.count_nonzero(flags & filled)} filled")
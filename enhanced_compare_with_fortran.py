@@ -3,8 +3,7 @@
 
 import argparse  # 解析命令行参数
 import os  # 文件路径和进程相关操作
-import subprocess  # 运行外部程序
-from datetime import datetime  # 日期计算
+import sys  # 模块注册表
 
 import pandas as pd  # 核心数据结构库
 import pandas.testing as pdt  # DataFrame 比较工具
@@ -13,91 +12,33 @@ import pandas.testing as pdt  # DataFrame 比较工具
 import importlib.util  # 动态导入工具
 import pathlib  # 文件系统路径助手
 
+from dssat_filex import read_filex  # 结构化的实验文件 (FileX)
+from dssat_genotype import load_genotypes  # 品种参数表
+from dssat_runner import cached_table, find_executable, read_plantgro, run_experiment  # 隔离目录中运行并缓存 DSSAT 输出
+from dssat_soil import build_soil_index  # 土壤剖面索引
+from dssat_weather import build_archive  # 共享的气象归档
+
 impl_path = (pathlib.Path(__file__).resolve().parent / 
               "cropgro-strawberry-implementation.py")  # 指向实现文件的路径
 spec = importlib.util.spec_from_file_location(  # 创建一个指向该文件的模块 spec
     "cropgro_strawberry_implementation", impl_path)  # 模块名和路径
 impl_module = importlib.util.module_from_spec(spec)  # 从 spec 获取模块对象
+sys.modules[spec.name] = impl_module  # 注册模块以便缓存编译后的内核
 spec.loader.exec_module(impl_module)  # 执行该模块以获得属性
 CropgroStrawberry = impl_module.CropgroStrawberry  # 提取类定义
 
 
-def parse_dssat_date(code: str) -> str:  # decode a YYDDD date
-    """将 DSSAT YYDDD 日期码转换为 YYYY-MM-DD 字符串。"""
-    year = 2000 + int(code[:2])  # 前两位转换为年份
-    doy = int(code[2:])  # 剩下的字符为一年中的天数
-    return datetime.strptime(f"{year} {doy}", "%Y %j").strftime("%Y-%m-%d")  # 解析并格式化为 ISO 日期
-
-
-def parse_srx_file(path: str):  # read planting date and station from experiment
-    """从 SRX 文件中提取种植日期和气象站代码。"""
-    planting_code = None  # 占位种植日期码
-    wsta = None  # 占位气象站代码
-    with open(path) as f:  # 打开 SRX 实验文件
-        lines = f.readlines()  # 读取所有行到内存中
-    for i, line in enumerate(lines):  # examine each line with its index
-        if line.startswith("@L ID_FIELD"):  # look for the field section indicator
-            if i + 1 < len(lines):  # ensure the next line exists
-                parts = lines[i + 1].split()  # split the following line into parts
-                if len(parts) >= 3:  # verify there are enough tokens
-                    wsta = parts[2]  # capture the weather station code
-        if line.startswith("@P PDATE"):  # look for the planting date indicator
-            if i + 1 < len(lines):  # ensure the next line exists
-                parts = lines[i + 1].split()  # split the following line into parts
-                if len(parts) >= 2:  # verify there are enough tokens
-                    planting_code = parts[1]  # capture the planting date code
-    planting_date = parse_dssat_date(planting_code) if planting_code else None  # 如找到则将代码转为日期字符串
-    return planting_date, wsta  # 返回提取的值
-
-
-def read_wth_file(path: str) -> pd.DataFrame:  # read weather data from .WTH
-    """将 DSSAT .WTH 文件解析为 DataFrame。"""
-    with open(path) as f:  # 打开气象文件
-        lines = f.readlines()  # 读取文件行
-    start = next(i for i, l in enumerate(lines) if l.startswith("@DATE"))  # 定位表头所在行
-    header = lines[start].split()  # 获取列名
-    indices = {h: idx for idx, h in enumerate(header)}  # 列名映射到位置
-    records = []  # 用于存储每天记录的列表
-    for line in lines[start + 1 :]:  # process each subsequent line
-        if not line.strip() or line.startswith("*"):  # skip blank lines and comments
-            continue  # ignore lines that have no data
-        parts = line.split()  # split the data fields
-        code = parts[0]  # YYDDD code
-        date = parse_dssat_date(code)  # convert to ISO date
-        rec = {  # build a record for this day
-            "date": date,  # 日期字符串
-            "tmax": float(parts[indices["TMAX"]]),  # 最高温度
-            "tmin": float(parts[indices["TMIN"]]),  # 最低温度
-            "solar_radiation": float(parts[indices["SRAD"]]),  # 太阳辐射
-            "rainfall": float(parts[indices["RAIN"]]) if "RAIN" in indices and len(parts) > indices["RAIN"] else 0.0,  # 降雨量
-            "rh": float(parts[indices["RHUM"]]) if "RHUM" in indices and len(parts) > indices["RHUM"] else 70.0,  # 相对湿度
-            "wind_speed": float(parts[indices["WIND"]]) if "WIND" in indices and len(parts) > indices["WIND"] else 2.0,  # 风速
-        }  # end of record dictionary
-        records.append(rec)  # store the day's data
-    return pd.DataFrame(records)  # convert list to DataFrame
-
-
 def run_dssat(srx_path: str, dssat_dir: str):  # invoke the DSSAT executable
-    """使用 DSSAT 可执行文件对指定的 SRX 文件运行 DSSAT。"""
-    # Use the DSSAT executable directly instead of the run_dssat wrapper
-    dssat_exe = "/app/dssat/dscsm048"  # Direct path to DSSAT executable in Docker
-    if not os.path.exists(dssat_exe):  # 确认该可执行文件存在
-        # Fallback to local path if not in Docker
-        dssat_exe = os.path.abspath(os.path.join(dssat_dir, "dscsm048"))
-        if not os.path.exists(dssat_exe):
-            raise FileNotFoundError(f"DSSAT executable not found at {dssat_exe}")  # 如未找到则抛出异常
-    
-    # Change to the experiment directory first, then run DSSAT
-    # This matches our successful manual approach
-    original_dir = os.getcwd()
-    try:
-        os.chdir(os.path.dirname(srx_path))
-        # Run DSSAT with correct syntax: dscsm048 CRGRO048 A FileX
-        # CRGRO048 = CROPGRO model for strawberry
-        # A = Run all treatments in the specified FileX
-        subprocess.run([dssat_exe, "CRGRO048", "A", os.path.basename(srx_path)], check=True)
-    finally:
-        os.chdir(original_dir)  # Always return to original directory
+    """使用 DSSAT 可执行文件对指定的 SRX 文件运行 DSSAT，返回 dssat_runner.RunResult。"""
+    dssat_exe = find_executable(dssat_dir)  # 优先 Docker 中的可执行文件，其次本地编译
+    # Run DSSAT with correct syntax: dscsm048 CRGRO048 A FileX
+    # CRGRO048 = CROPGRO model for strawberry
+    # A = Run all treatments in the specified FileX
+    # 在私有的临时目录中运行，不再 chdir，多个实验可同时运行而互不覆盖输出文件；
+    # 输入未变化时直接从输出缓存恢复
+    result = run_experiment(srx_path, dssat_exe)
+    result.check_returncode()  # 运行失败或超时则抛出异常
+    return result
 
 
 def read_fortran_output(exp_dir: str) -> pd.DataFrame:  # read DSSAT output files
@@ -107,29 +48,19 @@ def read_fortran_output(exp_dir: str) -> pd.DataFrame:  # read DSSAT output file
         return pd.read_csv(summary_path)  # 返回 DataFrame
     pg_path = os.path.join(exp_dir, "PlantGro.OUT")  # 回退到 PlantGro.OUT 文件
     if os.path.exists(pg_path):  # 如果存在则加载定宽文件
-        # Find the header line starting with @YEAR
-        with open(pg_path) as f:
-            lines = f.readlines()
-        header_idx = next(i for i, line in enumerate(lines) if line.startswith("@YEAR"))
-        # Read from header line onwards
-        return pd.read_fwf(pg_path, skiprows=header_idx)  # 返回 DataFrame
+        return pd.DataFrame(read_plantgro(pg_path))  # 所有运行，带 TRNO 列
     raise FileNotFoundError("No DSSAT output found")  # 如未找到任何输出则抛出异常
 
 
-def run_python_model(wth_df: pd.DataFrame, planting_date: str):  # simulate growth using Python model
-    soil = {"max_root_depth": 50.0, "field_capacity": 200.0, "wilting_point": 50.0}  # 简单土壤参数
-    cultivar = {  # 品种特性
-        "name": "Generic",  # 品种名称
-        "tbase": 4.0,  # 基本温度
-        "topt": 22.0,  # 最佳温度
-        "tmax_th": 35.0,  # 最大温度阈值
-        "rue": 2.5,  # 辐射利用效率
-        "k_light": 0.6,  # 光截断系数
-        "sla": 0.02,  # 比叶面积
-        "potential_fruits_per_crown": 10.0,  # 单株潜在果实数
-    }
-    model = CropgroStrawberry(40.0, planting_date, soil, cultivar)  # 实例化模型
-    return model.simulate_growth(wth_df)  # 运行模拟
+def run_python_model(experiment, wth_df: pd.DataFrame, latitude: float = 40.0) -> dict:  # simulate every treatment in one batch
+    """用一次批量调用模拟实验中的所有处理，返回 {处理编号: DataFrame}。"""
+    local = os.path.join(os.path.dirname(experiment.path), "SOIL.SOL")  # 优先使用实验目录中的土壤文件
+    soil_sources = ([local] if os.path.exists(local) else []) + [os.path.join("dssat-csm-data-develop", "Soil")]
+    soils = build_soil_index(soil_sources)  # 按 ID_SOIL 的字节偏移索引土壤剖面，只建一次
+    genotypes = load_genotypes()  # SRGRO048 品种、生态型和物种参数
+    batch = impl_module.simulate_experiment(  # 各处理的土壤、品种、种植日期、PPOP 和最后收获日期
+        experiment, latitude, soils, genotypes, wth_df)
+    return {t.number: batch.to_frame(j) for j, t in enumerate(experiment.treatments)}
 
 
 def map_python_to_dssat_columns(py_df: pd.DataFrame) -> pd.DataFrame:  # map Python column names to DSSAT names
@@ -255,55 +186,81 @@ def main():  # orchestrate the comparison
     parser.add_argument("srx", help="Path to DSSAT .SRX file")  # DSSAT .SRX 文件路径
     parser.add_argument("--dssat-dir", default="dssat-csm-os-develop", help="DSSAT installation directory")  # DSSAT 安装目录
     parser.add_argument("--output-dir", default="comparison_results", help="Directory to save comparison results")  # 输出目录
+    parser.add_argument("--fortran-output", help="Directory with the outputs of a finished DSSAT run (skips running DSSAT)")  # 已完成的 DSSAT 输出目录
     args = parser.parse_args()  # 解析参数
 
     print("=== Enhanced DSSAT vs Python Model Comparison ===")
 
-    planting_date, wsta = parse_srx_file(args.srx)  # 从 SRX 提取信息
-    if planting_date is None or wsta is None:  # 校验必需数据
+    experiment = read_filex(args.srx)  # 从 SRX 提取处理、品种、田块和收获计划
+    treatments = [t for t in experiment.treatments if t.planting is not None and t.field is not None]
+    if not treatments or len(treatments) < len(experiment.treatments):  # 校验必需数据
         raise ValueError("Could not parse SRX file")  # 如果 SRX 格式有误则终止
-    
-    print(f"📅 Planting date: {planting_date}")
+    wsta = treatments[0].field.wsta  # 实验的气象站
+    if any(t.field.wsta != wsta for t in treatments):
+        raise ValueError("Treatments with different weather stations are not supported")
+    planting_date = str(min(t.planting.date for t in treatments))  # 最早种植日期
+    harvests = [t.last_harvest for t in treatments if t.last_harvest is not None]
+    harvest_date = str(max(harvests)) if harvests else None  # 所有处理的最后收获日期
+
+    for t in treatments:
+        cultivar = t.cultivar.ingeno if t.cultivar else "-"
+        print(f"🧪 Treatment {t.number} {t.name}: {cultivar}, planted {t.planting.date}, "
+              f"PPOP {t.planting.ppop}, {0 if t.harvests is None else len(t.harvests)} harvests")
     print(f"🌍 Weather station: {wsta}")
 
     print("\n🔄 Running DSSAT simulation...")
-    run_dssat(args.srx, args.dssat_dir)  # 生成 Fortran 输出
-
-    exp_dir = os.path.dirname(args.srx)  # 输出文件所在目录
-    fort_df = read_fortran_output(exp_dir)  # 加载 DSSAT 结果
+    if args.fortran_output:
+        fort_df = read_fortran_output(args.fortran_output)  # 已完成运行的输出
+    else:
+        run = run_dssat(args.srx, args.dssat_dir)  # 生成 Fortran 输出
+        table = cached_table(run)  # 输出缓存中已解析的 PlantGro.OUT
+        fort_df = pd.DataFrame(table) if table is not None else read_fortran_output(run.output_dir)
     print(f"✅ DSSAT completed: {fort_df.shape}")
 
-    year = planting_date[:4]  # 提取年份以检索天气数据
     weather_dir = os.path.join("dssat-csm-data-develop", "Weather")  # 天气文件根目录
-    matches = [f for f in os.listdir(weather_dir) if f.startswith(f"{wsta}{year[2:]}") and f.endswith(".WTH")]  # 查找匹配文件
-    if not matches:  # 确保天气文件存在
-        raise FileNotFoundError("Weather file not found")  # 若无则报错
-    wth_path = os.path.join(weather_dir, matches[0])  # 取第一个匹配文件
-    wth_df = read_wth_file(wth_path)  # 加载天气文件到 DataFrame
-    print(f"📊 Weather data loaded: {wth_df.shape}")
+    archive = build_archive(weather_dir, clean=True)  # 气象站索引（已填补缺测），仅在文件变化时重建
+    season_end = harvest_date or (pd.Timestamp(planting_date) + pd.Timedelta(days=365)).strftime("%Y-%m-%d")  # 季节结束日期
+    weather = archive.season(wsta, planting_date, season_end)  # 拼接该站跨年的气象文件
+    wth_df = weather.to_frame()  # 加载天气数据到 DataFrame
+    latitude = weather.station["LAT"]  # 气象站的实际纬度
+    latitude = 0.0 if pd.isna(latitude) else latitude  # 与 DSSAT 一致，缺失时使用 0
+    print(f"📊 Weather data loaded: {wth_df.shape} ({weather.date[0]} to {weather.date[-1]}, LAT {latitude})")
 
     print("\n🔄 Running Python model...")
-    py_df = run_python_model(wth_df, planting_date)  # 运行 Python 模型
-    print(f"✅ Python model completed: {py_df.shape}")
-    
-    # Map Python columns to DSSAT column names
-    py_df_mapped = map_python_to_dssat_columns(py_df)  # 映射列名
-    
-    # Find common columns between mapped Python output and DSSAT output
-    common_cols = [c for c in fort_df.columns if c in py_df_mapped.columns]
-    print(f"\n🔍 Found {len(common_cols)} common variables: {common_cols}")
-    
-    if not common_cols:
+    py_runs = run_python_model(experiment, wth_df, latitude)  # 与 DSSAT 一样运行全部处理
+    print(f"✅ Python model completed: {len(py_runs)} treatments")
+
+    comparisons, summaries = [], []  # 每个处理的比较结果
+    for number, py_df in py_runs.items():
+        # Map Python columns to DSSAT column names
+        py_df_mapped = map_python_to_dssat_columns(py_df)  # 映射列名
+        if "TRNO" in fort_df.columns:  # PlantGro.OUT 每个处理一个运行
+            fort_run = fort_df[fort_df["TRNO"] == number].reset_index(drop=True)
+        else:
+            fort_run = fort_df
+
+        # Find common columns between mapped Python output and DSSAT output
+        common_cols = [c for c in fort_run.columns if c in py_df_mapped.columns and c != "TRNO"]
+        print(f"\n🔍 Treatment {number}: found {len(common_cols)} common variables: {common_cols}")
+        if not common_cols:
+            continue
+
+        # Create detailed comparison DataFrame and summary statistics
+        comparison = create_comparison_dataframe(fort_run, py_df_mapped, common_cols)
+        comparison.insert(0, "TRNO", number)
+        summary = create_summary_statistics(comparison, common_cols)
+        summary.insert(0, "TRNO", number)
+        comparisons.append(comparison)
+        summaries.append(summary)
+
+    if not comparisons:
         print("❌ No common columns found for comparison")
         return
-    
+
     print("\n📊 Creating detailed comparison...")
-    # Create detailed comparison DataFrame
-    comparison_df = create_comparison_dataframe(fort_df, py_df_mapped, common_cols)
+    comparison_df = pd.concat(comparisons, ignore_index=True)
     print(f"✅ Detailed comparison created: {len(comparison_df)} rows × {len(comparison_df.columns)} columns")
-    
-    # Create summary statistics
-    summary_df = create_summary_statistics(comparison_df, common_cols)
+    summary_df = pd.concat(summaries, ignore_index=True)
     print(f"✅ Summary statistics created for {len(summary_df)} variables")
     
     # Display results
@@ -312,11 +269,11 @@ def main():  # orchestrate the comparison
     
     print(f"\n=== 📋 DETAILED COMPARISON (First 10 rows) ===")
     # Show a subset of columns for readability
-    display_cols = ['Row']
+    display_cols = ['TRNO', 'Row']
     for col in common_cols[:3]:  # Show first 3 variables
         display_cols.extend([f'{col}_DSSAT', f'{col}_Python', f'{col}_Diff', f'{col}_PctDiff'])
     
-    if len(display_cols) > 1:
+    if len(display_cols) > 2:
         print(comparison_df[display_cols].head(10))
     
     # Save results to files
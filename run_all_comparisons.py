@@ -1,13 +1,20 @@
 #!/usr/bin/env python3
 """Run validation for all strawberry experiments automatically."""
 
+import argparse
 import os
 import subprocess
 import sys
 from pathlib import Path
 
-def run_validation(srx_file, output_dir="validation_results"):
-    """Run validation for a single experiment file."""
+from dssat_runner import RUN_TIMEOUT, find_executable, run_experiments
+
+def run_validation(srx_file, dssat_dir, fortran_output=None, output_dir="validation_results"):
+    """Run validation for a single experiment file.
+
+    Without ``fortran_output`` the validation looks the DSSAT run up in the
+    output cache and compares against its stored table.
+    """
     # Create output directory if it doesn't exist
     Path(output_dir).mkdir(exist_ok=True)
     
@@ -21,13 +28,16 @@ def run_validation(srx_file, output_dir="validation_results"):
         print(f"{'='*60}")
         
         # Run the validation
-        result = subprocess.run([
+        command = [
             sys.executable, "validate_models.py", 
             srx_file,
-            "--dssat-dir", "dssat-csm-os-develop",
+            "--dssat-dir", dssat_dir,
             "--tolerance", "1.0",
             "--report", report_file
-        ], capture_output=True, text=True, check=True)
+        ]
+        if fortran_output:
+            command += ["--fortran-output", fortran_output]
+        result = subprocess.run(command, capture_output=True, text=True, check=True)
         
         print(result.stdout)
         print(f"✅ PASSED: {experiment_name}")
@@ -45,6 +55,16 @@ def run_validation(srx_file, output_dir="validation_results"):
 
 def main():
     """Run validation for all strawberry experiments."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dssat-dir", default="dssat-csm-os-develop")
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                        help="DSSAT runs at once (default: number of CPUs)")
+    parser.add_argument("--timeout", type=float, default=RUN_TIMEOUT,
+                        help="Seconds before a DSSAT run is killed")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Run DSSAT even when its inputs are unchanged")
+    args = parser.parse_args()
+
     # Find all strawberry experiment files
     strawberry_dir = "dssat-csm-data-develop/Strawberry"
     srx_files = list(Path(strawberry_dir).glob("*.SRX"))
@@ -57,10 +77,33 @@ def main():
     for f in srx_files:
         print(f"  - {f.name}")
     
-    # Run validation for each experiment
+    # Compile the model kernels once so every validation run loads them
+    subprocess.run([sys.executable, "cropgro-strawberry-implementation.py",
+                    "--warmup"], capture_output=True, check=True)
+    # Convert new or edited weather files into the binary weather archive
+    subprocess.run([sys.executable, "dssat_weather.py"],
+                   capture_output=True, check=True)
+    
+    # Run DSSAT on all experiments at once, each in its own scratch directory
+    print(f"\nRunning DSSAT on {len(srx_files)} experiments...")
+    runs = run_experiments(srx_files, find_executable(args.dssat_dir),
+                           jobs=args.jobs, timeout=args.timeout,
+                           cache=False if args.no_cache else None)
+    cached = sum(run.cached for run in runs)
+    if cached:
+        print(f"{cached} DSSAT runs reused from the cache (inputs unchanged)")
+    
+    # Run validation for each experiment against its DSSAT outputs
     results = {}
-    for srx_file in srx_files:
-        success = run_validation(str(srx_file))
+    for srx_file, run in zip(srx_files, runs):
+        if not run.ok:
+            status = "timed out" if run.returncode is None else f"exit code {run.returncode}"
+            print(f"❌ FAILED: {srx_file.stem} (DSSAT {status}, see {run.output_dir})")
+            results[srx_file.stem] = False
+            continue
+        # Runs restored from the cache are read back from its parsed table
+        success = run_validation(str(srx_file), args.dssat_dir,
+                                 None if run.cached else run.output_dir)
         results[srx_file.stem] = success
     
     # Summary
@@ -5,70 +5,26 @@ between Python CROPGRO-Strawberry model and DSSAT Fortran model outputs.
 """
 
 import os
+import sys
 import pandas as pd
-from datetime import datetime
 import importlib.util
 import pathlib
 
+from dssat_genotype import load_genotypes
+from dssat_soil import build_soil_index
+from dssat_weather import read_wth_file
+
 # Import the CropgroStrawberry class
 impl_path = (pathlib.Path(__file__).resolve().parent / 
              "cropgro-strawberry-implementation.py")
 spec = importlib.util.spec_from_file_location(
     "cropgro_strawberry_implementation", impl_path)
 impl_module = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = impl_module
 spec.loader.exec_module(impl_module)
 CropgroStrawberry = impl_module.CropgroStrawberry
 
 
-def parse_dssat_date(code: str) -> str:
-    """Convert DSSAT YYDDD date code to YYYY-MM-DD string."""
-    year = 2000 + int(code[:2])
-    doy = int(code[2:])
-    return datetime.strptime(f"{year} {doy}", "%Y %j").strftime("%Y-%m-%d")
-
-
-def read_wth_file(path: str) -> pd.DataFrame:
-    """Parse a DSSAT .WTH file into a DataFrame."""
-    with open(path) as f:
-        lines = f.readlines()
-    start = next(i for i, l in enumerate(lines) if l.startswith("@DATE"))
-    header = lines[start].split()
-    indices = {h: idx for idx, h in enumerate(header)}
-    records = []
-    for line in lines[start + 1:]:
-        if not line.strip() or line.startswith("*"):
-            continue
-        parts = line.split()
-        # Need at least DATE column
-        if len(parts) < 1:
-            continue
-        code = parts[0]
-        date = parse_dssat_date(code)
-        rec = {
-            "date": date,
-            "tmax": (float(parts[indices["TMAX"]]) 
-                    if "TMAX" in indices and len(parts) > indices["TMAX"] 
-                    else 25.0),
-            "tmin": (float(parts[indices["TMIN"]]) 
-                    if "TMIN" in indices and len(parts) > indices["TMIN"] 
-                    else 15.0),
-            "solar_radiation": (float(parts[indices["SRAD"]]) 
-                               if "SRAD" in indices and len(parts) > indices["SRAD"] 
-                               else 20.0),
-            "rainfall": (float(parts[indices["RAIN"]]) 
-                        if "RAIN" in indices and len(parts) > indices["RAIN"] 
-                        else 0.0),
-            "rh": (float(parts[indices["RHUM"]]) 
-                  if "RHUM" in indices and len(parts) > indices["RHUM"] 
-                  else 70.0),
-            "wind_speed": (float(parts[indices["WIND"]]) 
-                          if "WIND" in indices and len(parts) > indices["WIND"] 
-                          else 2.0),
-        }
-        records.append(rec)
-    return pd.DataFrame(records)
-
-
 def read_fortran_output(exp_dir: str) -> pd.DataFrame:
     """Load PlantGro.OUT produced by DSSAT."""
     pg_path = os.path.join(exp_dir, "PlantGro.OUT")
@@ -82,17 +38,8 @@ def read_fortran_output(exp_dir: str) -> pd.DataFrame:
 
 def run_python_model(wth_df: pd.DataFrame, planting_date: str):
     """Simulate growth using Python model."""
-    soil = {"max_root_depth": 50.0, "field_capacity": 200.0, "wilting_point": 50.0}
-    cultivar = {
-        "name": "Generic",
-        "tbase": 4.0,
-        "topt": 22.0,
-        "tmax_th": 35.0,
-        "rue": 2.5,
-        "k_light": 0.6,
-        "sla": 0.02,
-        "potential_fruits_per_crown": 10.0,
-    }
+    soil = build_soil_index("dssat-csm-data-develop/Soil")["UFGA010700"]  # ID_SOIL of UFBA1601.SRX
+    cultivar = load_genotypes()["SR0001"]  # Radiance, treatment 1 of UFBA1601.SRX
     model = CropgroStrawberry(40.0, planting_date, soil, cultivar)
     return model.simulate_growth(wth_df)
 
@@ -0,0 +1,88 @@
+"""Check that the NumPy fallback engine agrees with the numba engine."""
+
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+IMPL_PATH = Path(__file__).resolve().parent / "cropgro-strawberry-implementation.py"
+
+
+def load_engine(backend):
+    """Import the implementation with ``CROPGRO_BACKEND`` set to ``backend``."""
+    previous = os.environ.get("CROPGRO_BACKEND")
+    os.environ["CROPGRO_BACKEND"] = backend
+    try:
+        spec = importlib.util.spec_from_file_location(f"cropgro_{backend}", IMPL_PATH)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module  # register so compiled kernels can be cached
+        spec.loader.exec_module(module)
+    finally:
+        if previous is None:
+            del os.environ["CROPGRO_BACKEND"]
+        else:
+            os.environ["CROPGRO_BACKEND"] = previous
+    return module
+
+
+def faulty_weather():
+    """A season with inverted temperatures and missing values on some days."""
+    rng = np.random.default_rng(7)
+    n = 150
+    tmin = rng.uniform(5.0, 15.0, n)
+    tmax = tmin + rng.uniform(5.0, 12.0, n)
+    tmax[::9], tmin[::9] = tmin[::9] - 1.0, tmax[::9]  # TMAX < TMIN: NaN reference ET
+    srad = rng.uniform(8.0, 25.0, n)
+    srad[5::17] = np.nan
+    rain = rng.exponential(2.0, n)
+    rain[3::13] = np.nan
+    return pd.DataFrame({
+        "date": pd.date_range("2016-10-01", periods=n).strftime("%Y-%m-%d"),
+        "tmax": tmax, "tmin": tmin, "solar_radiation": srad, "rainfall": rain,
+        "rh": np.full(n, 70.0), "wind_speed": np.full(n, 2.0),
+    })
+
+
+def test_numpy_engine_matches_numba_on_faulty_weather():
+    numba_engine = load_engine("numba")
+    if numba_engine.BACKEND != "numba":
+        pytest.skip("numba is not installed")
+    numpy_engine = load_engine("numpy")
+    weather = faulty_weather()
+    soil = {"max_root_depth": 50.0, "field_capacity": 200.0, "wilting_point": 50.0}
+    cultivars = [
+        {"name": "Albion", "tbase": 4.0, "topt": 22.0, "tmax_th": 35.0, "rue": 2.5,
+         "k_light": 0.7, "sla": 0.02, "potential_fruits_per_crown": 10.0},
+        {"name": "Radiance", "tbase": 7.0, "topt": 28.0, "tmax_th": 40.0, "rue": 2.2,
+         "k_light": 0.6, "sla": 0.018, "potential_fruits_per_crown": 8.0},
+    ]
+    results = [engine.simulate_batch(27.76, "2016-10-08", soil, cultivars, weather)
+               for engine in (numba_engine, numpy_engine)]
+    for j in range(len(cultivars)):
+        expected, actual = (batch.to_frame(j) for batch in results)
+        numeric = expected.select_dtypes("number").columns
+        assert not expected[["biomass", "fruit_biomass", "water_stress"]].isna().any().any()
+        np.testing.assert_allclose(actual[numeric], expected[numeric], rtol=1e-9, atol=1e-12)
+
+
+def test_parallel_batch_caps_threads_at_the_numba_pool():
+    engine = load_engine("numba")
+    if engine.BACKEND != "numba":
+        pytest.skip("numba is not installed")
+    weather = faulty_weather()
+    soil = {"max_root_depth": 50.0, "field_capacity": 200.0, "wilting_point": 50.0}
+    cultivar = {"name": "Albion", "tbase": 4.0, "topt": 22.0, "tmax_th": 35.0,
+                "rue": 2.5, "k_light": 0.7, "sla": 0.02,
+                "potential_fruits_per_crown": 10.0}
+    threads = engine.config.NUMBA_NUM_THREADS + 8
+    parallel = engine.simulate_batch(27.76, "2016-10-08", soil, [cultivar] * 3,
+                                     weather, parallel=True, n_threads=threads)
+    serial = engine.simulate_batch(27.76, "2016-10-08", soil, [cultivar] * 3,
+                                   weather)
+    for j in range(3):
+        np.testing.assert_array_equal(parallel.to_frame(j)["biomass"],
+                                      serial.to_frame(j)["biomass"])
@@ -0,0 +1,80 @@
+"""Tests for reading DSSAT experiment files."""
+
+import shutil
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import dssat_filex
+
+SRX = (Path(__file__).resolve().parent / "dssat-csm-data-develop"
+       / "Strawberry" / "UFBA1601.SRX")
+
+
+@pytest.fixture
+def fresh_process(monkeypatch):
+    """Start with an empty in-memory cache, as a new process would."""
+    monkeypatch.setattr(dssat_filex, "_FILEX_CACHE", OrderedDict())
+
+
+@pytest.fixture
+def experiment_copy(tmp_path):
+    path = tmp_path / "UFBA1601.SRX"
+    shutil.copy(SRX, path)
+    return path
+
+
+def test_treatments_are_resolved(fresh_process):
+    experiment = dssat_filex.read_filex(SRX, cache=False)
+    assert [(t.name, t.cultivar.ingeno, t.planting.ppop)
+            for t in experiment.treatments] == [
+        ("Radiance", "SR0001", 4.3), ("Brilliance", "SR0003", 4.3)]
+    first = experiment.treatments[0]
+    assert first.field.wsta == "UFBA"
+    assert first.field.id_soil == "UFGA010700"
+    assert first.planting.date == np.datetime64("2016-10-08")
+    assert first.last_harvest == np.datetime64("2017-03-18")
+
+
+def test_copy_reports_its_own_path(fresh_process, experiment_copy):
+    original = dssat_filex.read_filex(SRX, cache=False)
+    copy = dssat_filex.read_filex(experiment_copy, cache=False)
+    assert copy.path == str(experiment_copy)
+    assert original.path == str(SRX)
+    assert copy.treatments is original.treatments
+
+
+def test_parse_is_reused_by_another_process(fresh_process, monkeypatch,
+                                            experiment_copy):
+    first = dssat_filex.read_filex(experiment_copy)
+    archived = list((experiment_copy.parent / ".archive" / "filex").iterdir())
+    assert [path.name for path in archived] == [f"{first.digest}.pickle"]
+
+    monkeypatch.setattr(dssat_filex, "_FILEX_CACHE", OrderedDict())
+
+    def no_parse(raw, path=""):
+        raise AssertionError("parsed again")
+    monkeypatch.setattr(dssat_filex, "parse_filex", no_parse)
+    again = dssat_filex.read_filex(experiment_copy)
+    assert again.digest == first.digest
+    assert [t.name for t in again.treatments] == ["Radiance", "Brilliance"]
+
+
+def test_edited_file_is_parsed_again(fresh_process, experiment_copy):
+    first = dssat_filex.read_filex(experiment_copy)
+    text = experiment_copy.read_text(encoding="latin-1")
+    experiment_copy.write_text(text.replace("Brilliance", "Renamed   "),
+                               encoding="latin-1")
+    edited = dssat_filex.read_filex(experiment_copy)
+    assert edited.digest != first.digest
+    assert edited.treatments[1].name == "Renamed"
+
+
+def test_corrupt_archive_entry_is_ignored(fresh_process, experiment_copy):
+    digest = dssat_filex.read_filex(experiment_copy).digest
+    entry = experiment_copy.parent / ".archive" / "filex" / f"{digest}.pickle"
+    entry.write_bytes(b"not a pickle")
+    dssat_filex._FILEX_CACHE.clear()
+    assert dssat_filex.read_filex(experiment_copy).digest == digest
@@ -0,0 +1,40 @@
+"""Tests for the shared fixed-width table parsing."""
+
+import numpy as np
+
+from dssat_fixedwidth import (data_rows, field_extents, parse_columns,
+                              parse_number, table_extents)
+
+
+def test_blank_fields_keep_later_columns_in_place():
+    header = "@DATE  SRAD  TMAX   PAR"
+    lines = ["16001  12.5  25.1      ", "16002         24.0   8.1",
+             "! comment", "", "@NEXT"]
+    rows = data_rows(lines)
+    assert len(rows) == 2
+    columns = parse_columns(rows, field_extents(header))
+    np.testing.assert_array_equal(columns["DATE"], [16001, 16002])
+    np.testing.assert_array_equal(columns["SRAD"], [12.5, np.nan])
+    np.testing.assert_array_equal(columns["TMAX"], [25.1, 24.0])
+    np.testing.assert_array_equal(columns["PAR"], [np.nan, 8.1])
+
+
+def test_missing_sentinel_is_nan():
+    assert np.isnan(parse_number(" -99"))
+    assert np.isnan(parse_number("  "))
+    assert parse_number(" 1.5") == 1.5
+    rows = data_rows([" 1  -99.0", " 2    3.0"])
+    values = parse_columns(rows, field_extents("@L  SLLL"))["SLLL"]
+    np.testing.assert_array_equal(values, [np.nan, 3.0])
+
+
+def test_table_extents_left_aligned_text_and_dotted_names():
+    header = "@L ID_FIELD WSTA....  FLSA ID_SOIL    FLNAME"
+    row = " 1 UFBA0001 UFBA       -99 UFGA010700 -99"
+    extents = table_extents(header, {"ID_FIELD", "WSTA", "ID_SOIL", "FLNAME"})
+    assert [name for name, _, _ in extents] == [
+        "L", "ID_FIELD", "WSTA", "FLSA", "ID_SOIL", "FLNAME"]
+    values = {name: row[start:stop].strip() for name, start, stop in extents}
+    assert values == {"L": "1", "ID_FIELD": "UFBA0001", "WSTA": "UFBA",
+                      "FLSA": "-99", "ID_SOIL": "UFGA010700",
+                      "FLNAME": "-99"}
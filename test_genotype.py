@@ -0,0 +1,80 @@
+"""Tests for reading DSSAT genotype files into engine cultivar parameters."""
+
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import dssat_genotype
+from test_backends import faulty_weather, load_engine
+
+SOURCE = dssat_genotype.GENOTYPE_DIR
+
+
+@pytest.fixture
+def genotype_dir(tmp_path):
+    """A copy of the strawberry genotype files."""
+    directory = tmp_path / "Genotype"
+    directory.mkdir()
+    for ext in (".CUL", ".ECO", ".SPE"):
+        shutil.copy(Path(SOURCE) / f"SRGRO048{ext}", directory)
+    return directory
+
+
+def test_cultivars_are_mapped_onto_engine_parameters(genotype_dir):
+    table = dssat_genotype.load_genotypes(str(genotype_dir))
+    assert list(table) == ["SR0001", "SR0002", "SR0003"]
+    brilliance = table["SR0003"]
+    assert brilliance["name"] == "Brilliance"
+    assert brilliance["rue"] == pytest.approx(1.75 * 2.5 / 1.35)
+    assert brilliance["sla"] == pytest.approx(165.0 * 1e-4)
+    assert (brilliance["tbase"], brilliance["topt"],
+            brilliance["tmax_th"]) == (2.0, 20.0, 40.0)
+    assert brilliance["k_light"] == pytest.approx(0.67)
+    # The generic RUE of the validation scripts is kept for Radiance
+    assert table["SR0001"]["rue"] == pytest.approx(2.5)
+    np.testing.assert_array_equal(table.column("ECO#"), table.codes)
+
+
+def test_unknown_cultivar_raises(genotype_dir):
+    table = dssat_genotype.load_genotypes(str(genotype_dir))
+    assert "SR0009" not in table
+    with pytest.raises(KeyError, match="SR0009"):
+        table.cultivars(["SR0001", "SR0009"])
+
+
+def test_table_is_reused_until_a_file_changes(genotype_dir, monkeypatch):
+    first = dssat_genotype.load_genotypes(str(genotype_dir))
+    assert (genotype_dir / ".archive" / "SRGRO048.npz").exists()
+
+    def no_parse(*raw, source=""):
+        raise AssertionError("parsed again")
+    with monkeypatch.context() as patch:
+        patch.setattr(dssat_genotype, "parse_genotypes", no_parse)
+        again = dssat_genotype.load_genotypes(str(genotype_dir))
+    assert again["SR0002"] == first["SR0002"]
+
+    path = genotype_dir / "SRGRO048.CUL"
+    text = path.read_text(encoding="latin-1")
+    path.write_text(text.replace("Sensation  ", "Festival   "),
+                    encoding="latin-1")
+    edited = dssat_genotype.load_genotypes(str(genotype_dir))
+    assert edited["SR0002"]["name"] == "Festival"
+
+
+def test_batch_of_codes_matches_batch_of_dicts(genotype_dir):
+    engine = load_engine("numpy")
+    table = dssat_genotype.load_genotypes(str(genotype_dir))
+    codes = ["SR0003", "SR0001", "SR0003"]
+    soil = {"max_root_depth": 50.0, "field_capacity": 200.0,
+            "wilting_point": 50.0}
+    weather = faulty_weather()
+    by_code = engine.simulate_batch(27.76, "2016-10-08", soil, codes,
+                                    weather, genotypes=table)
+    by_dict = engine.simulate_batch(27.76, "2016-10-08", soil,
+                                    [dict(table[code]) for code in codes],
+                                    weather)
+    for j in range(len(codes)):
+        np.testing.assert_array_equal(by_code.to_frame(j)["biomass"],
+                                      by_dict.to_frame(j)["biomass"])
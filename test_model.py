@@ -0,0 +1,141 @@
+"""Tests for stepping, continuing and forking a season of the model."""
+
+import numpy as np
+import pytest
+
+from test_backends import faulty_weather, load_engine
+
+SOIL = {"max_root_depth": 50.0, "field_capacity": 200.0, "wilting_point": 50.0}
+CULTIVAR = {"name": "Albion", "tbase": 4.0, "topt": 22.0, "tmax_th": 35.0,
+            "rue": 2.5, "k_light": 0.7, "sla": 0.02,
+            "potential_fruits_per_crown": 10.0}
+PLANTING = "2016-10-08"
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return load_engine("auto")
+
+
+@pytest.fixture
+def weather():
+    return faulty_weather()
+
+
+def new_model(engine):
+    return engine.CropgroStrawberry(27.76, PLANTING, SOIL, CULTIVAR)
+
+
+def numeric(frame):
+    return frame.select_dtypes("number").to_numpy(float)
+
+
+def assert_same_season(actual, expected):
+    assert list(actual["date"]) == list(expected["date"])
+    np.testing.assert_allclose(numeric(actual), numeric(expected),
+                               rtol=1e-12, equal_nan=True)
+
+
+def test_simulate_day_then_advance_matches_simulate_growth(engine, weather):
+    expected = new_model(engine).simulate_growth(weather)
+    model = new_model(engine)
+    days = weather.to_dict("records")
+    first = int(np.flatnonzero(weather["date"] == PLANTING)[0])
+    for day in days[first:first + 20]:
+        model.simulate_day(day)
+    assert str(model.last_date) == days[first + 19]["date"]
+    model.advance(weather)
+    assert_same_season(model.results.to_frame(), expected)
+
+
+def test_simulate_day_steps_any_day(engine, weather):
+    model = new_model(engine)
+    days = weather.to_dict("records")
+    model.simulate_day(days[0])  # before the planting date
+    model.simulate_day(days[10])  # not the day after the previous one
+    model.simulate_day(days[10])  # the same day again
+    assert model.days_after_planting == 3
+    assert len(model.results.to_frame()) == 3
+    assert str(model.last_date) == days[10]["date"]
+
+
+def test_simulate_day_drops_resimulate_history(engine, weather):
+    model = new_model(engine)
+    model.resimulate(weather.iloc[:60])
+    model.simulate_day(weather.iloc[60].to_dict())
+    assert model._history is None
+
+
+def test_resimulate_after_simulate_growth_starts_from_planting(engine,
+                                                                 weather):
+    model = new_model(engine)
+    expected = model.simulate_growth(weather)
+    assert_same_season(model.resimulate(weather), expected)
+
+
+def test_resimulate_revised_weather_matches_a_fresh_run(engine, weather):
+    model = new_model(engine)
+    model.resimulate(weather, checkpoint_every=10)
+    revised = weather.copy()
+    revised.loc[80:90, "rainfall"] = 20.0
+    actual = model.resimulate(revised, checkpoint_every=10)
+    assert_same_season(actual, new_model(engine).simulate_growth(revised))
+
+
+def test_snapshot_continues_like_the_original(engine, weather):
+    model = new_model(engine)
+    model.advance(weather.iloc[:70])
+    restored = engine.CropgroStrawberry.from_snapshot(
+        model.snapshot().tobytes())
+    assert restored.last_date == model.last_date
+    assert_same_season(restored.advance(weather), model.advance(weather))
+
+
+def test_fork_branches_match_separate_runs(engine, weather):
+    model = new_model(engine)
+    model.advance(weather.iloc[:70])
+    futures = [weather, weather.assign(rainfall=0.0)]
+    branches = engine.fork(model, futures)
+    for j, future in enumerate(futures):
+        single = engine.CropgroStrawberry.from_snapshot(model.snapshot())
+        expected = single.advance(future)
+        assert_same_season(branches.to_frame(j)[expected.columns], expected)
+
+
+def test_stop_date_ends_the_season_on_that_day(engine, weather):
+    stop = engine.StopCondition(date="2016-11-15")
+    frame = new_model(engine).simulate_growth(weather, stop=stop)
+    assert frame["date"].iloc[-1] == "2016-11-15"
+
+
+def test_stop_date_with_fill_keeps_the_plant_state(engine, weather):
+    stop = engine.StopCondition(date="2016-11-15", fill=True)
+    frame = new_model(engine).simulate_growth(weather, stop=stop)
+    assert frame["date"].iloc[-1] == weather["date"].iloc[-1]
+    after = frame[frame["date"] >= "2016-11-15"]
+    assert after["biomass"].nunique() == 1
+    assert after["water_stress"].iloc[1:].isna().all()
+
+
+@pytest.mark.parametrize("date", ["2016-09-01", "2017-06-01"])
+def test_stop_date_outside_the_season_is_rejected(engine, weather, date):
+    with pytest.raises(ValueError, match="outside the season"):
+        new_model(engine).simulate_growth(
+            weather, stop=engine.StopCondition(date=date))
+
+
+def test_stop_date_in_a_weather_gap_is_rejected(engine, weather):
+    gap = weather[weather["date"] != "2016-11-15"]
+    with pytest.raises(ValueError, match="gap"):
+        new_model(engine).simulate_growth(
+            gap, stop=engine.StopCondition(date="2016-11-15"))
+
+
+def test_stop_stage_and_dap(engine, weather):
+    frame = new_model(engine).simulate_growth(
+        weather, stop=engine.StopCondition(dap=30))
+    assert frame["dap"].iloc[-1] == 30
+    frame = new_model(engine).simulate_growth(
+        weather, stop=engine.StopCondition(stage="VEGETATIVE"))
+    assert frame["stage"].iloc[-1] == "VEGETATIVE"
+    assert (frame["stage"].iloc[:-1] != "VEGETATIVE").all()
@@ -0,0 +1,124 @@
+"""Tests for running DSSAT in scratch directories and caching its outputs."""
+
+import os
+import shutil
+import stat
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import dssat_runner
+
+DATA = Path(__file__).resolve().parent / "dssat-csm-data-develop"
+PLANTGRO = DATA / "Strawberry" / "PlantGro.OUT"
+
+# Stand-in for dscsm048: counts its runs and writes a real PlantGro.OUT
+FAKE_MODEL = """#!/bin/sh
+test -f "$3" || {{ echo "no $3" >&2; exit 3; }}
+echo run >> "{runs}"
+cp "{plantgro}" PlantGro.OUT
+"""
+
+
+@pytest.fixture
+def install(tmp_path, monkeypatch):
+    """A fake DSSAT installation with its profile and data directories."""
+    monkeypatch.delenv("DSSAT_HOME", raising=False)
+    home = tmp_path / "dssat"
+    for name in ("Weather", "Soil", "Genotype"):
+        (home / name).mkdir(parents=True)
+    executable = home / "dscsm048"
+    executable.write_text(FAKE_MODEL.format(runs=tmp_path / "runs.log",
+                                            plantgro=PLANTGRO))
+    executable.chmod(executable.stat().st_mode | stat.S_IEXEC)
+    (home / "DSSATPRO.L48").write_text(
+        "".join(f"{code} // {home / name}\n" for code, name in
+                (("WED", "Weather"), ("SLD", "Soil"), ("CRD", "Genotype"))))
+    (home / "DETAIL.CDE").write_text("codes\n")
+    (home / "Weather" / "UFBA1601.WTH").write_text("weather\n")
+    (home / "Soil" / "UF.SOL").write_text("soil\n")
+    (home / "Genotype" / "SRGRO048.CUL").write_text("cultivars\n")
+    return home
+
+
+@pytest.fixture
+def experiment(tmp_path):
+    directory = tmp_path / "Strawberry"
+    directory.mkdir()
+    shutil.copy(DATA / "Strawberry" / "UFBA1601.SRX", directory)
+    return directory / "UFBA1601.SRX"
+
+
+def model_runs(tmp_path):
+    log = tmp_path / "runs.log"
+    return len(log.read_text().split()) if log.exists() else 0
+
+
+def test_run_inputs_come_from_the_profile_directories(install, experiment):
+    inputs = dssat_runner.run_inputs(str(experiment),
+                                     str(install / "dscsm048"))
+    names = {os.path.relpath(path, install) for path in inputs
+             if path.startswith(str(install))}
+    assert names == {"dscsm048", "DSSATPRO.L48", "DETAIL.CDE",
+                     os.path.join("Weather", "UFBA1601.WTH"),
+                     os.path.join("Soil", "UF.SOL"),
+                     os.path.join("Genotype", "SRGRO048.CUL")}
+
+
+def test_editing_profile_data_changes_the_key(install, experiment):
+    executable = str(install / "dscsm048")
+    key = dssat_runner.run_key(str(experiment), executable)
+    assert dssat_runner.run_key(str(experiment), executable) == key
+    (install / "Weather" / "UFBA1601.WTH").write_text("revised weather\n")
+    assert dssat_runner.run_key(str(experiment), executable) != key
+
+
+def test_unchanged_run_is_restored_from_the_cache(tmp_path, install,
+                                                  experiment):
+    executable = str(install / "dscsm048")
+    first = dssat_runner.run_experiment(str(experiment), executable)
+    second = dssat_runner.run_experiment(str(experiment), executable)
+    assert first.ok and second.ok
+    assert (first.cached, second.cached) == (False, True)
+    assert model_runs(tmp_path) == 1
+    assert first.key == second.key
+    output = Path(second.output_dir) / "PlantGro.OUT"
+    assert output.read_bytes() == PLANTGRO.read_bytes()
+
+    table = dssat_runner.cached_table(second)
+    parsed = dssat_runner.read_plantgro(output)
+    assert table.keys() == parsed.keys()
+    for name in parsed:
+        np.testing.assert_array_equal(table[name], parsed[name])
+
+
+def test_missing_profile_runs_uncached(tmp_path, install, experiment):
+    (install / "DSSATPRO.L48").unlink()
+    executable = str(install / "dscsm048")
+    with pytest.warns(UserWarning, match="without the output cache"):
+        result = dssat_runner.run_experiment(str(experiment), executable)
+    assert result.ok and not result.cached and result.key == ""
+    assert dssat_runner.cached_table(result) is None
+    assert model_runs(tmp_path) == 1
+
+
+def test_concurrent_runs_keep_their_outputs_apart(tmp_path, install,
+                                                  experiment):
+    copies = [experiment]
+    for name in ("UFBA1602.SRX", "UFBA1603.SRX"):
+        copies.append(experiment.with_name(name))
+        shutil.copy(experiment, copies[-1])
+    results = dssat_runner.run_experiments(
+        [str(path) for path in copies], str(install / "dscsm048"), jobs=3)
+    assert [result.ok for result in results] == [True] * 3
+    assert len({result.output_dir for result in results}) == 3
+    for result in results:
+        assert (Path(result.output_dir) / "PlantGro.OUT").exists()
+
+
+def test_read_plantgro_numbers_every_run():
+    table = dssat_runner.read_plantgro(PLANTGRO)
+    runs = PLANTGRO.read_text(encoding="latin-1").count("*RUN")
+    assert len(np.unique(table["TRNO"])) == runs
+    assert len(table["TRNO"]) == len(table["YEAR"]) > 0
@@ -0,0 +1,96 @@
+"""Tests for the byte-offset soil profile index."""
+
+import os
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import dssat_soil
+from dssat_filex import read_filex
+from dssat_genotype import load_genotypes
+from test_backends import load_engine
+
+DATA = Path(__file__).resolve().parent / "dssat-csm-data-develop"
+LOCAL_SOIL = DATA / "Strawberry" / "SOIL.SOL"
+
+
+@pytest.fixture
+def count_parses(monkeypatch):
+    """Record the ID of every profile passed to ``parse_profile``."""
+    parsed = []
+    parse = dssat_soil.parse_profile
+
+    def counting(text):
+        parsed.append(text.split()[0].lstrip("*"))
+        return parse(text)
+    monkeypatch.setattr(dssat_soil, "parse_profile", counting)
+    return parsed
+
+
+def season_weather(start, end):
+    """Plain daily weather covering ``start`` to ``end``."""
+    dates = pd.date_range(start, end)
+    return pd.DataFrame({
+        "date": dates.strftime("%Y-%m-%d"), "tmax": 25.0, "tmin": 12.0,
+        "solar_radiation": 15.0, "rainfall": 2.0, "rh": 70.0,
+        "wind_speed": 2.0,
+    })
+
+
+def test_experiment_parses_only_its_profiles(tmp_path, count_parses):
+    soils = dssat_soil.build_soil_index([LOCAL_SOIL, DATA / "Soil"],
+                                        index=str(tmp_path / "soil.npz"))
+    experiment = read_filex(DATA / "Strawberry" / "UFBA1601.SRX")
+    engine = load_engine("auto")
+    engine.simulate_experiment(experiment, 27.76, soils, load_genotypes(),
+                               season_weather("2016-10-01", "2017-03-31"))
+    soil_ids = {t.field.id_soil for t in experiment.treatments}
+    assert len(soils) > len(soil_ids)
+    assert sorted(count_parses) == sorted(soil_ids)
+
+
+def test_unknown_treatment_code_is_a_key_error(tmp_path):
+    soils = dssat_soil.build_soil_index(LOCAL_SOIL,
+                                        index=str(tmp_path / "soil.npz"))
+    experiment = read_filex(DATA / "Strawberry" / "UFBA1601.SRX")
+    engine = load_engine("auto")
+    empty = dssat_soil.SoilIndex(soils.files, soils.profiles[:0])
+    with pytest.raises(KeyError, match="UFGA010700"):
+        engine.simulate_experiment(experiment, 27.76, empty,
+                                   load_genotypes(),
+                                   season_weather("2016-10-01", "2017-03-31"))
+
+
+def test_index_is_reused_until_a_file_changes(tmp_path, monkeypatch):
+    source = tmp_path / "SOIL.SOL"
+    shutil.copy(LOCAL_SOIL, source)
+    index = str(tmp_path / "index" / "soil.npz")
+    first = dssat_soil.build_soil_index(source, index=index)
+
+    scanned = []
+    scan = dssat_soil._scan
+    monkeypatch.setattr(dssat_soil, "_scan",
+                        lambda path: scanned.append(path) or scan(path))
+    again = dssat_soil.build_soil_index(source, index=index)
+    assert scanned == []
+    assert list(again) == list(first)
+
+    with open(source, "ab") as f:
+        f.write(b"\n*ZZTEST0001  TEST  S  10  Appended profile\n")
+    os.utime(source, ns=(0, 0))
+    edited = dssat_soil.build_soil_index(source, index=index)
+    assert scanned == [str(source)]
+    assert "ZZTEST0001" in edited
+    assert sorted(os.listdir(tmp_path / "index")) == ["soil.npz"]
+
+
+def test_first_file_wins(tmp_path):
+    first, second = tmp_path / "A.SOL", tmp_path / "B.SOL"
+    shutil.copy(LOCAL_SOIL, first)
+    text = LOCAL_SOIL.read_text(encoding="latin-1")
+    second.write_text(text.replace("Candler", "Replaced"), encoding="latin-1")
+    soils = dssat_soil.build_soil_index([first, second],
+                                        index=str(tmp_path / "soil.npz"))
+    assert "Replaced" not in soils.profile("UFGA010700").name
@@ -0,0 +1,127 @@
+"""Tests for the columnar weather archive and the daily weather feed."""
+
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import dssat_weather
+
+STRAWBERRY = (Path(__file__).resolve().parent / "dssat-csm-data-develop"
+              / "Strawberry")
+LONG_NAME = "UFBA1601_with_a_rather_long_descriptive_name.WTH"
+
+
+@pytest.fixture
+def source(tmp_path):
+    """A weather directory with two years of one station."""
+    directory = tmp_path / "Weather"
+    directory.mkdir()
+    for name in ("UFBA1601.WTH", "UFBA1701.WTH"):
+        shutil.copy(STRAWBERRY / name, directory)
+    return directory
+
+
+def split_last_days(path, n):
+    """Cut the last ``n`` days off a file; return them as text."""
+    lines = path.read_text().splitlines(keepends=True)
+    path.write_text("".join(lines[:-n]))
+    return "".join(lines[-n:])
+
+
+def assert_same_weather(actual, expected):
+    np.testing.assert_array_equal(actual.date, expected.date)
+    assert actual.columns.keys() == expected.columns.keys()
+    for name in expected.columns:
+        np.testing.assert_array_equal(actual.columns[name],
+                                      expected.columns[name])
+
+
+def test_archive_reads_like_the_files(source):
+    archive = dssat_weather.build_archive(str(source))
+    assert sorted(archive.names()) == ["UFBA1601", "UFBA1701"]
+    assert_same_weather(archive.read("UFBA1601"),
+                        dssat_weather.read_wth(source / "UFBA1601.WTH"))
+
+
+def test_unchanged_archive_is_not_rewritten(source, monkeypatch):
+    dssat_weather.build_archive(str(source))
+    monkeypatch.setattr(dssat_weather, "_write_archive",
+                        lambda *args: pytest.fail("archive rewritten"))
+    dssat_weather.build_archive(str(source))
+
+
+def test_long_file_names_are_kept(source):
+    os.rename(source / "UFBA1601.WTH", source / LONG_NAME)
+    archive = dssat_weather.build_archive(str(source))
+    stem = os.path.splitext(LONG_NAME)[0]
+    assert stem in archive
+    assert archive.read(stem).path.endswith(LONG_NAME)
+    # The reopened index still matches the file, so nothing is parsed
+    again = dssat_weather.build_archive(str(source))
+    assert again.read(stem).path.endswith(LONG_NAME)
+
+
+def test_appended_days_match_a_full_build(source, tmp_path):
+    path = source / "UFBA1601.WTH"
+    tail = split_last_days(path, 5)
+    dssat_weather.build_archive(str(source))
+    with open(path, "a") as f:
+        f.write(tail)
+    updated = dssat_weather.build_archive(str(source))
+    fresh = dssat_weather.build_archive(str(source),
+                                        str(tmp_path / "fresh"))
+    assert_same_weather(updated.read("UFBA1601"), fresh.read("UFBA1601"))
+
+
+def test_rebuild_leaves_no_staging_directories(source):
+    dssat_weather.build_archive(str(source), clean=True)
+    (source / "UFBA1701.WTH").unlink()
+    archive = dssat_weather.build_archive(str(source), clean=True)
+    assert archive.names() == ["UFBA1601"]
+    assert sorted(os.listdir(source)) == [".archive", "UFBA1601.WTH"]
+    leftovers = [name for name in os.listdir(source / ".archive")
+                 if name.endswith((".tmp", ".old"))]
+    assert leftovers == []
+
+
+def test_clean_archive_fills_gaps_and_flags_them(source):
+    path = source / "UFBA1601.WTH"
+    lines = path.read_text().splitlines(keepends=True)
+    first = next(i for i, line in enumerate(lines)
+                 if line.startswith("@DATE")) + 10
+    lines[first] = lines[first][:5] + "   -99" + lines[first][11:]
+    path.write_text("".join(lines))
+    archive = dssat_weather.build_archive(str(source), clean=True)
+    raw = dssat_weather.WeatherArchive(archive.directory)
+    weather, cleaned = raw.read("UFBA1601"), archive.read("UFBA1601")
+    assert np.isnan(weather.columns["SRAD"][9])
+    assert not np.isnan(cleaned.columns["SRAD"][9])
+    assert cleaned.qc["SRAD"][9] & dssat_weather.QC_MISSING
+
+
+def test_season_spans_yearly_files(source):
+    archive = dssat_weather.build_archive(str(source))
+    season = archive.season("UFBA", "2016-10-08", "2017-03-18")
+    assert season.date[0] == np.datetime64("2016-10-08")
+    assert season.date[-1] == np.datetime64("2017-03-18")
+    assert (np.diff(season.date) == np.timedelta64(1, "D")).all()
+
+
+def test_feed_returns_only_new_days(source, tmp_path):
+    path = source / "UFBA1601.WTH"
+    tail = split_last_days(path, 3)
+    state = str(tmp_path / "feed.json")
+    first = dssat_weather.WeatherFeed([str(path)], state=state).update()
+    assert first["UFBA1601"].date[-1] == np.datetime64("2016-12-28")
+
+    with open(path, "a") as f:
+        f.write(tail)
+    # A new feed picks up where the saved state stopped
+    new = dssat_weather.WeatherFeed([str(path)], state=state).update()
+    np.testing.assert_array_equal(
+        new["UFBA1601"].date,
+        np.arange("2016-12-29", "2017-01-01", dtype="datetime64[D]"))
+    assert dssat_weather.WeatherFeed([str(path)], state=state).update() == {}
@@ -2,99 +2,36 @@
 
 import argparse  # parse command line arguments
 import os  # interact with the filesystem
-import subprocess  # launch external programs
-from datetime import datetime  # manipulate date information
+import sys  # module registry for the dynamic import
 from pathlib import Path  # object-oriented filesystem paths
 import pandas as pd  # tabular data handling
 
+from dssat_filex import read_filex  # structured experiment files
+from dssat_genotype import load_genotypes  # cultivar coefficient tables
+from dssat_runner import cached_table, find_executable, read_plantgro, run_experiment  # isolated, cached DSSAT runs
+from dssat_soil import build_soil_index  # soil profiles by ID
+from dssat_weather import build_archive  # shared weather archive
+
 # Import CropgroStrawberry from the implementation file
 import importlib.util  # utilities for dynamic import
 
 impl_path = Path(__file__).resolve().parent / "cropgro-strawberry-implementation.py"  # path to implementation file
 spec = importlib.util.spec_from_file_location("cropgro_impl", impl_path)  # module specification from path
 impl_module = importlib.util.module_from_spec(spec)  # create module object
+sys.modules[spec.name] = impl_module  # register so compiled kernels can be cached
 spec.loader.exec_module(impl_module)  # execute the module so attributes are available
 CropgroStrawberry = impl_module.CropgroStrawberry  # get the class definition
 
 
-def parse_dssat_date(code: str) -> str:
-    """Return ISO date string corresponding to a YYDDD DSSAT code."""
-    year = 2000 + int(code[:2])  # DSSAT years are 2000-based
-    doy = int(code[2:])  # remaining digits give day of year
-    return datetime.strptime(f"{year} {doy}", "%Y %j").strftime("%Y-%m-%d")  # parse and format
-
-
-def parse_srx_file(path: str):
-    """Extract planting date and weather station code from an SRX experiment."""
-    planting_code = None  # YYDDD planting date code from the file
-    wsta = None  # weather station identifier
-    with open(path) as f:  # read the entire SRX file
-        lines = f.readlines()
-    for i, line in enumerate(lines):  # iterate with index to peek at next line
-        if line.startswith("@L ID_FIELD") and i + 1 < len(lines):  # field block
-            parts = lines[i + 1].split()  # tokens from next line
-            if len(parts) >= 3:
-                wsta = parts[2]  # third token stores weather station code
-        if line.startswith("@P PDATE") and i + 1 < len(lines):  # planting date block
-            parts = lines[i + 1].split()
-            if len(parts) >= 2:
-                planting_code = parts[1]  # second token is planting date
-    planting_date = parse_dssat_date(planting_code) if planting_code else None  # convert to ISO date
-    return planting_date, wsta  # return tuple
-
-
-def read_wth_file(path: str) -> pd.DataFrame:
-    """Parse a DSSAT .WTH file into a pandas DataFrame."""
-    with open(path) as f:  # open the weather file
-        lines = f.readlines()
-    start = next(i for i, l in enumerate(lines) if l.startswith("@DATE"))  # header line index
-    header = lines[start].split()  # column names
-    indices = {h: idx for idx, h in enumerate(header)}  # map header -> column index
-    records = []  # list of daily weather dictionaries
-    for line in lines[start + 1 :]:  # process each record line
-        if not line.strip() or line.startswith("*"):  # skip blanks and comments
-            continue
-        parts = line.split()  # split the data fields
-        code = parts[0]  # first field is YYDDD date code
-        date = parse_dssat_date(code)  # convert to YYYY-MM-DD
-        rec = {
-            "date": date,
-            "tmax": float(parts[indices["TMAX"]]),  # daily max temperature
-            "tmin": float(parts[indices["TMIN"]]),  # daily min temperature
-            "solar_radiation": float(parts[indices["SRAD"]]),  # radiation MJ/m^2
-            "rainfall": float(parts[indices["RAIN"]]) if "RAIN" in indices and len(parts) > indices["RAIN"] else 0.0,  # precipitation
-            "rh": float(parts[indices["RHUM"]]) if "RHUM" in indices and len(parts) > indices["RHUM"] else 70.0,  # relative humidity
-            "wind_speed": float(parts[indices["WIND"]]) if "WIND" in indices and len(parts) > indices["WIND"] else 2.0,  # wind speed m/s
-        }
-        records.append(rec)  # store this day's data
-    return pd.DataFrame(records)  # assemble DataFrame
-
-
 def run_dssat(srx_path: str, dssat_dir: str):
-    """Run the official DSSAT model using the direct executable."""
-    # Use the DSSAT executable directly instead of the problematic run_dssat wrapper
-    dssat_exe_locations = [
-        Path("/app/dssat/dscsm048"),  # Docker build location (preferred)
-        Path(dssat_dir).resolve() / "dscsm048",  # Local build location
-    ]
-    
-    dssat_exe = None
-    for location in dssat_exe_locations:
-        if location.exists():
-            dssat_exe = location
-            break
-    
-    if dssat_exe is None:
-        locations_str = '\n  '.join(str(loc) for loc in dssat_exe_locations)
-        raise FileNotFoundError(f"DSSAT executable not found in any of these locations:\n  {locations_str}")
-
-    # execute DSSAT from within the experiment directory with correct syntax
-    # dscsm048 CRGRO048 A filename.SRX
-    subprocess.run(
-        [str(dssat_exe), "CRGRO048", "A", os.path.basename(srx_path)],  # correct DSSAT command syntax
-        cwd=os.path.dirname(srx_path),  # run in experiment directory
-        check=True,  # raise an error if the process fails
-    )
+    """Run the official DSSAT model on the experiment; returns its dssat_runner.RunResult."""
+    dssat_exe = find_executable(dssat_dir)  # Docker build location first, then the local build
+    # dscsm048 CRGRO048 A filename.SRX, run in a private scratch directory so
+    # that concurrent runs do not overwrite each other's output files; a run
+    # with unchanged inputs is restored from the output cache instead
+    result = run_experiment(srx_path, dssat_exe)
+    result.check_returncode()  # raise an error if the process fails or times out
+    return result
 
 
 def read_fortran_output(exp_dir: str) -> pd.DataFrame:
@@ -104,33 +41,36 @@ def read_fortran_output(exp_dir: str) -> pd.DataFrame:
         return pd.read_csv(summary_path)
     pg_path = os.path.join(exp_dir, "PlantGro.OUT")  # fallback fixed-width file
     if os.path.exists(pg_path):
-        return pd.read_fwf(pg_path, skiprows=4)
+        return pd.DataFrame(read_plantgro(pg_path))  # every run, with a TRNO column
     raise FileNotFoundError("No DSSAT output found")  # no recognised output present
 
 
-def run_python_model(wth_df: pd.DataFrame, planting_date: str) -> pd.DataFrame:
-    """Simulate crop growth with the Python implementation."""
-    soil = {
-        "max_root_depth": 50.0,
-        "field_capacity": 200.0,
-        "wilting_point": 50.0,
-    }  # very simple soil parameters
-    cultivar = {
-        "name": "Generic",
-        "tbase": 4.0,
-        "topt": 22.0,
-        "tmax_th": 35.0,
-        "rue": 2.5,
-        "k_light": 0.6,
-        "sla": 0.02,
-        "potential_fruits_per_crown": 10.0,
-    }  # default cultivar description
-    model = CropgroStrawberry(40.0, planting_date, soil, cultivar)  # create model instance
-    return model.simulate_growth(wth_df)  # run simulation and return DataFrame
-
-
-def generate_report(fort_df: pd.DataFrame, py_df: pd.DataFrame, tolerance: float) -> str:
-    """Create a short report comparing Python and Fortran outputs."""
+def run_python_model(experiment, wth_df: pd.DataFrame, latitude: float = 40.0) -> dict:
+    """Simulate every treatment of the experiment in one batch; returns a DataFrame per treatment number."""
+    local = os.path.join(os.path.dirname(experiment.path), "SOIL.SOL")  # experiment's own profiles first
+    soil_sources = ([local] if os.path.exists(local) else []) + [os.path.join("dssat-csm-data-develop", "Soil")]
+    soils = build_soil_index(soil_sources)  # profiles by ID_SOIL, indexed once by byte offset
+    genotypes = load_genotypes()  # SRGRO048 cultivar, ecotype and species coefficients
+    batch = impl_module.simulate_experiment(
+        experiment, latitude, soils, genotypes, wth_df
+    )  # soil, cultivar, planting date, PPOP and last harvest of each treatment
+    return {t.number: batch.to_frame(j) for j, t in enumerate(experiment.treatments)}
+
+
+def generate_report(fort_df: pd.DataFrame, py_runs: dict, tolerance: float) -> str:
+    """Create a short report comparing Python and Fortran outputs of every treatment."""
+    reports = []
+    for number, py_df in py_runs.items():
+        if "TRNO" in fort_df.columns:  # PlantGro.OUT holds one run per treatment
+            fort_run = fort_df[fort_df["TRNO"] == number].reset_index(drop=True)
+        else:
+            fort_run = fort_df
+        reports.append(f"Treatment {number}: " + compare_run(fort_run, py_df, tolerance))
+    return "\n\n".join(reports)  # one block per treatment
+
+
+def compare_run(fort_df: pd.DataFrame, py_df: pd.DataFrame, tolerance: float) -> str:
+    """Compare the Python and Fortran outputs of one treatment."""
     common_cols = [c for c in fort_df.columns if c in py_df.columns]  # only check columns present in both
     lines = []  # individual result lines
     max_diff = 0.0  # track worst difference across columns
@@ -165,6 +105,10 @@ def main():
         default=1.0,
         help="Acceptable absolute error tolerance",
     )
+    parser.add_argument(
+        "--fortran-output",
+        help="Directory with the outputs of a finished DSSAT run (skips running DSSAT)",
+    )
     parser.add_argument(
         "--report",
         default="validation_report.txt",
@@ -172,29 +116,35 @@ def main():
     )
     args = parser.parse_args()  # parse CLI arguments
 
-    planting_date, wsta = parse_srx_file(args.srx)  # extract settings from SRX
-    if planting_date is None or wsta is None:  # verify required data
+    experiment = read_filex(args.srx)  # treatments, cultivars, fields and harvest schedules
+    treatments = [t for t in experiment.treatments if t.planting is not None and t.field is not None]
+    if not treatments or len(treatments) < len(experiment.treatments):  # verify required data
         raise ValueError("Could not parse SRX file")
+    wsta = treatments[0].field.wsta  # weather station of the experiment
+    if any(t.field.wsta != wsta for t in treatments):
+        raise ValueError("Treatments with different weather stations are not supported")
+    planting_date = str(min(t.planting.date for t in treatments))  # first planting
+    harvests = [t.last_harvest for t in treatments if t.last_harvest is not None]
+    harvest_date = str(max(harvests)) if harvests else None  # last harvest of any treatment
+
+    if args.fortran_output:
+        fort_df = read_fortran_output(args.fortran_output)  # outputs of a finished run
+    else:
+        run = run_dssat(args.srx, args.dssat_dir)  # produce Fortran output
+        table = cached_table(run)  # PlantGro.OUT as parsed into the output cache
+        fort_df = pd.DataFrame(table) if table is not None else read_fortran_output(run.output_dir)
 
-    run_dssat(args.srx, args.dssat_dir)  # produce Fortran output
+    weather_dir = os.path.join("dssat-csm-data-develop", "Weather")  # location of .WTH files
+    archive = build_archive(weather_dir, clean=True)  # station index with gaps filled, rebuilt only when files change
+    season_end = harvest_date or (pd.Timestamp(planting_date) + pd.Timedelta(days=365)).strftime("%Y-%m-%d")
+    weather = archive.season(wsta, planting_date, season_end)  # stitch the station's yearly files
+    wth_df = weather.to_frame()  # read weather data
+    latitude = weather.station["LAT"]
+    latitude = 0.0 if pd.isna(latitude) else latitude  # DSSAT uses zero when LAT is missing
 
-    exp_dir = os.path.dirname(args.srx)  # experiment directory
-    fort_df = read_fortran_output(exp_dir)  # load DSSAT results
+    py_runs = run_python_model(experiment, wth_df, latitude)  # run all treatments, as DSSAT does
 
-    year = planting_date[:4]  # search year for weather data
-    weather_dir = os.path.join("dssat-csm-data-develop", "Weather")  # location of .WTH files
-    matches = [
-        f for f in os.listdir(weather_dir)
-        if f.startswith(f"{wsta}{year[2:]}") and f.endswith(".WTH")
-    ]  # locate matching file
-    if not matches:
-        raise FileNotFoundError("Weather file not found")
-    wth_path = os.path.join(weather_dir, matches[0])  # take first match
-    wth_df = read_wth_file(wth_path)  # read weather data
-
-    py_df = run_python_model(wth_df, planting_date)  # run Python model
-
-    report = generate_report(fort_df, py_df, args.tolerance)  # compare outputs
+    report = generate_report(fort_df, py_runs, args.tolerance)  # compare outputs
     with open(args.report, "w") as f:  # save report to file
         f.write(report)
     print(report)  # also print to console